@@ -2,5 +2,8 @@ from .products import router as products_router
 from .chat import router as chat_router
 from .recommendations import router as recommendations_router
 from .websocket import websocket_endpoint
+from .metrics import router as metrics_router, MetricsMiddleware
+from .analytics import router as analytics_router
+from .orders import router as orders_router
 
-__all__ = ["products_router", "chat_router", "recommendations_router", "websocket_endpoint"] 
\ No newline at end of file
+__all__ = ["products_router", "chat_router", "recommendations_router", "websocket_endpoint", "metrics_router", "MetricsMiddleware", "analytics_router", "orders_router"] 
\ No newline at end of file
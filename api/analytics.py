@@ -0,0 +1,34 @@
+from fastapi import APIRouter, Depends, HTTPException, Query
+from sqlalchemy.ext.asyncio import AsyncSession
+from datetime import date, timedelta
+from database import get_session
+from services.search_analytics import search_analytics
+from services.interaction_retention import interaction_counts, GROUP_COLUMNS
+
+router = APIRouter(prefix="/api/analytics", tags=["analytics"])
+
+@router.get("/searches")
+async def get_search_analytics(limit: int = Query(20, ge=1, le=100)):
+    """
+    Búsquedas más frecuentes y búsquedas sin resultados (demanda no atendida) por origen.
+    Los conteos son aproximados: el valor real está entre `count - error` y `count`.
+    """
+    return search_analytics.report(limit)
+
+@router.get("/interactions")
+async def get_interaction_counts(
+    days: int = Query(30, ge=1, le=3650),
+    group_by: str = Query("category"),
+    limit: int = Query(20, ge=1, le=500),
+    session: AsyncSession = Depends(get_session)
+):
+    """Interacciones de los últimos `days` días por producto, categoría o tipo (rollups + filas recientes)"""
+    if group_by not in GROUP_COLUMNS:
+        raise HTTPException(status_code=400, detail=f"group_by debe ser uno de: {', '.join(GROUP_COLUMNS)}")
+    
+    since = date.today() - timedelta(days=days - 1)
+    return {
+        "since": since.isoformat(),
+        "group_by": group_by,
+        "counts": await interaction_counts(session, since, group_by, limit)
+    }
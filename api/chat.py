@@ -3,18 +3,18 @@ from sqlalchemy.ext.asyncio import AsyncSession
 from pydantic import BaseModel
 from typing import Optional, List
 from database import get_session
-from services.chat_service import ChatService
+from services.chat_service import get_chat_service
 from services.inventory_service import InventoryService
 from services.recommendation_service import RecommendationService
+from services.chat_archive import chat_archive, current_epoch_clause, advance_epoch
 from models.chat import ChatResponse, ChatHistory, ChatMessage, MultiChatResponse
-from config import settings
-from sqlalchemy import select, delete, func
+from sqlalchemy import select, func
 from datetime import datetime
+import asyncio
 import json
 
 router = APIRouter(prefix="/api/chat", tags=["chat"])
 
-chat_service = ChatService(use_mock=settings.use_mock_llm)
 
 class ChatRequest(BaseModel):
     message: str
@@ -32,7 +32,7 @@ async def send_message(
     recommendation_service = RecommendationService(session)
     
     try:
-        multi_response = await chat_service.process_message(
+        multi_response = await get_chat_service().process_message(
             message=request.message,
             inventory_service=inventory_service,
             recommendation_service=recommendation_service,
@@ -53,42 +53,62 @@ async def send_message(
         await session.rollback()
         raise HTTPException(status_code=500, detail=str(e))
 
+def _format_message(role: str, content: str, timestamp: str, products_mentioned: Optional[str]) -> dict:
+    return {
+        "role": role,
+        "content": content,
+        "timestamp": timestamp,
+        "products_mentioned": json.loads(products_mentioned) if products_mentioned else []
+    }
+
 @router.get("/history", response_model=MessageHistoryResponse)
 async def get_chat_history(
     limit: int = 50,
     offset: int = 0,
+    include_archived: bool = False,
     session: AsyncSession = Depends(get_session)
 ):
-    """Obtiene el historial de chat global"""
+    """
+    Obtiene el historial de chat global. Por defecto solo la conversación actual; con
+    include_archived también las limpiadas y los mensajes ya movidos al archivo (al final)
+    """
     try:
+        query = select(ChatHistory)
+        count_query = select(func.count(ChatHistory.id))
+        if not include_archived:
+            query = query.where(ChatHistory.epoch == current_epoch_clause())
+            count_query = count_query.where(ChatHistory.epoch == current_epoch_clause())
+        
         # Obtener mensajes del historial
         result = await session.execute(
-            select(ChatHistory)
+            query
             .order_by(ChatHistory.timestamp.desc())
             .limit(limit)
             .offset(offset)
         )
-        messages = result.scalars().all()
+        messages = [
+            _format_message(msg.role, msg.content, msg.timestamp.isoformat(), msg.products_mentioned)
+            for msg in result.scalars().all()
+        ]
         
         # Contar total de mensajes
-        count_result = await session.execute(
-            select(func.count(ChatHistory.id))
-        )
+        count_result = await session.execute(count_query)
         total = count_result.scalar()
         
-        # Formatear mensajes
-        formatted_messages = [
-            {
-                "role": msg.role,
-                "content": msg.content,
-                "timestamp": msg.timestamp.isoformat(),
-                "products_mentioned": json.loads(msg.products_mentioned) if msg.products_mentioned else []
-            }
-            for msg in reversed(messages)  # Revertir para orden cronológico
-        ]
+        if include_archived:
+            # Continuar la página en el archivo cuando se acaban los mensajes de la base
+            if len(messages) < limit:
+                archived = await asyncio.to_thread(
+                    chat_archive.read, max(offset - total, 0), limit - len(messages)
+                )
+                messages.extend(
+                    _format_message(row["role"], row["content"], row["timestamp"], row["products_mentioned"])
+                    for row in archived
+                )
+            total += await asyncio.to_thread(chat_archive.count)
         
         return MessageHistoryResponse(
-            messages=formatted_messages,
+            messages=list(reversed(messages)),  # Revertir para orden cronológico
             total=total
         )
     except Exception as e:
@@ -98,12 +118,14 @@ async def get_chat_history(
 async def clear_chat_history(
     session: AsyncSession = Depends(get_session)
 ):
-    """Limpia el historial de chat (para empezar una nueva conversación)"""
+    """
+    Limpia el historial de chat (para empezar una nueva conversación). Solo avanza la época;
+    los mensajes anteriores se archivan en segundo plano sin bloquear la escritura
+    """
     try:
-        await session.execute(
-            delete(ChatHistory)
-        )
+        epoch = await advance_epoch(session)
         await session.commit()
-        return {"message": "Historial de chat limpiado exitosamente"}
+        chat_archive.wake()
+        return {"message": "Historial de chat limpiado exitosamente", "epoch": epoch}
     except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e)) 
\ No newline at end of file
+        raise HTTPException(status_code=500, detail=str(e))
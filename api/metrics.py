@@ -0,0 +1,47 @@
+from fastapi import APIRouter
+from fastapi.responses import PlainTextResponse
+import time
+from services.metrics import registry, http_requests_total, http_errors_total, http_request_seconds
+
+router = APIRouter(tags=["metrics"])
+
+@router.get("/metrics", response_class=PlainTextResponse)
+async def get_metrics():
+    """Métricas del proceso en formato de texto de Prometheus"""
+    return PlainTextResponse(registry.render(), media_type="text/plain; version=0.0.4")
+
+def _router_label(scope) -> str:
+    route = scope.get("route")
+    if route is None:
+        return "unmatched"
+    tags = getattr(route, "tags", None)
+    return tags[0] if tags else "app"
+
+class MetricsMiddleware:
+    """Middleware ASGI que cuenta peticiones, errores y latencia por router"""
+    
+    def __init__(self, app):
+        self.app = app
+    
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        
+        status_code = 500
+        
+        async def send_wrapper(message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            await send(message)
+        
+        started = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            router = _router_label(scope)
+            http_request_seconds.observe(time.perf_counter() - started, router)
+            http_requests_total.inc(router, scope["method"], str(status_code))
+            if status_code >= 500:
+                http_errors_total.inc(router)
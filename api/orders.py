@@ -0,0 +1,34 @@
+from fastapi import APIRouter, Depends, HTTPException
+from sqlalchemy.ext.asyncio import AsyncSession
+from database import get_session
+from models.product import OrderRequest
+from services.order_service import OrderService, ORDER_NOT_FOUND, ORDER_OUT_OF_STOCK
+
+router = APIRouter(prefix="/api/orders", tags=["orders"])
+
+@router.post("/")
+async def place_order(
+    request: OrderRequest,
+    session: AsyncSession = Depends(get_session)
+):
+    """Registra un pedido descontando el stock; responde 409 si no alcanzan las unidades"""
+    order = await OrderService(session).place_order(
+        request.product_id, request.quantity, customer_info=request.customer_info
+    )
+    if order.status == ORDER_NOT_FOUND:
+        raise HTTPException(status_code=404, detail="Producto no encontrado")
+    if order.status == ORDER_OUT_OF_STOCK:
+        raise HTTPException(
+            status_code=409,
+            detail={"message": "Stock insuficiente", "available_stock": order.remaining_stock}
+        )
+    sale = order.sale
+    return {
+        "status": order.status,
+        "sale_id": sale.id,
+        "product_id": sale.product_id,
+        "quantity": sale.quantity,
+        "price": sale.price,
+        "remaining_stock": order.remaining_stock,
+        "timestamp": sale.timestamp.isoformat()
+    }
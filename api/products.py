@@ -18,7 +18,7 @@ async def get_products(
     inventory_service = InventoryService(session)
     
     if search:
-        products = await inventory_service.search_products(search)
+        products = await inventory_service.search_products(search, source="catalog")
     elif category:
         products = await inventory_service.get_products_by_category(category)
     elif brand:
@@ -45,6 +45,7 @@ async def get_recent_sales(
         "sales": [
             {
                 "id": sale.id,
+                "product_id": sale.product_id,
                 "product_name": sale.product_name,
                 "product_brand": sale.product_brand,
                 "price": sale.price,
@@ -4,6 +4,7 @@ from pydantic import BaseModel
 from typing import List, Dict, Optional
 from database import get_session
 from services.recommendation_service import RecommendationService
+from services.recommendation_snapshots import recommendation_snapshots
 from models.product import ProductResponse, ProductCategory
 from models.user_interaction import InteractionRequest
 
@@ -15,41 +16,16 @@ class RecommendedProduct(ProductResponse):
     reasons: List[str]
 
 @router.get("/")
-async def get_recommendations(
-    session: AsyncSession = Depends(get_session)
-):
+async def get_recommendations():
     """
     Obtiene recomendaciones personalizadas basadas en el comportamiento global del usuario.
     Las recomendaciones se adaptan automáticamente según todas las interacciones previas
-    con el chatbot y el sistema.
+    con el chatbot y el sistema. Se sirven desde un snapshot que se recalcula en segundo
+    plano cuando cambian el catálogo o las preferencias.
     """
-    recommendation_service = RecommendationService(session)
-    
     try:
-        recommendations = await recommendation_service.get_personalized_recommendations()
-        
-        # Formatear respuesta con scoring y razones
-        response = {
-            "highly_recommended": [],
-            "recommended": [],
-            "other_suggestions": []
-        }
-        
-        for category, products in recommendations.items():
-            for product in products:
-                recommended_product = {
-                    **product.__dict__,
-                    "score": 85 if category == "highly_recommended" else 65 if category == "recommended" else 40,
-                    "recommendation": category.upper().replace("_", " "),
-                    "reasons": _get_recommendation_reasons(product, category)
-                }
-                response[category].append(recommended_product)
-        
-        await session.commit()
-        return response
-        
+        return await recommendation_snapshots.get()
     except Exception as e:
-        await session.rollback()
         raise HTTPException(status_code=500, detail=f"Error al obtener recomendaciones: {str(e)}")
 
 @router.post("/track-interaction")
@@ -91,6 +67,44 @@ async def get_related_products(
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error al obtener productos relacionados: {str(e)}")
 
+@router.get("/trending")
+async def get_trending_products(
+    limit: int = Query(10, ge=1, le=50),
+    session: AsyncSession = Depends(get_session)
+):
+    """Productos más activos en las últimas 24 horas y 30 días (vistas, menciones, clics y ventas)"""
+    recommendation_service = RecommendationService(session)
+    
+    try:
+        trending = await recommendation_service.get_trending_products(limit=limit)
+        return [
+            {
+                **ProductResponse.model_validate(item.product).model_dump(),
+                "trending_score": item.trending_score,
+                "activity": item.activity
+            }
+            for item in trending
+        ]
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error al obtener productos en tendencia: {str(e)}")
+
+@router.get("/similar/{product_id}")
+async def get_similar_products(
+    product_id: int,
+    limit: int = Query(6, ge=1, le=20),
+    session: AsyncSession = Depends(get_session)
+):
+    """Obtiene productos con descripción y especificaciones parecidas, de cualquier categoría"""
+    recommendation_service = RecommendationService(session)
+    
+    try:
+        return await recommendation_service.get_similar_products(
+            product_id=product_id,
+            limit=limit
+        )
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error al obtener productos similares: {str(e)}")
+
 @router.get("/user-preferences")
 async def get_user_preferences(
     session: AsyncSession = Depends(get_session)
@@ -117,25 +131,3 @@ async def get_user_preferences(
         },
         "interaction_count": preferences["interaction_count"]
     }
-
-def _get_recommendation_reasons(product, category: str) -> List[str]:
-    """Genera razones para la recomendación"""
-    reasons = []
-    
-    if category == "highly_recommended":
-        reasons.append("De la categoría que buscaste más recientemente")
-        if product.stock > 5:
-            reasons.append("Disponibilidad inmediata")
-        reasons.append("Producto destacado en su categoría")
-    elif category == "recommended":
-        reasons.append("De tu penúltima categoría buscada")
-        if product.price < 1000:
-            reasons.append("Precio accesible")
-        if product.stock > 10:
-            reasons.append("Amplio stock disponible")
-    else:
-        reasons.append("Otras opciones que podrían interesarte")
-        if hasattr(product, 'brand') and product.brand in ["Apple", "Samsung", "HP", "Dell"]:
-            reasons.append("Marca reconocida")
-    
-    return reasons 
\ No newline at end of file
@@ -1,132 +1,343 @@
-from fastapi import WebSocket, WebSocketDisconnect, Depends
-from sqlalchemy.ext.asyncio import AsyncSession
+from fastapi import WebSocket, WebSocketDisconnect
 import json
 import asyncio
-from datetime import datetime
+import time
 import logging
-from database import get_session
-from services.chat_service import ChatService
+from typing import Optional, Union
+from database import async_session_maker
+from models.chat import MultiChatResponse
+from services.chat_service import get_chat_service
 from services.inventory_service import InventoryService
 from services.recommendation_service import RecommendationService
+from services.event_bus import event_bus, TOPIC_INVENTORY, TOPIC_SALES
+from services.metrics import registry, ws_messages_total, ws_errors_total
+from services.query_profiler import profile_queries
 from config import settings
 
+try:
+    import msgpack
+except ImportError:  # Sin msgpack solo se ofrece el protocolo JSON
+    msgpack = None
+
 logger = logging.getLogger(__name__)
 
+AVAILABLE_TOPICS = {TOPIC_INVENTORY, TOPIC_SALES}
+
+# Subprotocolo compacto: frames binarios MessagePack con una lista de eventos por frame
+COMPACT_SUBPROTOCOL = "makers.msgpack.v1"
+
+class ClientConnection:
+    """Estado de un socket: cola de salida acotada y tarea escritora propia"""
+    
+    def __init__(self, websocket: WebSocket, queue_size: int, compact: bool = False):
+        self.websocket = websocket
+        self.compact = compact
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=queue_size)
+        self.last_seen = time.monotonic()
+        self.writer_task: Optional[asyncio.Task] = None
+        self.closed = False
+
 class ConnectionManager:
     def __init__(self):
-        self.active_connections: list[WebSocket] = []
+        self.active_connections: dict[WebSocket, ClientConnection] = {}
+        # Tópico -> sockets suscritos
+        self.subscriptions: dict[str, set[WebSocket]] = {}
+        self.evictions = 0
+        self._heartbeat_task: Optional[asyncio.Task] = None
     
     async def connect(self, websocket: WebSocket):
-        await websocket.accept()
-        self.active_connections.append(websocket)
+        # El modo compacto solo se usa si el cliente lo pide; JSON sigue siendo el predeterminado
+        compact = msgpack is not None and COMPACT_SUBPROTOCOL in websocket.scope.get("subprotocols", [])
+        await websocket.accept(subprotocol=COMPACT_SUBPROTOCOL if compact else None)
+        connection = ClientConnection(websocket, settings.ws_send_queue_size, compact)
+        connection.writer_task = asyncio.create_task(self._writer(connection))
+        self.active_connections[websocket] = connection
+        
+        if self._heartbeat_task is None or self._heartbeat_task.done():
+            self._heartbeat_task = asyncio.create_task(self._heartbeat())
         logger.info(f"Cliente conectado. Total conexiones: {len(self.active_connections)}")
     
     def disconnect(self, websocket: WebSocket):
-        if websocket in self.active_connections:
-            self.active_connections.remove(websocket)
+        connection = self.active_connections.pop(websocket, None)
+        if connection:
+            connection.closed = True
+            if connection.writer_task and connection.writer_task is not asyncio.current_task():
+                connection.writer_task.cancel()
+            for subscribers in self.subscriptions.values():
+                subscribers.discard(websocket)
             logger.info(f"Cliente desconectado. Total conexiones: {len(self.active_connections)}")
     
-    async def send_message(self, message: str, websocket: WebSocket):
+    def touch(self, websocket: WebSocket):
+        """Marca actividad del cliente (cualquier mensaje recibido, incluido pong)"""
+        connection = self.active_connections.get(websocket)
+        if connection:
+            connection.last_seen = time.monotonic()
+    
+    def subscribe(self, websocket: WebSocket, topics: list[str]) -> list[str]:
+        accepted = [topic for topic in topics if topic in AVAILABLE_TOPICS]
+        for topic in accepted:
+            self.subscriptions.setdefault(topic, set()).add(websocket)
+        return accepted
+    
+    def unsubscribe(self, websocket: WebSocket, topics: list[str]):
+        for topic in topics:
+            if topic in self.subscriptions:
+                self.subscriptions[topic].discard(websocket)
+    
+    def is_compact(self, websocket: WebSocket) -> bool:
+        connection = self.active_connections.get(websocket)
+        return bool(connection and connection.compact)
+    
+    async def send_event(self, event: dict, websocket: WebSocket):
+        """Encola un evento; nunca espera al cliente. Si su cola está llena se le desconecta"""
+        connection = self.active_connections.get(websocket)
+        if connection:
+            self._enqueue(connection, event)
+    
+    async def broadcast(self, topic: str, payload: dict):
+        """Envía un evento a todos los sockets suscritos al tópico"""
+        subscribers = self.subscriptions.get(topic)
+        if not subscribers:
+            return
+        
+        event = {"type": "event", "topic": topic, **payload}
+        # Serializar una sola vez para todos los clientes JSON
+        text = json.dumps(event)
+        for websocket in list(subscribers):
+            connection = self.active_connections.get(websocket)
+            if connection:
+                self._enqueue(connection, event, text)
+    
+    def stats(self) -> dict:
+        depths = [connection.queue.qsize() for connection in self.active_connections.values()]
+        return {
+            "connections": len(self.active_connections),
+            "queue_depth_total": sum(depths),
+            "queue_depth_max": max(depths, default=0),
+            "evictions": self.evictions,
+            "subscribers": {topic: len(sockets) for topic, sockets in self.subscriptions.items()}
+        }
+    
+    def _enqueue(self, connection: ClientConnection, event: dict, text: Optional[str] = None):
+        if connection.closed:
+            return
         try:
-            await websocket.send_text(message)
-        except Exception as e:
-            logger.error(f"Error enviando mensaje: {e}")
+            # Los clientes JSON reciben el texto ya serializado; los compactos, el evento
+            connection.queue.put_nowait(event if connection.compact else text or json.dumps(event))
+        except asyncio.QueueFull:
+            self._evict(connection, "cola de salida llena")
+    
+    def _evict(self, connection: ClientConnection, reason: str):
+        """Desconecta un cliente lento o inactivo sin bloquear a los demás"""
+        if connection.closed:
+            return
+        logger.warning(f"Desconectando cliente: {reason}")
+        self.evictions += 1
+        self.disconnect(connection.websocket)
+        asyncio.create_task(self._close(connection.websocket))
+    
+    async def _close(self, websocket: WebSocket):
+        try:
+            await asyncio.wait_for(websocket.close(code=1008), timeout=settings.ws_send_timeout)
+        except Exception:
+            pass
+    
+    async def _writer(self, connection: ClientConnection):
+        """Tarea escritora del socket: vacía la cola con un tiempo máximo por envío"""
+        while True:
+            item = await connection.queue.get()
+            try:
+                if connection.compact:
+                    send = connection.websocket.send_bytes(await self._next_batch(connection, item))
+                else:
+                    send = connection.websocket.send_text(item)
+                await asyncio.wait_for(send, timeout=settings.ws_send_timeout)
+            except asyncio.TimeoutError:
+                self._evict(connection, "envío demasiado lento")
+                return
+            except Exception as e:
+                logger.error(f"Error enviando mensaje: {e}")
+                self.disconnect(connection.websocket)
+                return
+    
+    async def _next_batch(self, connection: ClientConnection, first: dict) -> bytes:
+        """Agrupa los eventos pendientes en un único frame MessagePack"""
+        if settings.ws_batch_linger > 0:
+            await asyncio.sleep(settings.ws_batch_linger)
+        
+        batch = [first]
+        while len(batch) < settings.ws_batch_max_events and not connection.queue.empty():
+            batch.append(connection.queue.get_nowait())
+        
+        # Un "typing" seguido de otro evento en el mismo frame ya no aporta nada al cliente
+        events = [
+            event for i, event in enumerate(batch)
+            if event.get("type") != "typing" or i == len(batch) - 1
+        ]
+        return msgpack.packb(events)
+    
+    async def _heartbeat(self):
+        """Envía ping periódicos y desconecta a los clientes que dejaron de responder"""
+        ping = {"type": "ping"}
+        ping_text = json.dumps(ping)
+        while self.active_connections:
+            await asyncio.sleep(settings.ws_heartbeat_interval)
+            now = time.monotonic()
+            for connection in list(self.active_connections.values()):
+                if now - connection.last_seen > settings.ws_idle_timeout:
+                    self._evict(connection, "sin actividad")
+                else:
+                    self._enqueue(connection, ping, ping_text)
 
 manager = ConnectionManager()
-chat_service = ChatService(use_mock=settings.use_mock_llm)
+event_bus.subscribe(manager.broadcast)
+
+registry.gauge("ws_connections", "Conexiones WebSocket activas", lambda: {(): len(manager.active_connections)})
+registry.gauge("ws_queue_depth", "Eventos en las colas de salida (total y máximo por socket)", lambda: {
+    ("total",): manager.stats()["queue_depth_total"],
+    ("max",): manager.stats()["queue_depth_max"]
+}, labels=("aggregate",))
+registry.gauge("ws_evictions", "Clientes desconectados por lentitud o inactividad", lambda: {(): manager.evictions})
 
-async def websocket_endpoint(websocket: WebSocket, db_session: AsyncSession = Depends(get_session)):
+async def _handle_message(data: str, concurrency: asyncio.Semaphore) -> Union[MultiChatResponse, dict]:
+    """Procesa un mensaje entrante con una sesión de base de datos propia y de corta vida"""
+    try:
+        message_data = json.loads(data)
+        user_message = message_data.get("message", "")
+    except (json.JSONDecodeError, AttributeError):
+        return {"type": "error", "message": "Formato de mensaje inválido"}
+    
+    if not user_message:
+        return {"type": "error", "message": "Mensaje vacío"}
+    
+    ws_messages_total.inc()
+    async with concurrency:
+        try:
+            with profile_queries("ws", "mensaje de WebSocket"):
+                async with async_session_maker() as db_session:
+                    inventory_service = InventoryService(db_session)
+                    recommendation_service = RecommendationService(db_session)
+                    
+                    return await get_chat_service().process_message(
+                        message=user_message,
+                        inventory_service=inventory_service,
+                        recommendation_service=recommendation_service,
+                        db_session=db_session
+                    )
+        except Exception as e:
+            logger.error(f"Error procesando mensaje: {str(e)}")
+            ws_errors_total.inc()
+            return {"type": "error", "message": "Error interno del servidor"}
+
+async def _deliver_responses(websocket: WebSocket, pending: asyncio.Queue, slots: asyncio.Semaphore):
+    """Envía las respuestas en el mismo orden en que llegaron los mensajes"""
+    while True:
+        task = await pending.get()
+        try:
+            # Mostrar indicador de escritura mientras se procesa el mensaje
+            await manager.send_event({"type": "typing"}, websocket)
+            result = await task
+            
+            if isinstance(result, dict):
+                await manager.send_event(result, websocket)
+                continue
+            
+            # En modo compacto los campos comunes del turno se envían una sola vez
+            compact = manager.is_compact(websocket)
+            if compact:
+                await manager.send_event({
+                    "type": "turn",
+                    "timestamp": result.timestamp.isoformat(),
+                    "products_mentioned": result.products_mentioned
+                }, websocket)
+            
+            # Enviar cada mensaje con un pequeño delay para simular escritura natural
+            for i, msg in enumerate(result.messages):
+                if i > 0:
+                    # Mostrar indicador de escritura entre mensajes
+                    await manager.send_event({"type": "typing"}, websocket)
+                    # Delay proporcional a la longitud del mensaje (simulando velocidad de escritura)
+                    delay = min(len(msg) * 0.01, 1.5)  # Max 1.5 segundos de delay
+                    await asyncio.sleep(delay)
+                
+                if compact:
+                    await manager.send_event({"type": "message", "message": msg}, websocket)
+                else:
+                    await manager.send_event({
+                        "type": "message",
+                        "message": msg,
+                        "timestamp": result.timestamp.isoformat(),
+                        "products_mentioned": result.products_mentioned
+                    }, websocket)
+        finally:
+            slots.release()
+
+async def _handle_control_message(data: str, websocket: WebSocket) -> bool:
+    """Atiende heartbeats y suscripciones a tópicos; devuelve True si el mensaje era de control"""
+    try:
+        message_data = json.loads(data)
+    except json.JSONDecodeError:
+        return False
+    
+    if not isinstance(message_data, dict):
+        return False
+    
+    if message_data.get("type") == "pong":
+        return True
+    if message_data.get("type") == "ping":
+        await manager.send_event({"type": "pong"}, websocket)
+        return True
+    if message_data.get("type") not in ("subscribe", "unsubscribe"):
+        return False
+    
+    topics = message_data.get("topics")
+    if not isinstance(topics, list):
+        topics = []
+    
+    if message_data["type"] == "subscribe":
+        topics = manager.subscribe(websocket, topics)
+        reply_type = "subscribed"
+    else:
+        manager.unsubscribe(websocket, topics)
+        reply_type = "unsubscribed"
+    
+    await manager.send_event({"type": reply_type, "topics": topics}, websocket)
+    return True
+
+async def websocket_endpoint(websocket: WebSocket):
     await manager.connect(websocket)
     
     # Enviar mensaje de bienvenida
-    await manager.send_message(
-        json.dumps({
-            "type": "welcome",
-            "message": "¡Hola! Bienvenido a Makers Tech. ¿En qué puedo ayudarte hoy?"
-        }),
-        websocket
-    )
+    await manager.send_event({
+        "type": "welcome",
+        "message": "¡Hola! Bienvenido a Makers Tech. ¿En qué puedo ayudarte hoy?"
+    }, websocket)
+    
+    # Cada mensaje se procesa en su propia tarea; la cola conserva el orden de salida
+    # y el semáforo de slots limita los mensajes pendientes (memoria acotada por socket)
+    concurrency = asyncio.Semaphore(max(1, settings.ws_message_concurrency))
+    slots = asyncio.Semaphore(max(1, settings.ws_max_pending_messages))
+    pending: asyncio.Queue = asyncio.Queue()
+    sender = asyncio.create_task(_deliver_responses(websocket, pending, slots))
     
     try:
         while True:
             data = await websocket.receive_text()
+            manager.touch(websocket)
             
-            try:
-                message_data = json.loads(data)
-                user_message = message_data.get("message", "")
-                
-                if not user_message:
-                    await manager.send_message(
-                        json.dumps({
-                            "type": "error",
-                            "message": "Mensaje vacío"
-                        }),
-                        websocket
-                    )
-                    continue
-                
-                # Mostrar indicador de escritura
-                await manager.send_message(
-                    json.dumps({
-                        "type": "typing"
-                    }),
-                    websocket
-                )
-                
-                inventory_service = InventoryService(db_session)
-                recommendation_service = RecommendationService(db_session)
-                
-                multi_response = await chat_service.process_message(
-                    message=user_message,
-                    inventory_service=inventory_service,
-                    recommendation_service=recommendation_service,
-                    db_session=db_session
-                )
-                
-                # Enviar cada mensaje con un pequeño delay para simular escritura natural
-                for i, msg in enumerate(multi_response.messages):
-                    if i > 0:
-                        # Mostrar indicador de escritura entre mensajes
-                        await manager.send_message(
-                            json.dumps({
-                                "type": "typing"
-                            }),
-                            websocket
-                        )
-                        # Delay proporcional a la longitud del mensaje (simulando velocidad de escritura)
-                        delay = min(len(msg) * 0.01, 1.5)  # Max 1.5 segundos de delay
-                        await asyncio.sleep(delay)
-                    
-                    await manager.send_message(
-                        json.dumps({
-                            "type": "message",
-                            "message": msg,
-                            "timestamp": multi_response.timestamp.isoformat(),
-                            "products_mentioned": multi_response.products_mentioned
-                        }),
-                        websocket
-                    )
-                
-            except json.JSONDecodeError:
-                await manager.send_message(
-                    json.dumps({
-                        "type": "error",
-                        "message": "Formato de mensaje inválido"
-                    }),
-                    websocket
-                )
-            except Exception as e:
-                logger.error(f"Error procesando mensaje: {str(e)}")
-                await manager.send_message(
-                    json.dumps({
-                        "type": "error",
-                        "message": "Error interno del servidor"
-                    }),
-                    websocket
-                )
+            if await _handle_control_message(data, websocket):
+                continue
+            
+            # Si hay demasiados mensajes pendientes, dejar de leer hasta que se libere un slot
+            await slots.acquire()
+            pending.put_nowait(asyncio.create_task(_handle_message(data, concurrency)))
                 
     except WebSocketDisconnect:
-        manager.disconnect(websocket)
+        pass
     except Exception as e:
         logger.error(f"Error en WebSocket: {str(e)}")
-        manager.disconnect(websocket) 
\ No newline at end of file
+    finally:
+        sender.cancel()
+        while not pending.empty():
+            pending.get_nowait().cancel()
+        manager.disconnect(websocket)
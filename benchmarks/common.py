@@ -0,0 +1,30 @@
+"""Utilidades compartidas por los benchmarks"""
+from typing import Dict, List
+
+# Mensajes de chat usados para simular conversaciones con el modelo simulado
+CHAT_MESSAGES = [
+    "¿Qué laptops tienen?",
+    "Muéstrame celulares",
+    "Busco una computadora de escritorio",
+    "hola",
+]
+
+def expected_messages(chat_service, text: str) -> int:
+    """Número de mensajes que el modelo simulado produce para el texto"""
+    response = chat_service.llm._generate_mock_response(text)
+    return len(chat_service._split_response(response))
+
+def percentile(values: List[float], pct: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * pct / 100))]
+
+def latency_summary_ms(latencies: List[float]) -> Dict[str, float]:
+    """p50/p95/p99/max en milisegundos a partir de latencias en segundos"""
+    if not latencies:
+        return {}
+    return {
+        "p50": round(percentile(latencies, 50) * 1000, 3),
+        "p95": round(percentile(latencies, 95) * 1000, 3),
+        "p99": round(percentile(latencies, 99) * 1000, 3),
+        "max": round(max(latencies) * 1000, 3),
+    }
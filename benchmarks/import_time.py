@@ -0,0 +1,77 @@
+"""
+Mide el tiempo de importación de la aplicación con `python -X importtime` y falla si
+supera el presupuesto o si se importan módulos pesados (LangChain/OpenAI) al arrancar.
+
+Uso (para CI):
+    python -m benchmarks.import_time --budget-ms 1000
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+
+# Módulos que deben cargarse solo en el primer uso del modelo o en el calentamiento
+LAZY_MODULES = ("langchain", "langchain_core", "langchain_openai", "openai")
+
+def _parse_importtime(stderr: str) -> dict:
+    """Devuelve {módulo: tiempo acumulado en µs} a partir de la salida de -X importtime"""
+    cumulative = {}
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _self_us, cumulative_us, name = line[len("import time:"):].split("|")
+        cumulative[name.strip()] = int(cumulative_us)
+    return cumulative
+
+def measure(module: str, runs: int) -> dict:
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    samples = []
+    imported = {}
+    for _ in range(runs):
+        result = subprocess.run(
+            [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+            cwd=root,
+            capture_output=True,
+            text=True,
+            env={**os.environ, "USE_MOCK_LLM": "true"}
+        )
+        if result.returncode != 0:
+            raise RuntimeError(f"Error importando {module}:\n{result.stderr[-2000:]}")
+        imported = _parse_importtime(result.stderr)
+        samples.append(imported.get(module, 0) / 1000)
+
+    samples.sort()
+    heaviest = sorted(imported.items(), key=lambda item: item[1], reverse=True)[:10]
+    return {
+        "module": module,
+        "runs": runs,
+        "min_ms": round(samples[0], 1),
+        "median_ms": round(samples[len(samples) // 2], 1),
+        "lazy_modules_imported": sorted(
+            name for name in imported if name.split(".")[0] in LAZY_MODULES
+        ),
+        "heaviest_ms": {name: round(us / 1000, 1) for name, us in heaviest},
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--module", default="main")
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--budget-ms", type=float, default=1000)
+    args = parser.parse_args()
+
+    report = measure(args.module, args.runs)
+    print(json.dumps(report, indent=2))
+
+    failures = []
+    if report["median_ms"] > args.budget_ms:
+        failures.append(f"importar {args.module} tomó {report['median_ms']}ms (presupuesto {args.budget_ms}ms)")
+    if report["lazy_modules_imported"]:
+        failures.append(f"módulos pesados importados al arrancar: {', '.join(report['lazy_modules_imported'][:5])}")
+    for failure in failures:
+        print(f"ERROR: {failure}", file=sys.stderr)
+    sys.exit(1 if failures else 0)
+
+if __name__ == "__main__":
+    main()
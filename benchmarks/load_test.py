@@ -0,0 +1,258 @@
+"""
+Prueba de carga de extremo a extremo: levanta la app con uvicorn sobre una base SQLite
+temporal y el modelo simulado, y genera tráfico concurrente mezclando peticiones REST
+(/api/products/, /api/recommendations/, /api/chat/message) con conversaciones por /ws.
+
+Reporta en JSON p50/p95/p99, throughput y tasa de error por operación. Con --baseline
+compara contra resultados guardados y termina con código 1 si hay una regresión.
+
+Uso:
+    python -m benchmarks.load_test --duration 20 --concurrency 16 --ws-clients 4
+    python -m benchmarks.load_test --baseline benchmarks/baselines/load_test.json
+    python -m benchmarks.load_test --update-baseline benchmarks/baselines/load_test.json
+"""
+from typing import Dict, List, Optional
+import argparse
+import asyncio
+import json
+import os
+import random
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+from benchmarks.common import CHAT_MESSAGES, expected_messages, latency_summary_ms
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Operaciones REST disponibles para la mezcla: nombre -> (método, ruta, cuerpo)
+HTTP_OPERATIONS = {
+    "products": ("GET", "/api/products/", None),
+    "recommendations": ("GET", "/api/recommendations/", None),
+    "chat": ("POST", "/api/chat/message", "chat"),
+}
+
+DEFAULT_MIX = "products=5,recommendations=3,chat=1"
+
+class Recorder:
+    """Latencias y errores por operación"""
+
+    def __init__(self):
+        self.latencies: Dict[str, List[float]] = {}
+        self.errors: Dict[str, int] = {}
+
+    def record(self, operation: str, elapsed: float, ok: bool):
+        self.latencies.setdefault(operation, []).append(elapsed)
+        if not ok:
+            self.errors[operation] = self.errors.get(operation, 0) + 1
+
+    def summary(self, duration: float) -> Dict[str, dict]:
+        results = {}
+        for operation, latencies in sorted(self.latencies.items()):
+            errors = self.errors.get(operation, 0)
+            results[operation] = {
+                "requests": len(latencies),
+                "throughput_rps": round(len(latencies) / duration, 2),
+                "error_rate": round(errors / len(latencies), 4),
+                "latency_ms": latency_summary_ms(latencies),
+            }
+        return results
+
+def _parse_mix(mix: str) -> Dict[str, int]:
+    weights = {}
+    for item in mix.split(","):
+        name, _, weight = item.partition("=")
+        name = name.strip()
+        if name not in HTTP_OPERATIONS:
+            raise SystemExit(f"Operación desconocida en --mix: {name} (disponibles: {', '.join(HTTP_OPERATIONS)})")
+        weights[name] = int(weight or 1)
+    return {name: weight for name, weight in weights.items() if weight > 0}
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+def _start_server(port: int, workdir: str) -> subprocess.Popen:
+    env = dict(
+        os.environ,
+        DATABASE_URL=f"sqlite+aiosqlite:///{os.path.join(workdir, 'load.db')}",
+        DATABASE_ECHO="false",
+        USE_MOCK_LLM="true",
+        BOOTSTRAP_LOCK_PATH=os.path.join(workdir, "bootstrap.lock"),
+    )
+    return subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "main:app", "--host", "127.0.0.1", "--port", str(port), "--log-level", "warning"],
+        cwd=REPO_ROOT,
+        env=env,
+    )
+
+async def _wait_ready(client, server: subprocess.Popen, timeout: float = 60.0):
+    deadline = time.monotonic() + timeout
+    errors = []
+    while time.monotonic() < deadline:
+        if server.poll() is not None:
+            raise SystemExit(f"El servidor terminó durante el arranque (código {server.returncode})")
+        try:
+            response = await client.get("/ready")
+        except Exception:
+            response = None
+        if response is not None:
+            if response.status_code == 200:
+                return
+            # Las tareas fallidas se reintentan: seguir esperando y reportarlas si no se completan
+            errors = response.json().get("errors", [])
+        await asyncio.sleep(0.2)
+    raise SystemExit(f"El servidor no estuvo listo a tiempo{': ' + '; '.join(errors) if errors else ''}")
+
+async def _http_worker(client, weights: Dict[str, int], deadline: float, recorder: Recorder, rng: random.Random):
+    names = list(weights)
+    cumulative = list(weights.values())
+    while time.monotonic() < deadline:
+        operation = rng.choices(names, weights=cumulative)[0]
+        method, path, body = HTTP_OPERATIONS[operation]
+        payload = {"message": rng.choice(CHAT_MESSAGES)} if body == "chat" else None
+
+        started = time.perf_counter()
+        try:
+            response = await client.request(method, path, json=payload)
+            ok = response.status_code < 400
+        except Exception:
+            ok = False
+        recorder.record(operation, time.perf_counter() - started, ok)
+
+async def _ws_worker(url: str, expected: Dict[str, int], deadline: float, recorder: Recorder, rng: random.Random):
+    """Conversación continua: mide el primer mensaje y el turno completo"""
+    import websockets
+
+    try:
+        async with websockets.connect(url, max_size=None) as ws:
+            await ws.recv()  # bienvenida
+            while time.monotonic() < deadline:
+                text = rng.choice(CHAT_MESSAGES)
+                remaining = expected[text]
+                started = time.perf_counter()
+                first_message: Optional[float] = None
+                ok = True
+                await ws.send(json.dumps({"message": text}))
+                while remaining:
+                    event = json.loads(await asyncio.wait_for(ws.recv(), timeout=30))
+                    if event.get("type") == "ping":
+                        await ws.send(json.dumps({"type": "pong"}))
+                    elif event.get("type") == "message":
+                        if first_message is None:
+                            first_message = time.perf_counter() - started
+                        remaining -= 1
+                    elif event.get("type") == "error":
+                        ok = False
+                        break
+                recorder.record("ws_first_message", first_message or time.perf_counter() - started, ok)
+                recorder.record("ws_turn", time.perf_counter() - started, ok)
+    except Exception:
+        recorder.record("ws_turn", 0.0, False)
+
+def _compare(results: Dict[str, dict], baseline: Dict[str, dict], latency_tolerance: float,
+             error_tolerance: float, min_samples: int) -> List[str]:
+    """Lista de regresiones: p95 por encima de la tolerancia, más errores o menos throughput"""
+    regressions = []
+    for operation, expected in baseline.items():
+        current = results.get(operation)
+        if current is None:
+            regressions.append(f"{operation}: sin resultados")
+            continue
+        if current["error_rate"] > expected["error_rate"] + error_tolerance:
+            regressions.append(f"{operation}: tasa de error {current['error_rate']} > {expected['error_rate']}")
+        # Con pocas muestras los percentiles son ruido: solo se comparan los errores
+        if min(current["requests"], expected["requests"]) < min_samples:
+            continue
+        base_p95 = expected["latency_ms"].get("p95", 0)
+        if base_p95 and current["latency_ms"]["p95"] > base_p95 * (1 + latency_tolerance):
+            regressions.append(f"{operation}: p95 {current['latency_ms']['p95']}ms > {base_p95}ms (+{latency_tolerance:.0%})")
+        if current["throughput_rps"] < expected["throughput_rps"] * (1 - latency_tolerance):
+            regressions.append(f"{operation}: throughput {current['throughput_rps']} < {expected['throughput_rps']} req/s")
+    return regressions
+
+async def _run(args) -> Dict[str, dict]:
+    import httpx
+
+    # Mensajes esperados por texto, según el modelo simulado (misma lógica que el servidor)
+    os.environ["USE_MOCK_LLM"] = "true"
+    from services.chat_service import get_chat_service
+    chat_service = get_chat_service()
+    expected = {text: expected_messages(chat_service, text) for text in CHAT_MESSAGES}
+
+    workdir = tempfile.mkdtemp()
+    port = _free_port()
+    server = _start_server(port, workdir)
+    rng = random.Random(args.seed)
+    recorder = Recorder()
+    try:
+        limits = httpx.Limits(max_connections=args.concurrency, max_keepalive_connections=args.concurrency)
+        async with httpx.AsyncClient(base_url=f"http://127.0.0.1:{port}", limits=limits, timeout=30) as client:
+            await _wait_ready(client, server)
+
+            started = time.monotonic()
+            deadline = started + args.duration
+            workers = [
+                _http_worker(client, _parse_mix(args.mix), deadline, recorder, random.Random(rng.random()))
+                for _ in range(args.concurrency)
+            ]
+            workers += [
+                _ws_worker(f"ws://127.0.0.1:{port}/ws", expected, deadline, recorder, random.Random(rng.random()))
+                for _ in range(args.ws_clients)
+            ]
+            await asyncio.gather(*workers)
+            elapsed = time.monotonic() - started
+    finally:
+        server.terminate()
+        server.wait(timeout=10)
+
+    return recorder.summary(elapsed)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--duration", type=float, default=20.0, help="segundos de carga")
+    parser.add_argument("--concurrency", type=int, default=16, help="clientes HTTP concurrentes")
+    parser.add_argument("--ws-clients", type=int, default=4, help="conversaciones WebSocket concurrentes")
+    parser.add_argument("--mix", default=DEFAULT_MIX, help="pesos de la mezcla REST, p. ej. products=5,chat=1")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--baseline", help="JSON con resultados de referencia para detectar regresiones")
+    parser.add_argument("--update-baseline", help="guarda los resultados como nueva referencia en esta ruta")
+    parser.add_argument("--latency-tolerance", type=float, default=0.25, help="degradación permitida de p95 y throughput")
+    parser.add_argument("--error-tolerance", type=float, default=0.01, help="aumento permitido de la tasa de error")
+    parser.add_argument("--min-samples", type=int, default=50, help="muestras mínimas para comparar latencia y throughput")
+    args = parser.parse_args()
+
+    results = asyncio.run(_run(args))
+    report = {
+        "config": {
+            "duration": args.duration,
+            "concurrency": args.concurrency,
+            "ws_clients": args.ws_clients,
+            "mix": args.mix,
+        },
+        "results": results,
+    }
+
+    if args.update_baseline:
+        os.makedirs(os.path.dirname(os.path.abspath(args.update_baseline)), exist_ok=True)
+        with open(args.update_baseline, "w") as f:
+            json.dump(report, f, indent=2)
+            f.write("\n")
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        report["regressions"] = _compare(
+            results, baseline["results"], args.latency_tolerance, args.error_tolerance, args.min_samples
+        )
+
+    json.dump(report, sys.stdout, indent=2)
+    print()
+
+    if report.get("regressions"):
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,220 @@
+"""
+Micro-benchmarks de las funciones calientes del chat y las recomendaciones sobre
+catálogos y corpus de mensajes sintéticos de distintos tamaños.
+
+Por cada función y tamaño reporta ops/seg, ns por elemento y asignaciones de memoria
+(bytes y bloques por operación, medidos con tracemalloc sobre una muestra). Falla si el
+costo por elemento crece con el tamaño más que --max-scaling veces (regresión
+algorítmica) o, con --baseline, si las ops/seg caen por debajo de la tolerancia.
+
+Uso:
+    python -m benchmarks.micro --sizes 1000,100000,1000000
+    python -m benchmarks.micro --only split_response,default_recommendations --sizes 1000,100000
+    python -m benchmarks.micro --update-baseline benchmarks/baselines/micro.json
+"""
+from typing import Callable, Dict, List
+import argparse
+import asyncio
+import json
+import os
+import random
+import sys
+import time
+import tracemalloc
+
+# Sin echo de SQL ni LLM real: solo se ejercitan funciones puras
+os.environ.setdefault("DATABASE_ECHO", "false")
+os.environ.setdefault("USE_MOCK_LLM", "true")
+
+from models.product import ProductCategory
+from services.chat_service import ChatService
+from services.mock_chat_model import MockChatModel
+from services.recommendation_service import RecommendationService
+from services.scoring_engine import ScoringEngine
+
+BRANDS = ["Apple", "Samsung", "HP", "Dell", "Lenovo", "Asus", "Microsoft", "Google", "Xiaomi", "Logitech"]
+
+MESSAGE_TEMPLATES = [
+    "¿Qué {category} tienen?",
+    "Busco algo de {brand} para trabajar",
+    "¿Cuántas unidades quedan de la {brand} {model}?",
+    "Quiero comprar una {category} {brand} barata",
+    "hola, ¿tienen stock de {model}?",
+    "Necesito un monitor y un teclado para mi pc",
+    "Muéstrame celulares y tablets de gama alta",
+]
+
+MODELS = ["macbook air", "galaxy s23", "thinkpad x1", "pixel 8", "dell xps 13", "surface pro", "imac 24"]
+
+ALLOCATION_SAMPLE = 10_000
+
+class BenchProduct:
+    """Producto liviano con los atributos que leen las funciones medidas (sin ORM)"""
+    __slots__ = ("id", "name", "brand", "category", "price", "stock", "is_active")
+
+    def __init__(self, id, name, brand, category, price, stock):
+        self.id = id
+        self.name = name
+        self.brand = brand
+        self.category = category
+        self.price = price
+        self.stock = stock
+        self.is_active = True
+
+def make_catalog(size: int, rng: random.Random) -> List[BenchProduct]:
+    categories = list(ProductCategory)
+    return [
+        BenchProduct(
+            i + 1,
+            f"Producto {i + 1}",
+            rng.choice(BRANDS),
+            categories[i % len(categories)],
+            round(rng.uniform(20, 3000), 2),
+            rng.randint(1, 30),
+        )
+        for i in range(size)
+    ]
+
+def make_messages(size: int, rng: random.Random) -> List[str]:
+    categories = [category.value.lower() for category in ProductCategory]
+    return [
+        rng.choice(MESSAGE_TEMPLATES).format(
+            category=rng.choice(categories), brand=rng.choice(BRANDS), model=rng.choice(MODELS)
+        )
+        for _ in range(size)
+    ]
+
+def make_responses(size: int, rng: random.Random) -> List[str]:
+    """Respuestas del modelo simulado, mezcladas con respuestas en párrafos y listas"""
+    mock = MockChatModel()
+    canned = [mock._generate_mock_response(text) for text in make_messages(50, rng)]
+    canned.append("Te cuento las opciones:\n\n1. HP Pavilion 15 - $899.99\n2. MacBook Air - $1499.99\n3. ThinkPad X1 - $1299.99\n\n¿Cuál te interesa?")
+    canned.append(("Tenemos envíos a todo el país en 24-48 horas y garantía de un año. " * 3 + "\n\n") * 3)
+    return [rng.choice(canned) for _ in range(size)]
+
+# Cada caso recibe el tamaño y devuelve (preparación, función que procesa todos los elementos)
+def _case_split_response(size, rng):
+    service = ChatService(use_mock=True)
+    responses = make_responses(size, rng)
+    return responses, lambda items: [service._split_response(r) for r in items]
+
+def _case_context_keywords(size, rng):
+    messages = [m.lower() for m in make_messages(size, rng)]
+    return messages, lambda items: [ChatService._scan_context_keywords(m) for m in items]
+
+def _case_interaction_keywords(size, rng):
+    messages = [m.lower() for m in make_messages(size, rng)]
+    return messages, lambda items: [ChatService._scan_interaction_keywords(m) for m in items]
+
+def _case_score_catalog(size, rng):
+    catalog = make_catalog(size, rng)
+    viewed = [product.id for product in catalog if product.id % 7 == 0]
+
+    def score_all(items):
+        engine = ScoringEngine()
+        engine.load_rows([(p.id, p.category, p.brand, p.price, p.stock, p.is_active) for p in items])
+        return engine.score(["laptops", "celulares", "tablets"], ["Apple", "Dell", "HP"], 500.0, 2000.0, viewed)
+
+    return catalog, score_all
+
+def _case_default_recommendations(size, rng):
+    service = RecommendationService(session=None)
+    catalog = make_catalog(size, rng)
+    # La función ordena las listas por categoría: cada corrida recibe una copia
+    return catalog, lambda items: asyncio.run(service._get_default_recommendations(list(items)))
+
+CASES: Dict[str, Callable] = {
+    "split_response": _case_split_response,
+    "build_context_keywords": _case_context_keywords,
+    "track_interactions_keywords": _case_interaction_keywords,
+    "score_catalog": _case_score_catalog,
+    "default_recommendations": _case_default_recommendations,
+}
+
+def _measure(items, run, repeat: int) -> Dict[str, float]:
+    # Tiempo: mejor de `repeat` pasadas completas sobre todos los elementos
+    best = float("inf")
+    for _ in range(repeat):
+        started = time.perf_counter()
+        run(items)
+        best = min(best, time.perf_counter() - started)
+
+    # Asignaciones: una pasada sobre una muestra (tracemalloc ralentiza mucho)
+    sample = items[:ALLOCATION_SAMPLE]
+    tracemalloc.start()
+    before_blocks = sum(stat.count for stat in tracemalloc.take_snapshot().statistics("filename"))
+    tracemalloc.reset_peak()
+    run(sample)
+    _, peak = tracemalloc.get_traced_memory()
+    after_blocks = sum(stat.count for stat in tracemalloc.take_snapshot().statistics("filename"))
+    tracemalloc.stop()
+
+    return {
+        "seconds": round(best, 6),
+        "ops_per_sec": round(len(items) / best, 1),
+        "ns_per_item": round(best / len(items) * 1e9, 1),
+        "peak_bytes_per_item": round(peak / len(sample), 1),
+        "retained_blocks_per_item": round(max(0, after_blocks - before_blocks) / len(sample), 3),
+    }
+
+def _check(results: Dict[str, Dict[str, dict]], max_scaling: float, baseline, tolerance: float) -> List[str]:
+    regressions = []
+    for case, by_size in results.items():
+        sizes = sorted(by_size, key=int)
+        smallest, largest = by_size[sizes[0]], by_size[sizes[-1]]
+        if len(sizes) > 1 and largest["ns_per_item"] > smallest["ns_per_item"] * max_scaling:
+            regressions.append(
+                f"{case}: {largest['ns_per_item']}ns/elemento con {sizes[-1]} vs "
+                f"{smallest['ns_per_item']}ns con {sizes[0]} (> x{max_scaling})"
+            )
+        for size, current in by_size.items():
+            expected = (baseline or {}).get(case, {}).get(size)
+            if expected and current["ops_per_sec"] < expected["ops_per_sec"] * (1 - tolerance):
+                regressions.append(f"{case}[{size}]: {current['ops_per_sec']} ops/s < {expected['ops_per_sec']} ops/s")
+    return regressions
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", default="1000,100000,1000000")
+    parser.add_argument("--only", help=f"casos separados por coma ({', '.join(CASES)})")
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--max-scaling", type=float, default=3.0, help="crecimiento máximo del costo por elemento")
+    parser.add_argument("--baseline", help="JSON de referencia para comparar ops/seg")
+    parser.add_argument("--update-baseline", help="guarda los resultados como nueva referencia en esta ruta")
+    parser.add_argument("--tolerance", type=float, default=0.3, help="caída permitida de ops/seg frente a la referencia")
+    args = parser.parse_args()
+
+    sizes = [int(size) for size in args.sizes.split(",")]
+    selected = args.only.split(",") if args.only else list(CASES)
+    unknown = set(selected) - set(CASES)
+    if unknown:
+        raise SystemExit(f"Casos desconocidos: {', '.join(sorted(unknown))}")
+
+    results: Dict[str, Dict[str, dict]] = {}
+    for case in selected:
+        for size in sizes:
+            items, run = CASES[case](size, random.Random(args.seed))
+            results.setdefault(case, {})[str(size)] = _measure(items, run, args.repeat)
+            print(f"{case}[{size}]: {results[case][str(size)]['ops_per_sec']} ops/s", file=sys.stderr)
+
+    if args.update_baseline:
+        os.makedirs(os.path.dirname(os.path.abspath(args.update_baseline)), exist_ok=True)
+        with open(args.update_baseline, "w") as f:
+            json.dump(results, f, indent=2)
+            f.write("\n")
+
+    baseline = None
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+
+    report = {"results": results, "regressions": _check(results, args.max_scaling, baseline, args.tolerance)}
+    json.dump(report, sys.stdout, indent=2)
+    print()
+
+    if report["regressions"]:
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,149 @@
+"""
+Pedidos concurrentes contra el mismo stock: varios procesos, cada uno con muchas tareas,
+compiten por pocas unidades a través de OrderService.
+
+Verifica que no haya sobreventa (unidades vendidas = stock inicial - stock final, stock
+final >= 0 y una venta por pedido confirmado) y mide los pedidos por segundo.
+
+Uso:
+    python -m benchmarks.orders --workers 4 --concurrency 16 --stock 200
+"""
+import argparse
+import asyncio
+import json
+import multiprocessing as mp
+import os
+import sys
+import tempfile
+import time
+from benchmarks.common import latency_summary_ms
+
+async def _worker(product_ids, attempts: int, concurrency: int, quantity: int, start, results):
+    from database import async_session_maker
+    from services.order_service import OrderService
+
+    counts = {"placed": 0, "out_of_stock": 0, "not_found": 0, "errors": 0}
+    latencies = []
+
+    async def client(index: int):
+        for attempt in range(attempts):
+            product_id = product_ids[(index + attempt) % len(product_ids)]
+            started = time.perf_counter()
+            try:
+                async with async_session_maker() as session:
+                    order = await OrderService(session).place_order(product_id, quantity)
+                counts[order.status] += 1
+            except Exception as e:
+                counts["errors"] += 1
+                print(f"Error en pedido: {e}", file=sys.stderr)
+            latencies.append(time.perf_counter() - started)
+
+    await asyncio.get_running_loop().run_in_executor(None, start.wait)
+    await asyncio.gather(*(client(index) for index in range(concurrency)))
+    results.put({**counts, "latencies": latencies})
+
+def _run_worker(*args):
+    asyncio.run(_worker(*args))
+
+async def _setup(products: int, stock: int):
+    from database import init_db, async_session_maker
+    from models.product import Product, ProductCategory
+
+    await init_db()
+    async with async_session_maker() as session:
+        rows = [
+            Product(
+                name=f"Producto {index}", brand="Makers", model=f"M{index}", category=ProductCategory.LAPTOPS,
+                price=999.99, stock=stock, description="", specifications="{}", is_active=True
+            )
+            for index in range(products)
+        ]
+        session.add_all(rows)
+        await session.commit()
+        return [product.id for product in rows]
+
+async def _totals(product_ids):
+    from sqlalchemy import select, func
+    from database import async_session_maker
+    from models.product import Product, Sale
+
+    async with async_session_maker() as session:
+        stock = (await session.execute(
+            select(func.sum(Product.stock), func.min(Product.stock)).where(Product.id.in_(product_ids))
+        )).one()
+        sales = (await session.execute(
+            select(func.count(Sale.id), func.coalesce(func.sum(Sale.quantity), 0)).where(Sale.product_id.in_(product_ids))
+        )).one()
+    return {"final_stock": stock[0], "min_stock": stock[1], "sales": sales[0], "units_sold": sales[1]}
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--workers", type=int, default=4, help="procesos que compiten por el stock")
+    parser.add_argument("--concurrency", type=int, default=16, help="tareas concurrentes por proceso")
+    parser.add_argument("--attempts", type=int, default=10, help="pedidos por tarea")
+    parser.add_argument("--products", type=int, default=1)
+    parser.add_argument("--stock", type=int, default=200, help="stock inicial de cada producto")
+    parser.add_argument("--quantity", type=int, default=1, help="unidades por pedido")
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix="orders-")
+    # Los procesos hijos heredan el entorno: todos usan la misma base temporal
+    os.environ["DATABASE_URL"] = f"sqlite+aiosqlite:///{os.path.join(workdir, 'orders.db')}"
+    os.environ["DATABASE_ECHO"] = "false"
+    product_ids = asyncio.run(_setup(args.products, args.stock))
+
+    ctx = mp.get_context("spawn")
+    start = ctx.Event()
+    results = ctx.Queue()
+    processes = [
+        ctx.Process(target=_run_worker, args=(product_ids, args.attempts, args.concurrency, args.quantity, start, results))
+        for _ in range(args.workers)
+    ]
+    for process in processes:
+        process.start()
+    # Dar tiempo a que los procesos importen la app antes de largar
+    time.sleep(2)
+    started = time.perf_counter()
+    start.set()
+    collected = [results.get() for _ in processes]
+    elapsed = time.perf_counter() - started
+    for process in processes:
+        process.join()
+
+    totals = asyncio.run(_totals(product_ids))
+    placed = sum(result["placed"] for result in collected)
+    attempts = args.workers * args.concurrency * args.attempts
+    initial_stock = args.products * args.stock
+    oversold = max(0, totals["units_sold"] - initial_stock)
+    consistent = (
+        totals["units_sold"] == initial_stock - totals["final_stock"]
+        and totals["min_stock"] >= 0
+        and totals["sales"] == placed
+    )
+    report = {
+        "workers": args.workers,
+        "concurrency": args.concurrency,
+        "attempts": attempts,
+        "initial_stock": initial_stock,
+        "placed": placed,
+        "out_of_stock": sum(result["out_of_stock"] for result in collected),
+        "errors": sum(result["errors"] for result in collected),
+        **totals,
+        "oversold": oversold,
+        "consistent": consistent,
+        "orders_per_sec": round(placed / elapsed, 1),
+        "attempts_per_sec": round(attempts / elapsed, 1),
+        "latency_ms": latency_summary_ms([latency for result in collected for latency in result["latencies"]]),
+    }
+    json.dump(report, sys.stdout, indent=2)
+    print()
+
+    if oversold or not consistent:
+        print("Sobreventa o inventario inconsistente", file=sys.stderr)
+        sys.exit(1)
+    if report["errors"]:
+        print(f"{report['errors']} pedidos terminaron con error", file=sys.stderr)
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
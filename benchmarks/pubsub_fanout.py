@@ -0,0 +1,99 @@
+"""
+Verifica que los eventos publicados en un worker lleguen a todos los workers a través
+del backend de pub/sub con socket Unix, y mide la latencia de entrega.
+
+Uso:
+    python -m benchmarks.pubsub_fanout --workers 4 --events 500
+"""
+import argparse
+import asyncio
+import json
+import multiprocessing as mp
+import os
+import sys
+import tempfile
+import time
+from benchmarks.common import latency_summary_ms
+
+async def _worker(index: int, socket_path: str, events: int, ready, start, results):
+    from services.pubsub import UnixSocketBackend
+
+    latencies = []
+    done = asyncio.Event()
+
+    async def on_event(topic, payload):
+        latencies.append(time.time() - payload["sent_at"])
+        if len(latencies) >= events:
+            done.set()
+
+    backend = UnixSocketBackend(socket_path)
+    backend.bind(on_event)
+    await backend.start()
+    ready.put(index)
+
+    # Esperar a que todos los workers estén conectados antes de publicar
+    await asyncio.get_running_loop().run_in_executor(None, start.wait)
+    if index == 0:
+        for i in range(events):
+            await backend.publish("inventory", {"event": "stock_changed", "seq": i, "sent_at": time.time()})
+
+    try:
+        await asyncio.wait_for(done.wait(), timeout=30)
+    except asyncio.TimeoutError:
+        pass
+
+    results.put({"worker": index, "pid": os.getpid(), "received": len(latencies), "latencies": latencies})
+    # El broker (si vive en este worker) debe seguir activo hasta que el resto termine
+    await asyncio.get_running_loop().run_in_executor(None, start.wait)
+    await asyncio.sleep(0.5)
+    await backend.stop()
+
+def _run_worker(*args):
+    asyncio.run(_worker(*args))
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--events", type=int, default=500)
+    args = parser.parse_args()
+
+    ctx = mp.get_context("spawn")
+    socket_path = os.path.join(tempfile.mkdtemp(), "events.sock")
+    ready, results, start = ctx.Queue(), ctx.Queue(), ctx.Event()
+
+    processes = [
+        ctx.Process(target=_run_worker, args=(i, socket_path, args.events, ready, start, results))
+        for i in range(args.workers)
+    ]
+    for process in processes:
+        process.start()
+    for _ in processes:
+        ready.get(timeout=30)
+
+    started = time.perf_counter()
+    start.set()
+    reports = [results.get(timeout=60) for _ in processes]
+    elapsed = time.perf_counter() - started
+    for process in processes:
+        process.join(timeout=10)
+
+    latencies = [lat for report in reports for lat in report["latencies"]]
+    delivered = sum(report["received"] for report in reports)
+    expected = args.workers * args.events
+    summary = {
+        "workers": args.workers,
+        "events": args.events,
+        "delivered": delivered,
+        "expected": expected,
+        "per_worker": {report["worker"]: report["received"] for report in sorted(reports, key=lambda r: r["worker"])},
+        "elapsed_s": round(elapsed, 3),
+        "latency_ms": latency_summary_ms(latencies),
+    }
+    print(json.dumps(summary, indent=2))
+
+    if delivered != expected:
+        print(f"ERROR: se entregaron {delivered} de {expected} eventos", file=sys.stderr)
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,133 @@
+"""
+Ranking de recomendaciones: motor vectorizado (NumPy + argpartition) frente a un modelo
+escalar de referencia que calcula el mismo puntaje producto por producto.
+
+Verifica que ambos den los mismos puntajes en el top-k y falla si el p50 del motor
+supera el presupuesto (por defecto 1 ms para 100k productos).
+
+Uso:
+    python -m benchmarks.ranking --products 100000 --budget-ms 1
+"""
+import argparse
+import json
+import random
+import sys
+import time
+from benchmarks.common import latency_summary_ms
+from benchmarks.micro import make_catalog
+from services.scoring_engine import ScoringEngine
+from services.trending import trending_counters
+
+PREFERENCES = {
+    "preferred_categories": ["laptops", "celulares"],
+    "preferred_brands": ["Apple", "Dell", "Samsung"],
+    "price_min": 500.0,
+    "price_max": 2000.0,
+}
+
+def reference_score(product, preferred_categories, preferred_brands, price_min, price_max, already_viewed) -> float:
+    """Definición escalar del puntaje de recomendación (0-100) que implementa ScoringEngine"""
+    score = 0.0
+    
+    # Categoría (0-35) y marca (0-25) según su posición en las preferencias
+    preferred_categories_lower = [category.lower() for category in preferred_categories]
+    category = product.category.value.lower()
+    if category in preferred_categories_lower:
+        score += max(35 - preferred_categories_lower.index(category) * 5, 20)
+    if product.brand in preferred_brands:
+        score += max(25 - preferred_brands.index(product.brand) * 3, 15)
+    
+    # Precio (0-20): penalización proporcional por debajo o por encima del rango
+    if price_min <= product.price <= price_max:
+        score += 20
+    elif product.price < price_min:
+        score += max(0, 20 - (price_min - product.price) / price_min * 30)
+    else:
+        score += max(0, 20 - (product.price - price_max) / price_max * 20)
+    
+    # Disponibilidad (5-15) y tendencia (0-5)
+    score += 15 if product.stock > 10 else 10 if product.stock > 5 else 5
+    score += trending_counters.points_for(product.id)
+    
+    if already_viewed:
+        score *= 0.7
+    return min(100, max(0, score))
+
+def _scalar_top(catalog, viewed, k):
+    scores = []
+    for product in catalog:
+        if not product.is_active or product.stock <= 0:
+            continue
+        score = reference_score(
+            product,
+            PREFERENCES["preferred_categories"],
+            PREFERENCES["preferred_brands"],
+            PREFERENCES["price_min"],
+            PREFERENCES["price_max"],
+            product.id in viewed
+        )
+        scores.append((score, product.id))
+    scores.sort(key=lambda item: (-item[0], item[1]))
+    return scores[:k]
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--products", type=int, default=100_000)
+    parser.add_argument("--k", type=int, default=18)
+    parser.add_argument("--repeat", type=int, default=200)
+    parser.add_argument("--budget-ms", type=float, default=1.0, help="p50 máximo del ranking vectorizado")
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    catalog = make_catalog(args.products, rng)
+    viewed = {rng.randint(1, args.products) for _ in range(200)}
+
+    engine = ScoringEngine()
+    engine.load_rows([(p.id, p.category, p.brand, p.price, p.stock, p.is_active) for p in catalog])
+
+    def rank():
+        scores = engine.score(
+            PREFERENCES["preferred_categories"], PREFERENCES["preferred_brands"],
+            PREFERENCES["price_min"], PREFERENCES["price_max"], viewed
+        )
+        return scores, engine.top_k(scores, args.k)
+
+    rank()  # calentar
+    latencies = []
+    for _ in range(args.repeat):
+        started = time.perf_counter()
+        scores, top = rank()
+        latencies.append(time.perf_counter() - started)
+
+    started = time.perf_counter()
+    expected = _scalar_top(catalog, viewed, args.k)
+    scalar_seconds = time.perf_counter() - started
+
+    # float32 frente a float64: se comparan los puntajes con tolerancia
+    vector_scores = [float(scores[row]) for row in top]
+    mismatches = [
+        (e, round(v, 3)) for (e, _), v in zip(expected, vector_scores) if abs(e - v) > 1e-3
+    ]
+
+    summary = latency_summary_ms(latencies)
+    report = {
+        "products": args.products,
+        "k": args.k,
+        "vectorized_ms": summary,
+        "scalar_ms": round(scalar_seconds * 1000, 1),
+        "speedup": round(scalar_seconds * 1000 / summary["p50"], 1),
+        "top_k_matches_scalar": not mismatches and len(expected) == len(vector_scores),
+    }
+    json.dump(report, sys.stdout, indent=2)
+    print()
+
+    if mismatches or len(expected) != len(vector_scores):
+        print(f"Los puntajes difieren del modelo escalar: {mismatches[:5]}", file=sys.stderr)
+        sys.exit(1)
+    if summary["p50"] > args.budget_ms:
+        print(f"p50 {summary['p50']}ms supera el presupuesto de {args.budget_ms}ms", file=sys.stderr)
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,78 @@
+"""
+Compara el protocolo JSON (predeterminado) con el subprotocolo compacto MessagePack
+del WebSocket: bytes y frames recibidos por turno de conversación.
+
+Usa el modelo simulado y una base SQLite temporal.
+
+Uso:
+    python -m benchmarks.ws_protocol --turns 5
+"""
+import argparse
+import json
+import os
+import sys
+import tempfile
+from benchmarks.common import CHAT_MESSAGES, expected_messages
+
+def _run_turns(client, chat_service, turns: int, subprotocol=None):
+    import msgpack
+
+    kwargs = {"subprotocols": [subprotocol]} if subprotocol else {}
+    frames = 0
+    total_bytes = 0
+    with client.websocket_connect("/ws", **kwargs) as ws:
+        compact = subprotocol is not None
+        if compact:
+            assert ws.accepted_subprotocol == subprotocol, "El servidor no aceptó el subprotocolo compacto"
+
+        def receive_events():
+            nonlocal frames, total_bytes
+            message = ws.receive()
+            frames += 1
+            if compact:
+                total_bytes += len(message["bytes"])
+                return msgpack.unpackb(message["bytes"])
+            total_bytes += len(message["text"].encode())
+            return [json.loads(message["text"])]
+
+        receive_events()  # bienvenida
+        frames, total_bytes = 0, 0
+
+        for i in range(turns):
+            text = CHAT_MESSAGES[i % len(CHAT_MESSAGES)]
+            remaining = expected_messages(chat_service, text)
+            ws.send_text(json.dumps({"message": text}))
+            while remaining:
+                for event in receive_events():
+                    if event.get("type") == "message":
+                        remaining -= 1
+
+    return {"frames_per_turn": round(frames / turns, 2), "bytes_per_turn": round(total_bytes / turns, 1)}
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--turns", type=int, default=5)
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp()
+    os.environ["DATABASE_URL"] = f"sqlite+aiosqlite:///{os.path.join(workdir, 'bench.db')}"
+    os.environ["USE_MOCK_LLM"] = "true"
+
+    from fastapi.testclient import TestClient
+    import main as app_module
+    from api.websocket import COMPACT_SUBPROTOCOL
+    from services.chat_service import get_chat_service
+
+    with TestClient(app_module.app) as client:
+        results = {
+            "json": _run_turns(client, get_chat_service(), args.turns),
+            "compact": _run_turns(client, get_chat_service(), args.turns, COMPACT_SUBPROTOCOL),
+        }
+
+    json_bytes = results["json"]["bytes_per_turn"]
+    results["compact"]["bytes_saved_pct"] = round(100 * (1 - results["compact"]["bytes_per_turn"] / json_bytes), 1)
+    json.dump(results, sys.stdout, indent=2)
+    print()
+
+if __name__ == "__main__":
+    main()
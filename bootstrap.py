@@ -0,0 +1,170 @@
+from typing import Awaitable, Callable, Dict, List, Any
+from datetime import datetime
+import asyncio
+import logging
+import os
+import time
+
+try:
+    import fcntl
+except ImportError:  # Windows: sin lock entre procesos (usar un solo worker)
+    fcntl = None
+
+from sqlalchemy import text
+from database import init_db, async_session_maker
+from services.inventory_service import InventoryService
+from services.chat_service import get_chat_service
+from services.scoring_engine import scoring_engine
+from services.reservations import stock_reservations
+from services.trending import trending_counters
+from services.recently_viewed import recently_viewed
+from services.cooccurrence import cooccurrence_index
+from services.content_index import content_index
+from services.recommendation_snapshots import recommendation_snapshots
+from config import settings
+
+logger = logging.getLogger(__name__)
+
+# El lanzador de producción lo define cuando el bootstrap ya se ejecutó antes de crear los workers
+BOOTSTRAPPED_ENV = "MAKERS_BOOTSTRAPPED"
+
+WarmupHook = Callable[[], Awaitable[None]]
+
+_warmup_hooks: List[WarmupHook] = []
+
+readiness: Dict[str, Any] = {
+    "ready": False,
+    "warmup_finished": False,
+    "warmup_attempts": 0,
+    "warmup_started_at": None,
+    "warmup_seconds": None,
+    "failed_hooks": [],
+    "errors": []
+}
+
+async def _acquire_lock(lock_file):
+    # flock bloquea el hilo: esperar en un hilo aparte para no frenar el event loop
+    await asyncio.to_thread(fcntl.flock, lock_file.fileno(), fcntl.LOCK_EX)
+
+async def bootstrap():
+    """Crea las tablas y carga los datos iniciales. Es idempotente"""
+    await init_db()
+    async with async_session_maker() as session:
+        inventory_service = InventoryService(session)
+        await inventory_service.init_synthetic_data()
+    logger.info("Base de datos inicializada y datos sintéticos cargados")
+
+async def bootstrap_once() -> bool:
+    """
+    Ejecuta el bootstrap bajo un lock de archivo para que varios procesos no compitan
+    por `create_all` y la carga de datos. Devuelve False si ya lo hizo el lanzador.
+    """
+    if os.environ.get(BOOTSTRAPPED_ENV) == "1":
+        return False
+
+    if fcntl is None:
+        await bootstrap()
+        return True
+
+    with open(settings.bootstrap_lock_path, "a+") as lock_file:
+        await _acquire_lock(lock_file)
+        try:
+            await bootstrap()
+        finally:
+            fcntl.flock(lock_file.fileno(), fcntl.LOCK_UN)
+    return True
+
+def register_warmup(hook: WarmupHook):
+    """Registra una tarea de calentamiento (caches, clientes) que corre al iniciar cada worker"""
+    if hook not in _warmup_hooks:
+        _warmup_hooks.append(hook)
+
+async def _warm_database_pool():
+    async with async_session_maker() as session:
+        await session.execute(text("SELECT 1"))
+
+async def _warm_chat_service():
+    await get_chat_service().warm_up()
+
+async def _warm_trending_counters():
+    async with async_session_maker() as session:
+        await trending_counters.ensure_loaded(session)
+
+async def _warm_recently_viewed():
+    async with async_session_maker() as session:
+        await recently_viewed.ensure_loaded(session)
+
+async def _warm_stock_reservations():
+    async with async_session_maker() as session:
+        await stock_reservations.ensure_loaded(session)
+
+async def _warm_scoring_engine():
+    async with async_session_maker() as session:
+        await scoring_engine.ensure_loaded(session)
+
+async def _warm_cooccurrence_index():
+    async with async_session_maker() as session:
+        await cooccurrence_index.ensure_loaded(session)
+
+async def _warm_content_index():
+    async with async_session_maker() as session:
+        await content_index.ensure_loaded(session)
+
+async def _warm_recommendation_snapshot():
+    await recommendation_snapshots.refresh()
+
+register_warmup(_warm_database_pool)
+register_warmup(_warm_chat_service)
+register_warmup(_warm_stock_reservations)
+register_warmup(_warm_trending_counters)
+register_warmup(_warm_recently_viewed)
+register_warmup(_warm_scoring_engine)
+register_warmup(_warm_cooccurrence_index)
+register_warmup(_warm_content_index)
+register_warmup(_warm_recommendation_snapshot)
+
+_failed_hooks: List[WarmupHook] = []
+
+async def _run_hooks(hooks: List[WarmupHook]):
+    readiness["warmup_attempts"] += 1
+    failed, errors = [], []
+    for hook in hooks:
+        try:
+            await hook()
+        except Exception as e:
+            logger.error(f"Error en calentamiento {hook.__name__}: {e}")
+            failed.append(hook)
+            errors.append(f"{hook.__name__}: {e}")
+    _failed_hooks[:] = failed
+    readiness["failed_hooks"] = [hook.__name__ for hook in failed]
+    readiness["errors"] = errors
+    readiness["ready"] = not failed
+
+async def warm_up():
+    """
+    Ejecuta las tareas de calentamiento. El worker queda listo solo si todas terminaron bien;
+    si alguna falla, /ready responde 503 con las tareas fallidas en el cuerpo hasta que
+    retry_warm_up las complete.
+    """
+    readiness["warmup_started_at"] = datetime.now().isoformat()
+    started = time.perf_counter()
+    await _run_hooks(_warmup_hooks)
+    readiness["warmup_seconds"] = round(time.perf_counter() - started, 3)
+    readiness["warmup_finished"] = True
+    if readiness["ready"]:
+        logger.info(f"Calentamiento completado en {readiness['warmup_seconds']}s")
+    else:
+        logger.error(
+            f"Calentamiento terminado con fallas en {readiness['warmup_seconds']}s: "
+            f"{', '.join(readiness['failed_hooks'])}; se reintentan antes de marcar el worker como listo"
+        )
+
+async def retry_warm_up():
+    """Reintenta las tareas fallidas con espera exponencial hasta que todas terminen bien"""
+    delay = settings.warmup_retry_backoff
+    while _failed_hooks:
+        await asyncio.sleep(delay)
+        delay = min(delay * 2, settings.warmup_retry_max_backoff)
+        await _run_hooks(list(_failed_hooks))
+        if readiness["ready"]:
+            logger.info(f"Calentamiento completado tras {readiness['warmup_attempts']} intentos")
@@ -5,11 +5,86 @@ import os
 class Settings(BaseSettings):
     app_name: str = "Makers Tech ChatBot"
     database_url: str = "sqlite+aiosqlite:///./makers_tech.db"
+    database_echo: bool = True
+    # SQLite: WAL para que las lecturas largas no bloqueen a los escritores (ni al revés) y
+    # espera ante un lock antes de fallar con "database is locked"
+    sqlite_wal: bool = True
+    sqlite_busy_timeout_ms: int = 5000
     openai_api_key: Optional[str] = os.getenv("OPENAI_API_KEY", "")
     use_mock_llm: bool = True
     cors_origins: list = ["*"]
     
+    # Servidor de producción (serve.py)
+    host: str = "0.0.0.0"
+    port: int = 8000
+    workers: int = 1
+    bootstrap_lock_path: str = "./makers_tech.bootstrap.lock"
+    # Reintentos de las tareas de calentamiento que fallan (espera inicial y máxima, en segundos)
+    warmup_retry_backoff: float = 1.0
+    warmup_retry_max_backoff: float = 60.0
+    
+    # WebSocket: mensajes procesados en paralelo y mensajes en cola por conexión
+    ws_message_concurrency: int = 1
+    ws_max_pending_messages: int = 8
+    # Cola de salida por socket, heartbeats y desconexión de clientes lentos o inactivos
+    ws_send_queue_size: int = 256
+    ws_send_timeout: float = 10.0
+    ws_heartbeat_interval: float = 20.0
+    ws_idle_timeout: float = 60.0
+    # Modo compacto (subprotocolo MessagePack): eventos por frame y espera para agruparlos
+    ws_batch_max_events: int = 32
+    ws_batch_linger: float = 0.005
+    
+    # Pub/sub de eventos: "memory" (un proceso) o "unix" (broker local entre workers)
+    pubsub_backend: str = "memory"
+    pubsub_socket_path: str = "/tmp/makers_tech_events.sock"
+    
+    # Perfilado de SQL por petición (sin costo si está desactivado)
+    sql_profiling: bool = False
+    sql_slow_query_ms: float = 100.0
+    sql_slow_query_sample_rate: float = 1.0
+    sql_n_plus_one_threshold: int = 5
+    sql_server_timing: bool = False
+    
+    # Productos relacionados: vecinos precalculados por producto, vida media de los pesos
+    # de co-ocurrencia y pausa máxima entre eventos de una misma sesión
+    related_top_k: int = 20
+    cooccurrence_half_life_days: float = 14.0
+    cooccurrence_session_gap_minutes: float = 30.0
+    
+    # Vida media de los contadores de preferencias (categorías, marcas y bandas de precio)
+    preference_half_life_days: float = 7.0
+    
+    # Retención de user_interactions: días en crudo, lotes del rollup diario y archivo opcional
+    # (directorio para JSONL comprimido; vacío = solo borrar)
+    interaction_retention_days: int = 90
+    interaction_rollup_batch_size: int = 5000
+    interaction_rollup_batch_pause: float = 0.05
+    interaction_rollup_interval: float = 3600.0
+    interaction_archive_dir: str = ""
+    
+    # Reservas de stock mientras se confirma una compra
+    reservation_ttl_seconds: float = 600.0
+    reservation_sweep_interval: float = 30.0
+    
+    # Archivo del historial de chat: segmentos comprimidos para conversaciones limpiadas o viejas
+    chat_archive_dir: str = "./chat_archive"
+    chat_archive_after_days: int = 30
+    chat_archive_batch_size: int = 2000
+    chat_archive_batch_pause: float = 0.05
+    chat_archive_interval: float = 600.0
+    chat_archive_segment_bytes: int = 8 * 1024 * 1024
+    
+    # Búsquedas más frecuentes y sin resultados: contadores por sketch y snapshot en disco
+    search_analytics_capacity: int = 256
+    search_analytics_path: str = "./search_analytics.json"
+    search_analytics_snapshot_interval: float = 60.0
+    
+    # Snapshot de recomendaciones: espera para agrupar cambios y antigüedad máxima servida
+    recommendation_refresh_debounce: float = 0.5
+    recommendation_max_staleness: float = 5.0
+    
     class Config:
         env_file = ".env"
 
-settings = Settings() 
\ No newline at end of file
+settings = Settings() 
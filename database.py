@@ -1,25 +1,58 @@
 from sqlalchemy.ext.asyncio import create_async_engine, AsyncSession, async_sessionmaker
+from sqlalchemy import event, inspect, text
 from sqlalchemy.orm import sessionmaker
-from models.product import Base, Product, Sale
-from models.user_interaction import UserInteraction, GlobalUserPreference
-from models.chat import ChatHistory
+from models.product import Base, Product, Sale, StockReservation
+from models.user_interaction import UserInteraction, GlobalUserPreference, InteractionDailyRollup
+from models.chat import ChatHistory, ChatState
 from config import settings
 from typing import AsyncGenerator
 
 engine = create_async_engine(
     settings.database_url,
-    echo=True,
+    echo=settings.database_echo,
 )
 
+def _sqlite_pragmas(dbapi_connection, connection_record):
+    cursor = dbapi_connection.cursor()
+    if settings.sqlite_wal:
+        cursor.execute("PRAGMA journal_mode=WAL")
+    cursor.execute(f"PRAGMA busy_timeout={int(settings.sqlite_busy_timeout_ms)}")
+    cursor.close()
+
+if engine.dialect.name == "sqlite":
+    event.listen(engine.sync_engine, "connect", _sqlite_pragmas)
+
 async_session_maker = sessionmaker(
     engine, 
     class_=AsyncSession, 
     expire_on_commit=False
 )
 
+def _create_missing_indexes(connection):
+    # create_all no agrega índices nuevos a tablas que ya existían
+    for table in Base.metadata.sorted_tables:
+        for index in table.indexes:
+            index.create(connection, checkfirst=True)
+
+def _create_missing_columns(connection):
+    # create_all tampoco agrega columnas nuevas (todas son opcionales) a tablas existentes;
+    # con server_default las filas existentes toman ese valor
+    inspector = inspect(connection)
+    ddl_compiler = connection.dialect.ddl_compiler(connection.dialect, None)
+    for table in Base.metadata.sorted_tables:
+        existing = {column["name"] for column in inspector.get_columns(table.name)}
+        for column in table.columns:
+            if column.name not in existing and column.nullable:
+                column_type = column.type.compile(dialect=connection.dialect)
+                default = ddl_compiler.get_column_default_string(column)
+                default_clause = f" DEFAULT {default}" if default is not None else ""
+                connection.execute(text(f'ALTER TABLE {table.name} ADD COLUMN "{column.name}" {column_type}{default_clause}'))
+
 async def init_db():
     async with engine.begin() as conn:
         await conn.run_sync(Base.metadata.create_all)
+        await conn.run_sync(_create_missing_columns)
+        await conn.run_sync(_create_missing_indexes)
 
 async def get_session() -> AsyncGenerator[AsyncSession, None]:
     async with async_session_maker() as session:
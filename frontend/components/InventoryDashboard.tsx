@@ -1,8 +1,8 @@
 'use client';
 
-import { useState, useEffect } from 'react';
+import { useState, useEffect, useRef } from 'react';
 import { motion } from 'framer-motion';
-import { FaBox, FaChartPie, FaDollarSign, FaWarehouse, FaShoppingCart, FaSync } from 'react-icons/fa';
+import { FaBox, FaChartPie, FaDollarSign, FaWarehouse, FaShoppingCart } from 'react-icons/fa';
 import { BarChart, Bar, PieChart, Pie, Cell, XAxis, YAxis, CartesianGrid, Tooltip, Legend, ResponsiveContainer } from 'recharts';
 import { productAPI } from '@/lib/api';
 
@@ -12,10 +12,47 @@ export default function InventoryDashboard() {
   const [recentSales, setRecentSales] = useState<any>(null);
   const [loading, setLoading] = useState(true);
 
+  const inventoryRefreshRef = useRef<ReturnType<typeof setTimeout> | null>(null);
+
   useEffect(() => {
     fetchData();
   }, []);
 
+  // Actualizaciones en tiempo real: el servidor publica cambios de inventario y ventas
+  useEffect(() => {
+    const websocketUrl = process.env.NEXT_PUBLIC_WS_URL || 'ws://localhost:8000/ws';
+    const ws = new WebSocket(websocketUrl);
+
+    ws.onopen = () => {
+      ws.send(JSON.stringify({ type: 'subscribe', topics: ['inventory', 'sales'] }));
+    };
+
+    ws.onmessage = (event) => {
+      const data = JSON.parse(event.data);
+      if (data.type === 'ping') {
+        ws.send(JSON.stringify({ type: 'pong' }));
+        return;
+      }
+      if (data.type !== 'event') return;
+
+      if (data.topic === 'sales' && data.event === 'sale_created') {
+        setRecentSales((prev: any) => {
+          const sales = [data.data, ...(prev?.sales || [])].slice(0, 10);
+          return { sales, total: sales.length };
+        });
+      } else if (data.topic === 'inventory') {
+        // Agrupar ráfagas de cambios en una sola recarga del resumen
+        if (inventoryRefreshRef.current) clearTimeout(inventoryRefreshRef.current);
+        inventoryRefreshRef.current = setTimeout(fetchInventory, 500);
+      }
+    };
+
+    return () => {
+      if (inventoryRefreshRef.current) clearTimeout(inventoryRefreshRef.current);
+      ws.close();
+    };
+  }, []);
+
   const fetchData = async () => {
     try {
       console.log('Fetching inventory data...');
@@ -51,13 +88,12 @@ export default function InventoryDashboard() {
     }
   };
 
-  const fetchSales = async () => {
+  const fetchInventory = async () => {
     try {
-      const salesResponse = await fetch('http://localhost:8000/api/products/sales/recent');
-      const sales = await salesResponse.json();
-      setRecentSales(sales);
+      const inventory = await productAPI.getInventorySummary();
+      setInventoryData(inventory);
     } catch (error) {
-      console.error('Error fetching sales:', error);
+      console.error('Error fetching inventory:', error);
     }
   };
 
@@ -318,16 +354,7 @@ export default function InventoryDashboard() {
       >
         <div className="flex items-center justify-between mb-4">
           <h3 className="text-lg font-semibold text-gray-900">Ventas Recientes</h3>
-          <div className="flex items-center gap-2">
-            <button
-              onClick={fetchSales}
-              className="p-2 text-gray-600 hover:text-green-600 transition-colors"
-              title="Actualizar ventas"
-            >
-              <FaSync className="text-lg" />
-            </button>
-            <FaShoppingCart className="text-green-600 text-xl" />
-          </div>
+          <FaShoppingCart className="text-green-600 text-xl" />
         </div>
         <div className="space-y-3">
           {recentSales?.sales?.map((sale: any) => (
@@ -26,6 +26,12 @@ export function useWebSocket(url: string) {
     ws.onmessage = (event) => {
       const data = JSON.parse(event.data);
       
+      // Heartbeat del servidor: responder para no ser desconectado por inactividad
+      if (data.type === 'ping') {
+        ws.send(JSON.stringify({ type: 'pong' }));
+        return;
+      }
+      
       if (data.type === 'typing') {
         setIsTyping(true);
       } else if (data.type === 'welcome') {
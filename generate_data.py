@@ -0,0 +1,395 @@
+"""
+Generador de datos sintéticos a escala: productos de todas las categorías, interacciones,
+historial de chat y ventas con popularidad Zipf y repartidos en el tiempo.
+
+Es determinista para una misma semilla y carga por lotes con INSERT multi-fila
+(executemany de SQLAlchemy Core) dentro de transacciones grandes; en SQLite además
+relaja la durabilidad durante la carga.
+
+Uso:
+    python generate_data.py --products 1000000 --interactions 5000000 --chats 2000000 --sales 500000
+    python generate_data.py --database-url sqlite+aiosqlite:///./big.db --reset --seed 7
+"""
+from typing import Dict, Iterator, List, Tuple
+from array import array
+from datetime import datetime, timedelta
+from itertools import accumulate
+import argparse
+import asyncio
+import json
+import logging
+from math import gcd
+import random
+import time
+from sqlalchemy import event, func, select
+from sqlalchemy.ext.asyncio import create_async_engine
+from models.product import Base, Product, ProductCategory, Sale
+from models.user_interaction import UserInteraction
+from models.chat import ChatHistory
+from config import settings
+
+logging.basicConfig(level=logging.INFO, format="%(message)s")
+logger = logging.getLogger(__name__)
+
+# Catálogo base por categoría: líneas de producto por marca, rango de precios y atributos de especificaciones
+CATALOG: Dict[ProductCategory, dict] = {
+    ProductCategory.LAPTOPS: {
+        "label": "Laptop",
+        "lines": {"HP": ["Pavilion", "ProBook", "EliteBook"], "Dell": ["XPS", "Inspiron", "Latitude"], "Lenovo": ["ThinkPad", "IdeaPad", "Yoga"],
+                  "Apple": ["MacBook Air", "MacBook Pro"], "Asus": ["ZenBook", "VivoBook"], "Acer": ["Swift", "Aspire"], "Microsoft": ["Surface Laptop"]},
+        "price": (350, 3500),
+        "specs": {"procesador": ["Intel Core i5-1235U", "Intel Core i7-1255U", "AMD Ryzen 5 5500U", "AMD Ryzen 7 7730U", "Apple M2", "Apple M3"],
+                  "ram": ["8GB DDR4", "16GB DDR4", "16GB DDR5", "32GB DDR5"],
+                  "almacenamiento": ["256GB SSD", "512GB SSD", "1TB SSD", "2TB SSD"],
+                  "pantalla": ["13.3 pulgadas", "14 pulgadas Full HD", "15.6 pulgadas Full HD", "16 pulgadas 2.5K"]},
+    },
+    ProductCategory.COMPUTADORAS: {
+        "label": "Desktop",
+        "lines": {"Dell": ["OptiPlex", "Inspiron Desktop"], "HP": ["Elite Tower", "Pavilion Desktop"], "Lenovo": ["ThinkCentre"],
+                  "Apple": ["iMac", "Mac mini"], "Asus": ["ROG Strix"]},
+        "price": (450, 4000),
+        "specs": {"procesador": ["Intel Core i5-12500", "Intel Core i7-13700", "Intel Core i9-13900", "AMD Ryzen 7 7700", "Apple M3"],
+                  "ram": ["8GB DDR4", "16GB DDR4", "32GB DDR5", "64GB DDR5"],
+                  "almacenamiento": ["256GB SSD", "512GB SSD", "1TB SSD", "2TB HDD + 512GB SSD"]},
+    },
+    ProductCategory.TABLETS: {
+        "label": "Tablet",
+        "lines": {"Apple": ["iPad", "iPad Air", "iPad Pro"], "Samsung": ["Galaxy Tab S9", "Galaxy Tab A"], "Microsoft": ["Surface Pro"],
+                  "Lenovo": ["Tab P11"], "Xiaomi": ["Pad 6"]},
+        "price": (150, 2200),
+        "specs": {"procesador": ["Apple A15", "Apple M2", "Snapdragon 8 Gen 2", "MediaTek Helio G99", "Intel Core i5"],
+                  "ram": ["4GB", "6GB", "8GB", "16GB"],
+                  "almacenamiento": ["64GB", "128GB", "256GB", "512GB"],
+                  "pantalla": ["10.9 pulgadas", "11 pulgadas", "12.4 pulgadas", "13 pulgadas"]},
+    },
+    ProductCategory.CELULARES: {
+        "label": "Celular",
+        "lines": {"Apple": ["iPhone 15", "iPhone 15 Pro"], "Samsung": ["Galaxy S24", "Galaxy A54"], "Google": ["Pixel 8", "Pixel 8 Pro"],
+                  "Xiaomi": ["Redmi Note 13"], "OnePlus": ["OnePlus 12"], "Motorola": ["Moto G84"]},
+        "price": (150, 1800),
+        "specs": {"procesador": ["Apple A17 Pro", "Snapdragon 8 Gen 3", "Google Tensor G3", "Exynos 1380", "Dimensity 7050"],
+                  "ram": ["4GB", "6GB", "8GB", "12GB"],
+                  "almacenamiento": ["128GB", "256GB", "512GB", "1TB"],
+                  "camara": ["48MP", "50MP", "108MP", "200MP"]},
+    },
+    ProductCategory.MONITORES: {
+        "label": "Monitor",
+        "lines": {"LG": ["UltraGear"], "Samsung": ["Odyssey"], "Dell": ["UltraSharp"], "BenQ": ["Zowie"], "Asus": ["ProArt", "TUF Gaming"]},
+        "price": (120, 1500),
+        "specs": {"tamaño": ["24 pulgadas", "27 pulgadas", "32 pulgadas", "34 pulgadas ultrawide"],
+                  "resolucion": ["Full HD", "QHD", "4K UHD"],
+                  "frecuencia": ["60Hz", "144Hz", "165Hz", "240Hz"]},
+    },
+    ProductCategory.PERIFERICOS: {
+        "label": "Periférico",
+        "lines": {"Logitech": ["MX Master", "MX Keys"], "Razer": ["DeathAdder", "BlackWidow"], "Corsair": ["K70"], "HP": ["225"], "Microsoft": ["Sculpt"]},
+        "price": (15, 300),
+        "specs": {"conexion": ["USB", "Bluetooth", "Inalámbrico 2.4GHz"],
+                  "tipo": ["Mouse", "Teclado mecánico", "Teclado", "Combo teclado y mouse"]},
+    },
+    ProductCategory.ACCESORIOS: {
+        "label": "Accesorio",
+        "lines": {"Logitech": ["Brio", "StreamCam"], "Sony": ["WH-1000XM5"], "Apple": ["AirPods"], "Samsung": ["Galaxy Buds"], "JBL": ["Tune"]},
+        "price": (10, 450),
+        "specs": {"tipo": ["Audífonos", "Auriculares", "Webcam", "Cargador", "Funda"],
+                  "conexion": ["USB-C", "Bluetooth", "Lightning", "Jack 3.5mm"]},
+    },
+    ProductCategory.IMPRESORAS: {
+        "label": "Impresora",
+        "lines": {"HP": ["LaserJet", "DeskJet"], "Epson": ["EcoTank"], "Canon": ["PIXMA"], "Brother": ["HL-L2350"]},
+        "price": (80, 1200),
+        "specs": {"tipo": ["Láser", "Inyección de tinta", "Tanque de tinta"],
+                  "conectividad": ["USB", "WiFi", "WiFi + Ethernet"],
+                  "color": ["Monocromática", "Color"]},
+    },
+}
+
+# Peso relativo de cada categoría en el catálogo
+CATEGORY_WEIGHTS = {
+    ProductCategory.ACCESORIOS: 20, ProductCategory.PERIFERICOS: 18, ProductCategory.CELULARES: 16,
+    ProductCategory.LAPTOPS: 14, ProductCategory.MONITORES: 10, ProductCategory.TABLETS: 9,
+    ProductCategory.COMPUTADORAS: 8, ProductCategory.IMPRESORAS: 5,
+}
+
+INTERACTION_TYPES = (("view", 60), ("search", 15), ("chat_mention", 15), ("recommendation_click", 10))
+
+SALE_STATUSES = (("confirmed", 80), ("pending", 15), ("cancelled", 5))
+
+USER_MESSAGES = [
+    "¿Qué {label} tienen?", "Busco {label} {brand}", "¿Cuánto cuesta la {series}?",
+    "¿Tienen stock de {series}?", "Quiero comprar una {series}", "Sí, confirmo la compra",
+    "¿Cuál me recomiendas para trabajar?", "Muéstrame opciones más baratas",
+]
+
+ASSISTANT_MESSAGES = [
+    "¡Claro! Te muestro nuestras opciones de {label} disponibles",
+    "La {brand} {series} cuesta ${price} y quedan {stock} unidades",
+    "¿Estás seguro que quieres comprar {brand} {series}?",
+    "¡Perfecto! Tu pedido de {brand} {series} está registrado",
+]
+
+# Líneas de producto (categoría, marca, serie) indexadas para guardarlas en arrays compactos
+LINES: List[Tuple[ProductCategory, str, str]] = [
+    (category, brand, series)
+    for category, catalog in CATALOG.items()
+    for brand, series_list in catalog["lines"].items()
+    for series in series_list
+]
+LINES_BY_CATEGORY: Dict[ProductCategory, List[int]] = {}
+for _index, (_category, _, _) in enumerate(LINES):
+    LINES_BY_CATEGORY.setdefault(_category, []).append(_index)
+
+class ZipfSampler:
+    """
+    Muestrea ids de producto con popularidad Zipf. El rango de popularidad se asigna
+    con una permutación afín de los ids (fija por semilla) para no guardar una lista barajada.
+    """
+
+    def __init__(self, count: int, exponent: float, rng: random.Random):
+        self.count = count
+        self.ranks = range(count)
+        self.cum_weights = array("d", accumulate(1.0 / (rank ** exponent) for rank in range(1, count + 1)))
+        self.multiplier = rng.randrange(1, count) if count > 1 else 1
+        while gcd(self.multiplier, count) != 1:
+            self.multiplier += 1
+        self.offset = rng.randrange(count)
+        self.rng = rng
+
+    def sample(self, k: int) -> List[int]:
+        count, multiplier, offset = self.count, self.multiplier, self.offset
+        return [
+            (rank * multiplier + offset) % count + 1
+            for rank in self.rng.choices(self.ranks, cum_weights=self.cum_weights, k=k)
+        ]
+
+class ProductIndex:
+    """Atributos mínimos de los productos generados en arrays (unos pocos bytes por producto)"""
+
+    def __init__(self):
+        self.lines = array("H")
+        self.prices = array("f")
+        self.stocks = array("B")
+
+    def add(self, line: int, price: float, stock: int):
+        self.lines.append(line)
+        self.prices.append(price)
+        self.stocks.append(stock)
+
+    def __len__(self):
+        return len(self.lines)
+
+    def get(self, product_id: int) -> Tuple[ProductCategory, str, str, float, int]:
+        index = product_id - 1
+        category, brand, series = LINES[self.lines[index]]
+        return category, brand, series, round(self.prices[index], 2), self.stocks[index]
+
+def _product_name(category: ProductCategory, brand: str, series: str, product_id: int) -> str:
+    return f"{CATALOG[category]['label']} {brand} {series} {product_id}"
+
+def _chunks(total: int, size: int) -> Iterator[Tuple[int, int]]:
+    for start in range(0, total, size):
+        yield start, min(size, total - start)
+
+def _timestamp(index: int, total: int, start: datetime, span: timedelta, rng: random.Random) -> datetime:
+    # Creciente en el tiempo con algo de ruido, para que ids y timestamps vayan juntos
+    position = (index + rng.random()) / max(total, 1)
+    return start + span * position
+
+def _product_rows(first_id: int, count: int, rng: random.Random, index: ProductIndex) -> List[dict]:
+    categories = list(CATEGORY_WEIGHTS)
+    weights = list(CATEGORY_WEIGHTS.values())
+    rows = []
+    for offset, category in enumerate(rng.choices(categories, weights=weights, k=count)):
+        product_id = first_id + offset
+        catalog = CATALOG[category]
+        line = rng.choice(LINES_BY_CATEGORY[category])
+        _, brand, series = LINES[line]
+        low, high = catalog["price"]
+        # Sesgo hacia precios bajos dentro del rango de la categoría
+        price = round(low + (high - low) * rng.random() ** 2, 2)
+        stock = rng.choice((0, 1, 2, 3, 5, 8, 12, 20, 35, 50))
+        specs = {name: rng.choice(options) for name, options in catalog["specs"].items()}
+        index.add(line, price, stock)
+        rows.append({
+            "id": product_id,
+            "name": _product_name(category, brand, series, product_id),
+            "brand": brand,
+            "model": f"{series.replace(' ', '')}-{product_id:07d}",
+            "category": category,
+            "price": price,
+            "stock": stock,
+            "description": f"{catalog['label']} {brand} {series} con {', '.join(specs.values())}",
+            "specifications": json.dumps(specs, ensure_ascii=False),
+            "is_active": rng.random() > 0.02,
+        })
+    return rows
+
+class DataGenerator:
+    def __init__(self, args):
+        self.args = args
+        self.rng = random.Random(args.seed)
+        self.end = datetime(2026, 1, 1) if args.fixed_clock else datetime.now().replace(microsecond=0)
+        self.span = timedelta(days=args.days)
+        self.start = self.end - self.span
+        self.engine = create_async_engine(args.database_url, echo=False)
+        if self.engine.dialect.name == "sqlite":
+            event.listen(self.engine.sync_engine, "connect", self._sqlite_bulk_pragmas)
+        self.products = ProductIndex()
+
+    @staticmethod
+    def _sqlite_bulk_pragmas(dbapi_connection, connection_record):
+        # Solo para la carga: sin fsync por transacción y journal en memoria
+        cursor = dbapi_connection.cursor()
+        cursor.execute("PRAGMA synchronous=OFF")
+        cursor.execute("PRAGMA journal_mode=MEMORY")
+        cursor.execute("PRAGMA temp_store=MEMORY")
+        cursor.execute("PRAGMA cache_size=-262144")
+        cursor.close()
+
+    async def _insert(self, table, total: int, build_rows):
+        """Inserta `total` filas en lotes; `build_rows(start, count)` genera cada lote"""
+        started = time.perf_counter()
+        batch = self.args.batch_size
+        rows_per_commit = batch * 20
+        async with self.engine.connect() as conn:
+            transaction = await conn.begin()
+            for start, count in _chunks(total, batch):
+                await conn.execute(table.insert(), build_rows(start, count))
+                if (start + count) % rows_per_commit == 0:
+                    await transaction.commit()
+                    transaction = await conn.begin()
+                    elapsed = time.perf_counter() - started
+                    logger.info(f"  {table.name}: {start + count:,}/{total:,} ({(start + count) / elapsed:,.0f} filas/s)")
+            await transaction.commit()
+        elapsed = time.perf_counter() - started
+        logger.info(f"{table.name}: {total:,} filas en {elapsed:.1f}s ({total / max(elapsed, 1e-9):,.0f} filas/s)")
+
+    async def prepare(self):
+        async with self.engine.begin() as conn:
+            if self.args.reset:
+                await conn.run_sync(Base.metadata.drop_all)
+            await conn.run_sync(Base.metadata.create_all)
+            existing = (await conn.execute(select(func.count(Product.id)))).scalar()
+        if existing:
+            raise SystemExit(f"La base ya tiene {existing} productos; usa --reset para regenerarla")
+
+    async def generate_products(self):
+        rng = random.Random(self.rng.random())
+
+        def build(start, count):
+            return _product_rows(start + 1, count, rng, self.products)
+
+        await self._insert(Product.__table__, self.args.products, build)
+
+    async def generate_interactions(self, sampler: ZipfSampler):
+        rng = random.Random(self.rng.random())
+        total = self.args.interactions
+        types = [name for name, _ in INTERACTION_TYPES]
+        type_weights = [weight for _, weight in INTERACTION_TYPES]
+
+        def build(start, count):
+            rows = []
+            product_ids = sampler.sample(count)
+            for offset, (interaction_type, product_id) in enumerate(zip(rng.choices(types, weights=type_weights, k=count), product_ids)):
+                category, brand, series, _, _ = self.products.get(product_id)
+                row = {
+                    "product_id": None,
+                    "category_viewed": None,
+                    "search_query": None,
+                    "interaction_type": interaction_type,
+                    "timestamp": _timestamp(start + offset, total, self.start, self.span, rng),
+                }
+                if interaction_type in ("view", "recommendation_click"):
+                    row["product_id"] = product_id
+                elif interaction_type == "chat_mention":
+                    row["category_viewed"] = category.value.lower()
+                    row["search_query"] = f"¿Qué {CATALOG[category]['label'].lower()} {brand} tienen?"
+                else:
+                    row["category_viewed"] = category.value.lower()
+                    row["search_query"] = f"{brand} {series}".lower()
+                rows.append(row)
+            return rows
+
+        await self._insert(UserInteraction.__table__, total, build)
+
+    async def generate_chats(self, sampler: ZipfSampler):
+        rng = random.Random(self.rng.random())
+        total = self.args.chats
+
+        def build(start, count):
+            rows = []
+            product_ids = sampler.sample(count)
+            for offset in range(count):
+                index = start + offset
+                # Cada pregunta y su respuesta hablan del mismo producto
+                product_id = product_ids[offset - index % 2]
+                category, brand, series, price, stock = self.products.get(product_id)
+                values = {"label": CATALOG[category]["label"].lower(), "brand": brand, "series": series, "price": price, "stock": stock}
+                is_user = index % 2 == 0
+                rows.append({
+                    "role": "user" if is_user else "assistant",
+                    "content": rng.choice(USER_MESSAGES if is_user else ASSISTANT_MESSAGES).format(**values),
+                    "timestamp": _timestamp(index, total, self.start, self.span, rng),
+                    "products_mentioned": None if is_user else json.dumps([product_id]),
+                })
+            return rows
+
+        await self._insert(ChatHistory.__table__, total, build)
+
+    async def generate_sales(self, sampler: ZipfSampler):
+        rng = random.Random(self.rng.random())
+        total = self.args.sales
+        statuses = [name for name, _ in SALE_STATUSES]
+        status_weights = [weight for _, weight in SALE_STATUSES]
+
+        def build(start, count):
+            rows = []
+            product_ids = sampler.sample(count)
+            for offset, (product_id, status) in enumerate(zip(product_ids, rng.choices(statuses, weights=status_weights, k=count))):
+                category, brand, series, price, _ = self.products.get(product_id)
+                customer = start + offset
+                rows.append({
+                    "product_id": product_id,
+                    "product_name": _product_name(category, brand, series, product_id),
+                    "product_brand": brand,
+                    "price": price,
+                    "quantity": rng.choice((1, 1, 1, 1, 2, 2, 3)),
+                    "customer_info": f"cliente{customer % 250_000}@example.com" if customer % 3 else f"+1555{customer % 10_000_000:07d}",
+                    "timestamp": _timestamp(start + offset, total, self.start, self.span, rng),
+                    "status": status,
+                })
+            return rows
+
+        await self._insert(Sale.__table__, total, build)
+
+    async def run(self):
+        started = time.perf_counter()
+        await self.prepare()
+        await self.generate_products()
+        if len(self.products):
+            sampler = ZipfSampler(len(self.products), self.args.zipf, random.Random(self.rng.random()))
+            await self.generate_interactions(sampler)
+            await self.generate_chats(sampler)
+            await self.generate_sales(sampler)
+        await self.engine.dispose()
+        logger.info(f"Datos generados en {time.perf_counter() - started:.1f}s")
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--database-url", default=settings.database_url)
+    parser.add_argument("--products", type=int, default=100_000)
+    parser.add_argument("--interactions", type=int, default=1_000_000)
+    parser.add_argument("--chats", type=int, default=200_000, help="mensajes de chat (usuario y asistente alternados)")
+    parser.add_argument("--sales", type=int, default=50_000)
+    parser.add_argument("--days", type=int, default=90, help="ventana de tiempo en la que se reparten los eventos")
+    parser.add_argument("--zipf", type=float, default=1.0, help="exponente de la popularidad Zipf")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--batch-size", type=int, default=10_000)
+    parser.add_argument("--fixed-clock", action="store_true", help="termina la ventana en 2026-01-01 en vez de ahora (datos idénticos entre corridas)")
+    parser.add_argument("--reset", action="store_true", help="borra y recrea las tablas antes de cargar")
+    args = parser.parse_args()
+
+    asyncio.run(DataGenerator(args).run())
+
+if __name__ == "__main__":
+    main()
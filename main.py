@@ -1,29 +1,60 @@
-from fastapi import FastAPI, WebSocket, Depends
+from fastapi import FastAPI, WebSocket
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse
 from contextlib import asynccontextmanager
+import asyncio
 import logging
 from config import settings
-from database import init_db, get_session, AsyncSession
-from api import products_router, chat_router, recommendations_router, websocket_endpoint
-from services.inventory_service import InventoryService
+from bootstrap import bootstrap_once, warm_up, retry_warm_up, readiness
+from api import products_router, chat_router, recommendations_router, websocket_endpoint, metrics_router, MetricsMiddleware, analytics_router, orders_router
+from api.websocket import manager
+from services.event_bus import event_bus
+from services.recommendation_snapshots import recommendation_snapshots
+from services.search_analytics import search_analytics
+from services.interaction_retention import interaction_retention
+from services.chat_archive import chat_archive
+from services.reservations import stock_reservations
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+async def _warm_up_then_start_writers():
+    # Las tareas que escriben en segundo plano arrancan después de las lecturas largas del
+    # calentamiento; las tareas fallidas se siguen reintentando mientras tanto
+    await warm_up()
+    recommendation_snapshots.start()
+    interaction_retention.start()
+    chat_archive.start()
+    stock_reservations.start()
+    await retry_warm_up()
+
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     logger.info("Iniciando aplicación...")
-    await init_db()
+    # En producción serve.py ya ejecutó el bootstrap antes de crear los workers
+    await bootstrap_once()
+    # Restaurar la analítica de búsquedas antes de empezar a recibir eventos
+    search_analytics.load()
+    await event_bus.start()
+    search_analytics.start()
     
-    async for session in get_session():
-        inventory_service = InventoryService(session)
-        await inventory_service.init_synthetic_data()
-        logger.info("Datos sintéticos cargados")
-        break
+    # El calentamiento corre en segundo plano; /ready indica cuándo terminó
+    warmup_task = asyncio.create_task(_warm_up_then_start_writers())
     
     yield
     
     logger.info("Cerrando aplicación...")
+    warmup_task.cancel()
+    try:
+        await warmup_task
+    except asyncio.CancelledError:
+        pass
+    await recommendation_snapshots.stop()
+    await search_analytics.stop()
+    await interaction_retention.stop()
+    await chat_archive.stop()
+    await stock_reservations.stop()
+    await event_bus.stop()
 
 app = FastAPI(
     title=settings.app_name,
@@ -39,10 +70,20 @@ app.add_middleware(
     allow_methods=["*"],
     allow_headers=["*"],
 )
+app.add_middleware(MetricsMiddleware)
+if settings.sql_profiling:
+    # Se instala aquí y no en database.py: database no debe importar services.*
+    from database import engine
+    from services.query_profiler import QueryProfilerMiddleware, install_query_profiler
+    install_query_profiler(engine.sync_engine)
+    app.add_middleware(QueryProfilerMiddleware)
 
 app.include_router(products_router)
 app.include_router(chat_router)
 app.include_router(recommendations_router)
+app.include_router(metrics_router)
+app.include_router(analytics_router)
+app.include_router(orders_router)
 
 @app.get("/")
 async def root():
@@ -54,6 +95,8 @@ async def root():
             "chat": "/api/chat",
             "recommendations": "/api/recommendations",
             "websocket": "/ws/{session_id}",
+            "metrics": "/metrics",
+            "analytics": "/api/analytics/searches",
             "docs": "/docs"
         }
     }
@@ -62,9 +105,20 @@ async def root():
 async def health_check():
     return {"status": "healthy", "service": "makers-tech-chatbot"}
 
+@app.get("/ready")
+async def readiness_check():
+    """Indica si el worker terminó su calentamiento sin fallas y puede recibir tráfico"""
+    return JSONResponse(status_code=200 if readiness["ready"] else 503, content=readiness)
+
+@app.get("/ws/stats")
+async def websocket_stats():
+    """Conexiones activas, profundidad de las colas de salida y desconexiones forzadas"""
+    return manager.stats()
+
 @app.websocket("/ws")
-async def websocket_route(websocket: WebSocket, session: AsyncSession = Depends(get_session)):
-    await websocket_endpoint(websocket, session)
+async def websocket_route(websocket: WebSocket):
+    # Cada mensaje abre su propia sesión de base de datos dentro del endpoint
+    await websocket_endpoint(websocket)
 
 if __name__ == "__main__":
     import uvicorn
@@ -2,7 +2,7 @@ from pydantic import BaseModel, Field
 from typing import Optional, List
 from datetime import datetime
 from enum import Enum
-from sqlalchemy import Column, Integer, String, DateTime, Text
+from sqlalchemy import Column, Integer, String, DateTime, Text, Index
 from models.product import Base
 
 class MessageRole(str, Enum):
@@ -23,6 +23,22 @@ class ChatHistory(Base):
     content = Column(Text)
     timestamp = Column(DateTime, default=datetime.now)
     products_mentioned = Column(Text)  # JSON string
+    # Conversación a la que pertenece: limpiar el chat solo avanza la época actual (ChatState)
+    epoch = Column(Integer, default=0, server_default="0")
+    
+    __table_args__ = (
+        # Últimos mensajes de la conversación actual y archivo de los mensajes viejos
+        Index("ix_chat_history_epoch_timestamp", epoch, timestamp),
+        Index("ix_chat_history_timestamp", timestamp),
+    )
+
+class ChatState(Base):
+    """Estado global del chat (un solo registro): época de la conversación actual"""
+    __tablename__ = "chat_state"
+    
+    id = Column(Integer, primary_key=True)
+    epoch = Column(Integer, nullable=False, default=0)
+    cleared_at = Column(DateTime, nullable=True)
     
 class ChatResponse(BaseModel):
     message: str
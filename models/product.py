@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, Float, Boolean, Enum as SQLEnum, Text, DateTime, ForeignKey
+from sqlalchemy import Column, Integer, String, Float, Boolean, Enum as SQLEnum, Text, DateTime, ForeignKey, Index
 from sqlalchemy.ext.declarative import declarative_base
 from pydantic import BaseModel, Field
 from typing import Optional, List
@@ -30,6 +30,12 @@ class Product(Base):
     description = Column(Text)
     specifications = Column(Text)
     is_active = Column(Boolean, default=True)
+    
+    __table_args__ = (
+        # Primeros productos de una categoría y mejores por stock/precio sin recorrer el catálogo
+        Index("ix_products_category_id", category, id),
+        Index("ix_products_category_stock_price", category, stock.desc(), price),
+    )
 
 class Sale(Base):
     __tablename__ = "sales"
@@ -43,6 +49,26 @@ class Sale(Base):
     customer_info = Column(String)  # Puede ser email o teléfono
     timestamp = Column(DateTime, default=datetime.now)
     status = Column(String, default="pending")  # pending, confirmed, cancelled
+    
+    __table_args__ = (
+        Index("ix_sales_timestamp", timestamp),
+    )
+
+class StockReservation(Base):
+    """Unidades apartadas mientras el cliente confirma la compra; vencen en expires_at"""
+    __tablename__ = "stock_reservations"
+    
+    id = Column(Integer, primary_key=True)
+    product_id = Column(Integer, ForeignKey("products.id"), nullable=False)
+    quantity = Column(Integer, nullable=False, default=1)
+    owner = Column(String, nullable=False)  # quién apartó las unidades (p. ej. "chat:<época>")
+    created_at = Column(DateTime, default=datetime.now)
+    expires_at = Column(DateTime, nullable=False)
+    
+    __table_args__ = (
+        Index("ix_stock_reservations_product_expires", product_id, expires_at),
+        Index("ix_stock_reservations_expires", expires_at),
+    )
 
 class ProductCreate(BaseModel):
     name: str
@@ -54,6 +80,11 @@ class ProductCreate(BaseModel):
     description: str
     specifications: str
     
+class OrderRequest(BaseModel):
+    product_id: int
+    quantity: int = Field(default=1, gt=0)
+    customer_info: str = "Pendiente"
+
 class ProductResponse(BaseModel):
     id: int
     name: str
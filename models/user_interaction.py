@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, Float, DateTime, ForeignKey, Text
+from sqlalchemy import Column, Integer, String, Float, Date, DateTime, ForeignKey, Text, Index, UniqueConstraint
 from sqlalchemy.orm import relationship
 from models.product import Base
 from datetime import datetime
@@ -16,6 +16,27 @@ class UserInteraction(Base):
     timestamp = Column(DateTime, default=datetime.now)
     
     product = relationship("Product", lazy="joined")
+    
+    __table_args__ = (
+        # Ventanas de tiempo recientes (contadores de tendencia) sin recorrer toda la tabla
+        Index("ix_user_interactions_timestamp", timestamp),
+    )
+
+class InteractionDailyRollup(Base):
+    """Conteo diario de interacciones por producto, categoría y tipo (ver interaction_retention)"""
+    __tablename__ = "interaction_daily_rollups"
+    
+    id = Column(Integer, primary_key=True)
+    day = Column(Date, nullable=False)
+    product_id = Column(Integer, nullable=False, default=0)  # 0: sin producto
+    category = Column(String, nullable=False, default="")  # en minúsculas; "" si no hay
+    interaction_type = Column(String, nullable=False, default="")
+    count = Column(Integer, nullable=False, default=0)
+    
+    __table_args__ = (
+        # Clave del upsert; también sirve para leer rangos de días
+        UniqueConstraint(day, product_id, category, interaction_type, name="uq_interaction_daily_rollups_key"),
+    )
 
 class GlobalUserPreference(Base):
     __tablename__ = "global_user_preferences"
@@ -26,6 +47,9 @@ class GlobalUserPreference(Base):
     price_range_min = Column(Float, default=0)
     price_range_max = Column(Float, default=50000)
     interaction_count = Column(Integer, default=0)
+    preference_counters = Column(Text, nullable=True)  # JSON compacto de PreferenceCounters
+    # Última interacción (por id) ya sumada a los contadores
+    folded_interaction_id = Column(Integer, nullable=True, default=0, server_default="0")
     last_updated = Column(DateTime, default=datetime.now)
 
 class InteractionRequest(BaseModel):
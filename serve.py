@@ -0,0 +1,55 @@
+"""
+Punto de entrada de producción: ejecuta el bootstrap una sola vez y luego levanta
+los workers de uvicorn (uvloop + httptools cuando están disponibles).
+
+Uso:
+    WORKERS=4 PUBSUB_BACKEND=unix python serve.py
+"""
+import asyncio
+import importlib
+import importlib.util
+import logging
+import os
+import uvicorn
+from config import settings
+from bootstrap import bootstrap_once, BOOTSTRAPPED_ENV
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+def _available(module: str) -> bool:
+    return importlib.util.find_spec(module) is not None
+
+async def _run_bootstrap():
+    from database import engine
+    await bootstrap_once()
+    # Los workers abren su propio pool de conexiones
+    await engine.dispose()
+
+def main():
+    if settings.workers > 1 and settings.pubsub_backend == "memory":
+        logger.warning(
+            "Con varios workers y PUBSUB_BACKEND=memory los eventos solo llegan a los "
+            "clientes del mismo worker; usa PUBSUB_BACKEND=unix"
+        )
+
+    # Migraciones y datos iniciales: una sola vez, antes de que ningún worker atienda
+    asyncio.run(_run_bootstrap())
+    os.environ[BOOTSTRAPPED_ENV] = "1"
+
+    # Precargar la aplicación en el proceso principal para fallar antes de crear workers
+    importlib.import_module("main")
+
+    uvicorn.run(
+        "main:app",
+        host=settings.host,
+        port=settings.port,
+        workers=settings.workers,
+        loop="uvloop" if _available("uvloop") else "auto",
+        http="httptools" if _available("httptools") else "auto",
+        log_level="info",
+        proxy_headers=True
+    )
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,283 @@
+from typing import Any, Dict, List, Optional
+from datetime import datetime, timedelta
+import asyncio
+import json
+import logging
+import mmap
+import os
+import zlib
+try:
+    import fcntl
+except ImportError:  # Windows: sin lock entre procesos (usar un solo worker)
+    fcntl = None
+from sqlalchemy import select, delete, func, tuple_
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.ext.asyncio import AsyncSession
+from models.chat import ChatHistory, ChatState
+from config import settings
+
+logger = logging.getLogger(__name__)
+
+# Archivo del historial de chat. Limpiar el chat solo avanza la época de ChatState (una fila);
+# las conversaciones de épocas anteriores y los mensajes más viejos que la ventana se mueven
+# por lotes a segmentos append-only: cada lote es un bloque JSON comprimido con zlib y una
+# línea en index.jsonl (segmento, offset, largo, cantidad), así el historial lee con mmap
+# solo los bloques de la página pedida.
+
+STATE_ID = 1
+INDEX_FILE = "index.jsonl"
+
+def current_epoch_clause():
+    """Época actual como subconsulta (0 si nunca se limpió el chat)"""
+    return func.coalesce(
+        select(ChatState.epoch).where(ChatState.id == STATE_ID).scalar_subquery(), 0
+    )
+
+async def current_epoch(session: AsyncSession) -> int:
+    return (await session.execute(select(current_epoch_clause()))).scalar_one()
+
+async def advance_epoch(session: AsyncSession) -> int:
+    """Empieza una conversación nueva con un solo upsert atómico; devuelve la nueva época"""
+    now = datetime.now()
+    statement = sqlite_insert(ChatState).values(id=STATE_ID, epoch=1, cleared_at=now)
+    result = await session.execute(
+        statement.on_conflict_do_update(
+            index_elements=["id"],
+            set_={"epoch": ChatState.epoch + 1, "cleared_at": now}
+        ).returning(ChatState.epoch)
+    )
+    return result.scalar_one()
+
+class ChatArchive:
+    def __init__(
+        self,
+        directory: str,
+        archive_after_days: int = 30,
+        batch_size: int = 2000,
+        batch_pause: float = 0.05,
+        interval: float = 600.0,
+        segment_bytes: int = 8 * 1024 * 1024
+    ):
+        self.directory = directory
+        self.archive_after_days = archive_after_days
+        self.batch_size = batch_size
+        self.batch_pause = batch_pause
+        self.interval = interval
+        self.segment_bytes = segment_bytes
+        # Índice en memoria; index.jsonl solo crece, así que se lee desde el último tamaño visto
+        self._entries: List[Dict[str, Any]] = []
+        self._index_size = 0
+        self._wake: Optional[asyncio.Event] = None
+        self._task: Optional[asyncio.Task] = None
+
+    @property
+    def index_path(self) -> str:
+        return os.path.join(self.directory, INDEX_FILE)
+
+    def _refresh_index(self) -> List[Dict[str, Any]]:
+        try:
+            size = os.path.getsize(self.index_path)
+        except FileNotFoundError:
+            self._entries, self._index_size = [], 0
+            return self._entries
+        if size < self._index_size:  # el índice se reemplazó: releer completo
+            self._entries, self._index_size = [], 0
+        if size > self._index_size:
+            with open(self.index_path, "rb") as index_file:
+                index_file.seek(self._index_size)
+                chunk = index_file.read(size - self._index_size)
+            # Una línea incompleta (escritura en curso) se lee en la próxima vuelta
+            complete = chunk[:chunk.rfind(b"\n") + 1]
+            self._entries.extend(json.loads(line) for line in complete.splitlines() if line)
+            self._index_size += len(complete)
+        return self._entries
+
+    def count(self) -> int:
+        """Mensajes archivados (cada fila una sola vez: _append omite las ya archivadas)"""
+        return sum(entry["count"] for entry in self._refresh_index())
+
+    def read(self, offset: int = 0, limit: int = 50) -> List[Dict[str, Any]]:
+        """Mensajes archivados del más reciente al más viejo, descomprimiendo solo los bloques necesarios"""
+        messages: List[Dict[str, Any]] = []
+        for entry in reversed(self._refresh_index()):
+            if len(messages) >= limit:
+                break
+            if offset >= entry["count"]:
+                offset -= entry["count"]
+                continue
+            rows = self._read_block(entry)
+            rows.reverse()
+            messages.extend(rows[offset:offset + limit - len(messages)])
+            offset = 0
+        return messages
+
+    def _read_block(self, entry: Dict[str, Any]) -> List[Dict[str, Any]]:
+        with open(os.path.join(self.directory, entry["segment"]), "rb") as segment_file:
+            with mmap.mmap(segment_file.fileno(), 0, access=mmap.ACCESS_READ) as segment:
+                block = segment[entry["offset"]:entry["offset"] + entry["length"]]
+        return json.loads(zlib.decompress(block))
+
+    def _lock(self):
+        lock_file = open(os.path.join(self.directory, ".lock"), "a+")
+        if fcntl is not None:
+            fcntl.flock(lock_file.fileno(), fcntl.LOCK_EX)
+        return lock_file
+
+    def _already_archived(self, entries: List[Dict[str, Any]], rows: List[Dict[str, Any]]) -> set:
+        """
+        Claves (id, timestamp) de `rows` que ya están en algún bloque: un lote reintentado tras
+        una caída entre el índice y el commit no se vuelve a escribir. SQLite reutiliza ids de
+        filas borradas, así que solo se leen los bloques cuyo rango de ids y de fechas se cruza.
+        """
+        first_id, last_id = min(row["id"] for row in rows), max(row["id"] for row in rows)
+        first_timestamp, last_timestamp = rows[0]["timestamp"], rows[-1]["timestamp"]
+        archived = set()
+        for entry in entries:
+            if (
+                entry["first_id"] <= last_id and entry["last_id"] >= first_id
+                and entry["first_timestamp"] <= last_timestamp and entry["last_timestamp"] >= first_timestamp
+            ):
+                archived.update((row["id"], row["timestamp"]) for row in self._read_block(entry))
+        return archived
+
+    def _append(self, rows: List[Dict[str, Any]]) -> Optional[Dict[str, Any]]:
+        """
+        Agrega un bloque al último segmento (o a uno nuevo si está lleno) y su línea de índice.
+        Devuelve None si todas las filas ya estaban archivadas.
+        """
+        os.makedirs(self.directory, exist_ok=True)
+        rows = sorted(rows, key=lambda row: (row["timestamp"], row["id"]))
+        with self._lock():
+            entries = self._refresh_index()
+            archived = self._already_archived(entries, rows)
+            rows = [row for row in rows if (row["id"], row["timestamp"]) not in archived]
+            if not rows:
+                return None
+            block = zlib.compress(json.dumps(rows, separators=(",", ":"), ensure_ascii=False).encode("utf-8"))
+            segment = entries[-1]["segment"] if entries else "segment-000000.seg"
+            segment_path = os.path.join(self.directory, segment)
+            if os.path.exists(segment_path) and os.path.getsize(segment_path) >= self.segment_bytes:
+                segment = f"segment-{int(segment[8:14]) + 1:06d}.seg"
+                segment_path = os.path.join(self.directory, segment)
+            with open(segment_path, "ab") as segment_file:
+                offset = segment_file.tell()
+                segment_file.write(block)
+                segment_file.flush()
+                os.fsync(segment_file.fileno())
+            entry = {
+                "segment": segment,
+                "offset": offset,
+                "length": len(block),
+                "count": len(rows),
+                "first_id": min(row["id"] for row in rows),
+                "last_id": max(row["id"] for row in rows),
+                "min_epoch": min(row["epoch"] for row in rows),
+                "max_epoch": max(row["epoch"] for row in rows),
+                "first_timestamp": rows[0]["timestamp"],
+                "last_timestamp": rows[-1]["timestamp"]
+            }
+            with open(self.index_path, "ab") as index_file:
+                index_file.write((json.dumps(entry) + "\n").encode("utf-8"))
+                index_file.flush()
+                os.fsync(index_file.fileno())
+        return entry
+
+    async def archive_batch(self, session: AsyncSession, condition) -> int:
+        """Mueve al archivo un lote de mensajes que cumplen `condition`; devuelve cuántos movió"""
+        table = ChatHistory.__table__
+        result = await session.execute(
+            select(table).where(condition).order_by(table.c.timestamp).limit(self.batch_size)
+        )
+        fetched = result.mappings().all()
+        # Terminar la lectura antes de escribir el bloque: la base no queda tomada mientras
+        # se espera el lock del archivo y los fsync
+        await session.rollback()
+        if not fetched:
+            return 0
+
+        # Primero el bloque y después el borrado, en una transacción corta. Si el borrado
+        # falla (o el proceso cae) las filas quedan en la base y también en el archivo; la
+        # próxima pasada no las vuelve a escribir (_append omite las ya archivadas) y las borra
+        rows = [
+            {**row, "timestamp": row["timestamp"].isoformat(), "epoch": row["epoch"] or 0}
+            for row in fetched
+        ]
+        await asyncio.to_thread(self._append, rows)
+        try:
+            # Por (id, timestamp): SQLite reutiliza ids de filas borradas
+            await session.execute(
+                delete(table).where(
+                    tuple_(table.c.id, table.c.timestamp).in_([(row["id"], row["timestamp"]) for row in fetched])
+                )
+            )
+            await session.commit()
+        except Exception:
+            # Sin rollback la conexión del pool sigue con el lock de escritura
+            await session.rollback()
+            raise
+        return len(fetched)
+
+    async def run_once(self) -> int:
+        """Archiva las conversaciones limpiadas y luego los mensajes viejos, con pausas entre lotes"""
+        # Import diferido: chat_service importa este módulo para las épocas
+        from database import async_session_maker
+        
+        total = 0
+        async with async_session_maker() as session:
+            epoch = await current_epoch(session)
+        cutoff = datetime.now() - timedelta(days=self.archive_after_days)
+        for condition in (
+            func.coalesce(ChatHistory.epoch, 0) < epoch,
+            ChatHistory.timestamp < cutoff
+        ):
+            while True:
+                async with async_session_maker() as session:
+                    moved = await self.archive_batch(session, condition)
+                total += moved
+                if moved < self.batch_size:
+                    break
+                await asyncio.sleep(self.batch_pause)
+        if total:
+            logger.info(f"Archivo de chat: {total} mensajes movidos a {self.directory}")
+        return total
+
+    def wake(self):
+        """Adelanta la próxima pasada (por ejemplo, después de limpiar el chat)"""
+        if self._wake is not None:
+            self._wake.set()
+
+    def start(self):
+        if self._task is None:
+            self._wake = asyncio.Event()
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+            self._wake = None
+
+    async def _run(self):
+        while True:
+            self._wake.clear()
+            try:
+                await self.run_once()
+            except Exception as e:
+                logger.error(f"Error archivando el historial de chat: {e}")
+            try:
+                await asyncio.wait_for(self._wake.wait(), timeout=self.interval)
+            except asyncio.TimeoutError:
+                pass
+
+chat_archive = ChatArchive(
+    settings.chat_archive_dir,
+    archive_after_days=settings.chat_archive_after_days,
+    batch_size=settings.chat_archive_batch_size,
+    batch_pause=settings.chat_archive_batch_pause,
+    interval=settings.chat_archive_interval,
+    segment_bytes=settings.chat_archive_segment_bytes
+)
@@ -1,11 +1,14 @@
 from typing import List, Dict, Optional, Any
 from models.chat import ChatMessage, MessageRole, ChatResponse, ChatHistory, MultiChatResponse
-from models.product import ProductCategory, Product, Sale
+from models.product import ProductCategory, Product
 from services.inventory_service import InventoryService
 from services.recommendation_service import RecommendationService
-from langchain_core.messages import HumanMessage, AIMessage, SystemMessage, BaseMessage
-from langchain_core.language_models import BaseChatModel
-from langchain_core.outputs import ChatResult, ChatGeneration
+from services.search_analytics import publish_search
+from services.chat_archive import current_epoch, current_epoch_clause
+from services.order_service import OrderService
+from services.reservations import stock_reservations
+from services.metrics import stage_timer
+from config import settings
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import select
 import json
@@ -13,80 +16,113 @@ import re
 import os
 from datetime import datetime
 
-class MockChatModel(BaseChatModel):
-    """Modelo de chat simulado para desarrollo sin necesidad de API key"""
-    
-    @property
-    def _llm_type(self) -> str:
-        return "mock"
-    
-    def _generate(
-        self,
-        messages: List[BaseMessage],
-        stop: Optional[List[str]] = None,
-        **kwargs: Any,
-    ) -> ChatResult:
-        last_message = messages[-1].content if messages else ""
-        response = self._generate_mock_response(last_message)
-        message = AIMessage(content=response)
-        generation = ChatGeneration(message=message)
-        return ChatResult(generations=[generation])
-    
-    async def _agenerate(
-        self,
-        messages: List[BaseMessage],
-        stop: Optional[List[str]] = None,
-        **kwargs: Any,
-    ) -> ChatResult:
-        return self._generate(messages, stop, **kwargs)
-    
-    def _generate_mock_response(self, user_input: str) -> str:
-        user_input_lower = user_input.lower()
-        
-        if "hola" in user_input_lower or "buenos" in user_input_lower:
-            return "¡Hola! Bienvenido a Makers Tech. Soy tu asistente virtual y estoy aquí para ayudarte con información sobre nuestros productos. ¿En qué puedo ayudarte hoy?"
-        
-        elif "computadora" in user_input_lower or "computador" in user_input_lower or "desktop" in user_input_lower:
-            return """¡Claro! Te muestro las computadoras que tenemos disponibles:
+# Palabras clave para detectar intención en los mensajes (se construyen una sola vez)
+STOCK_KEYWORDS = ("stock", "unidades", "disponible", "disponibles", "quedan", "hay", "tienen", "cuántos", "cuántas")
 
-Tenemos la **Dell OptiPlex 3000**, una excelente computadora de escritorio compacta y potente para oficina.
-**Precio**: $799.99 - **Stock**: 2 unidades
+SPECIFIC_PRODUCT_KEYWORDS = (
+    "hp pavilion", "hp probook", "macbook", "zenbook", "thinkpad", "dell xps",
+    "iphone", "galaxy", "pixel", "oneplus", "xiaomi",
+    "ipad", "surface", "galaxy tab",
+    "imac", "optiplex", "elite tower"
+)
 
-También está disponible el **iMac 24 M3** de Apple, un all-in-one con pantalla Retina 4.5K.
-**Precio**: $1599.99 - **Stock**: 3 unidades
+CONTEXT_CATEGORY_KEYWORDS = {
+    "computadora": ProductCategory.COMPUTADORAS,
+    "computador": ProductCategory.COMPUTADORAS,
+    "desktop": ProductCategory.COMPUTADORAS,
+    "pc": ProductCategory.COMPUTADORAS,
+    "laptop": ProductCategory.LAPTOPS,
+    "portátil": ProductCategory.LAPTOPS,
+    "notebook": ProductCategory.LAPTOPS,
+    "tablet": ProductCategory.TABLETS,
+    "ipad": ProductCategory.TABLETS,
+    "teléfono": ProductCategory.CELULARES,
+    "celular": ProductCategory.CELULARES,
+    "smartphone": ProductCategory.CELULARES,
+    "móvil": ProductCategory.CELULARES,
+    "monitor": ProductCategory.MONITORES,
+    "pantalla": ProductCategory.MONITORES,
+    "mouse": ProductCategory.PERIFERICOS,
+    "teclado": ProductCategory.PERIFERICOS,
+    "periférico": ProductCategory.PERIFERICOS,
+    "audífono": ProductCategory.ACCESORIOS,
+    "auricular": ProductCategory.ACCESORIOS,
+    "webcam": ProductCategory.ACCESORIOS,
+    "cámara": ProductCategory.ACCESORIOS,
+    "impresora": ProductCategory.IMPRESORAS,
+    "printer": ProductCategory.IMPRESORAS
+}
 
-Y el **HP Elite Tower 800 G9**, una workstation empresarial de alto rendimiento.
-**Precio**: $1099.99 - **Stock**: 4 unidades
-
-¿Te gustaría conocer más detalles sobre alguna de estas opciones?"""
-        
-        elif "laptop" in user_input_lower or "portátil" in user_input_lower:
-            return """Por supuesto! Estas son nuestras laptops disponibles:
+# Productos que se pueden comprar desde el chat (patrón en el mensaje de confirmación -> producto)
+PURCHASE_PRODUCTS = {
+    "hp pavilion 15": ("Laptop HP Pavilion 15", "HP", 899.99),
+    "hp pavilion": ("Laptop HP Pavilion 15", "HP", 899.99),
+    "hp probook": ("Laptop HP ProBook 450", "HP", 1299.99),
+    "macbook air": ("MacBook Air M2", "Apple", 1499.99),
+    "macbook": ("MacBook Air M2", "Apple", 1499.99),
+    "asus zenbook": ("ASUS ZenBook 14 OLED", "ASUS", 1099.99),
+    "lenovo thinkpad": ("Lenovo ThinkPad X1 Carbon Gen 11", "Lenovo", 1799.99),
+    "thinkpad": ("Lenovo ThinkPad X1 Carbon Gen 11", "Lenovo", 1799.99),
+    "dell xps": ("Dell XPS 15", "Dell", 1799.99),
+    "iphone 14": ("iPhone 14", "Apple", 899.99),
+    "iphone 15": ("iPhone 15 Pro", "Apple", 1199.99),
+    "iphone se": ("iPhone SE", "Apple", 499.99),
+    "galaxy s23": ("Samsung Galaxy S23 Ultra", "Samsung", 1199.99),
+    "pixel 8": ("Google Pixel 8 Pro", "Google", 899.99),
+    "oneplus 12": ("OnePlus 12", "OnePlus", 799.99),
+    "xiaomi 14": ("Xiaomi 14 Ultra", "Xiaomi", 999.99)
+}
 
-La **HP Pavilion 15** con procesador AMD Ryzen 5, ideal para trabajo y entretenimiento.
-**Precio**: $899.99 - **Stock**: 5 unidades
-
-También tenemos el **Lenovo ThinkPad X1 Carbon**, ultrabook empresarial premium.
-**Precio**: $1799.99 - **Stock**: 4 unidades
-
-¿Necesitas algo específico como gaming, trabajo profesional o uso general?"""
-        
-        elif "teléfono" in user_input_lower or "celular" in user_input_lower or "smartphone" in user_input_lower:
-            return """¡Excelente! Te muestro nuestros smartphones disponibles:
+CONTEXT_BRANDS = ("apple", "samsung", "hp", "dell", "lenovo", "asus", "microsoft", "google", "xiaomi", "oneplus")
 
-El **iPhone 14 Pro** de Apple con Dynamic Island y cámara de 48MP.
-**Precio**: $1299.99 - **Stock**: 7 unidades
+INTERACTION_CATEGORY_MAP = {
+    "computadora": "computadoras",
+    "computadoras": "computadoras",
+    "computador": "computadoras",
+    "desktop": "computadoras",
+    "pc": "computadoras",
+    "laptop": "laptops",
+    "laptops": "laptops",
+    "portátil": "laptops",
+    "portátiles": "laptops",
+    "notebook": "laptops",
+    "notebooks": "laptops",
+    "tablet": "tablets",
+    "tablets": "tablets",
+    "ipad": "tablets",
+    "teléfono": "celulares",
+    "teléfonos": "celulares",
+    "celular": "celulares",
+    "celulares": "celulares",
+    "smartphone": "celulares",
+    "smartphones": "celulares",
+    "móvil": "celulares",
+    "iphone": "celulares",
+    "galaxy": "celulares",
+    "pixel": "celulares",
+    "monitor": "monitores",
+    "monitores": "monitores",
+    "pantalla": "monitores",
+    "pantallas": "monitores",
+    "mouse": "perifericos",
+    "teclado": "perifericos",
+    "periférico": "perifericos",
+    "periféricos": "perifericos",
+    "audífono": "accesorios",
+    "audífonos": "accesorios",
+    "auricular": "accesorios",
+    "auriculares": "accesorios",
+    "webcam": "accesorios",
+    "cámara": "accesorios",
+    "impresora": "impresoras",
+    "impresoras": "impresoras",
+    "printer": "impresoras"
+}
 
-El **Samsung Galaxy S23 Ultra** con S Pen integrado y cámara de 200MP.
-**Precio**: $1199.99 - **Stock**: 5 unidades
-
-También tenemos opciones más accesibles como el **Xiaomi Redmi Note 12 Pro**.
-**Precio**: $299.99 - **Stock**: 20 unidades
-
-¿Qué características son más importantes para ti?"""
-        
-        else:
-            return "Puedo ayudarte a encontrar laptops, computadoras, tablets, smartphones, monitores y accesorios. ¿Qué tipo de producto te interesa?"
+INTERACTION_BRANDS = (
+    "apple", "samsung", "hp", "dell", "lenovo", "asus", "microsoft",
+    "google", "xiaomi", "oneplus", "logitech", "corsair", "razer", "benq", "lg"
+)
 
 class ChatService:
     def __init__(self, use_mock: bool = True):
@@ -136,15 +172,28 @@ PROCESO DE COMPRA:
 
 OBJETIVO: Ser un vendedor amigable y eficiente que ayuda con respuestas cortas y claras."""
         
-        if use_mock:
-            self.llm = MockChatModel()
-        else:
-            from langchain_openai import ChatOpenAI
-            self.llm = ChatOpenAI(
-                temperature=0.7, 
-                model="gpt-4o",
-                api_key=os.getenv("OPENAI_API_KEY")
-            )
+        # El modelo (y LangChain/OpenAI) se importa y construye en el primer uso o en el calentamiento
+        self._llm = None
+    
+    @property
+    def llm(self):
+        if self._llm is None:
+            if self.use_mock:
+                from services.mock_chat_model import MockChatModel
+                self._llm = MockChatModel()
+            else:
+                from langchain_openai import ChatOpenAI
+                self._llm = ChatOpenAI(
+                    temperature=0.7, 
+                    model="gpt-4o",
+                    api_key=os.getenv("OPENAI_API_KEY")
+                )
+        return self._llm
+    
+    async def warm_up(self):
+        """Importa LangChain y construye el cliente del modelo antes de la primera petición"""
+        import langchain_core.messages  # noqa: F401
+        self.llm
     
     async def _track_purchase_intent(
         self,
@@ -152,7 +201,7 @@ OBJETIVO: Ser un vendedor amigable y eficiente que ayuda con respuestas cortas y
         response_text: str,
         db_session: Optional[AsyncSession] = None
     ):
-        """Detecta y registra ventas cuando se confirma una compra"""
+        """Aparta una unidad cuando se pide confirmación y registra la venta cuando se confirma"""
         message_lower = message.lower()
         
         # Detectar confirmación de compra
@@ -162,11 +211,29 @@ OBJETIVO: Ser un vendedor amigable y eficiente que ayuda con respuestas cortas y
         # Verificar si en la respuesta se está pidiendo confirmación
         asking_confirmation = "estás seguro" in response_text.lower()
         
+        if not db_session or not (asking_confirmation or is_confirmation):
+            return
+        owner = f"chat:{await current_epoch(db_session)}"
+        
+        # El bot pide confirmación: apartar una unidad mientras el cliente responde
+        if asking_confirmation:
+            product_found = self._find_purchase_product(response_text.lower())
+            if product_found:
+                order_service = OrderService(db_session)
+                product_id = await order_service.product_id_by_name(product_found[0])
+                # Cerrar las lecturas previas para que la transacción de la reserva empiece escribiendo
+                await db_session.commit()
+                if product_id is not None and not await stock_reservations.find(db_session, product_id, owner):
+                    reserved = await stock_reservations.reserve(db_session, product_id, owner=owner)
+                    print(f"Reserva {'creada' if reserved else 'sin stock'}: {product_found[0]}")
+            return
+        
         # Si el usuario está confirmando Y el bot NO está preguntando (es decir, ya confirmó antes)
-        if is_confirmation and not asking_confirmation and db_session:
+        if is_confirmation:
             # Obtener últimos mensajes para encontrar el producto mencionado
             result = await db_session.execute(
                 select(ChatHistory)
+                .where(ChatHistory.epoch == current_epoch_clause())
                 .order_by(ChatHistory.timestamp.desc())
                 .limit(10)
             )
@@ -177,51 +244,35 @@ OBJETIVO: Ser un vendedor amigable y eficiente que ayuda con respuestas cortas y
             for msg in recent_messages:
                 if msg.role == "assistant" and "estás seguro" in msg.content.lower():
                     # Buscar el producto en el mensaje de confirmación
-                    msg_lower = msg.content.lower()
-                    
-                    # Mapa de productos mejorado
-                    products_map = {
-                        "hp pavilion 15": ("Laptop HP Pavilion 15", "HP", 899.99),
-                        "hp pavilion": ("Laptop HP Pavilion 15", "HP", 899.99),
-                        "hp probook": ("Laptop HP ProBook 450", "HP", 1299.99),
-                        "macbook air": ("MacBook Air M2", "Apple", 1499.99),
-                        "macbook": ("MacBook Air M2", "Apple", 1499.99),
-                        "asus zenbook": ("ASUS ZenBook 14 OLED", "ASUS", 1099.99),
-                        "lenovo thinkpad": ("Lenovo ThinkPad X1 Carbon Gen 11", "Lenovo", 1799.99),
-                        "thinkpad": ("Lenovo ThinkPad X1 Carbon Gen 11", "Lenovo", 1799.99),
-                        "dell xps": ("Dell XPS 15", "Dell", 1799.99),
-                        "iphone 14": ("iPhone 14", "Apple", 899.99),
-                        "iphone 15": ("iPhone 15 Pro", "Apple", 1199.99),
-                        "iphone se": ("iPhone SE", "Apple", 499.99),
-                        "galaxy s23": ("Samsung Galaxy S23 Ultra", "Samsung", 1199.99),
-                        "pixel 8": ("Google Pixel 8 Pro", "Google", 899.99),
-                        "oneplus 12": ("OnePlus 12", "OnePlus", 799.99),
-                        "xiaomi 14": ("Xiaomi 14 Ultra", "Xiaomi", 999.99)
-                    }
-                    
-                    for pattern, (product_name, brand, price) in products_map.items():
-                        if pattern in msg_lower:
-                            product_found = (product_name, brand, price)
-                            break
-                    
+                    product_found = self._find_purchase_product(msg.content.lower())
                     if product_found:
                         break
             
-            # Si encontramos el producto, registrar la venta
+            # Si encontramos el producto, registrar la venta (descuenta stock sin sobrevender)
             if product_found:
                 product_name, brand, price = product_found
-                sale = Sale(
-                    product_name=product_name,
-                    product_brand=brand,
-                    price=price,
-                    quantity=1,
-                    customer_info="Pendiente",  # Se actualizará cuando proporcione info
-                    timestamp=datetime.now(),
-                    status="pending"
-                )
-                db_session.add(sale)
+                order_service = OrderService(db_session)
+                product_id = await order_service.product_id_by_name(product_name)
+                if product_id is None:
+                    print(f"Venta no registrada (not_found): {product_name}")
+                    return
+                # La unidad apartada al pedir confirmación (si no venció) se consume con el pedido
+                reservation_id = await stock_reservations.find(db_session, product_id, owner)
+                # Cerrar las lecturas previas para que la transacción del pedido empiece escribiendo
                 await db_session.commit()
-                print(f"Venta registrada: {product_name} - ${price}")
+                order = await order_service.place_order(product_id, reservation_id=reservation_id)
+                if order.placed:
+                    print(f"Venta registrada: {product_name} - ${order.sale.price}")
+                else:
+                    print(f"Venta no registrada ({order.status}): {product_name}")
+    
+    @staticmethod
+    def _find_purchase_product(text_lower: str) -> Optional[tuple]:
+        """Producto (nombre, marca, precio) nombrado en un mensaje de confirmación de compra"""
+        for pattern, product in PURCHASE_PRODUCTS.items():
+            if pattern in text_lower:
+                return product
+        return None
 
     async def process_message(
         self, 
@@ -231,16 +282,19 @@ OBJETIVO: Ser un vendedor amigable y eficiente que ayuda con respuestas cortas y
         db_session: Optional[AsyncSession] = None
     ) -> MultiChatResponse:
         """Procesa un mensaje del usuario y genera una respuesta"""
+        from langchain_core.messages import HumanMessage, AIMessage, SystemMessage
         
         # Obtener historial de chat reciente (últimos 10 mensajes)
         history_messages = []
         if db_session:
-            result = await db_session.execute(
-                select(ChatHistory)
-                .order_by(ChatHistory.timestamp.desc())
-                .limit(10)
-            )
-            recent_history = result.scalars().all()
+            with stage_timer("history_fetch"):
+                result = await db_session.execute(
+                    select(ChatHistory)
+                    .where(ChatHistory.epoch == current_epoch_clause())
+                    .order_by(ChatHistory.timestamp.desc())
+                    .limit(10)
+                )
+                recent_history = result.scalars().all()
             # Revertir para orden cronológico
             for msg in reversed(recent_history):
                 if msg.role == "user":
@@ -252,14 +306,16 @@ OBJETIVO: Ser un vendedor amigable y eficiente que ayuda con respuestas cortas y
         products_mentioned = []
         
         if inventory_service:
-            context = await self._build_context(message, inventory_service)
-            products_mentioned = await self._extract_product_ids(message, inventory_service)
+            with stage_timer("build_context"):
+                context = await self._build_context(message, inventory_service)
+                products_mentioned = await self._extract_product_ids(message, inventory_service)
             
             # Registrar interacciones y actualizar preferencias
             if recommendation_service:
-                await self._track_chat_interactions(
-                    message, inventory_service, recommendation_service
-                )
+                with stage_timer("track_interactions"):
+                    await self._track_chat_interactions(
+                        message, inventory_service, recommendation_service
+                    )
         
         # Preparar mensajes para el LLM
         messages = [SystemMessage(content=self.system_prompt)]
@@ -275,14 +331,17 @@ OBJETIVO: Ser un vendedor amigable y eficiente que ayuda con respuestas cortas y
         messages.append(HumanMessage(content=message))
         
         # Generar respuesta
-        response = await self.llm.agenerate([messages])
-        response_text = response.generations[0][0].text
+        with stage_timer("llm_generate"):
+            response = await self.llm.agenerate([messages])
+            response_text = response.generations[0][0].text
         
         # Detectar y registrar posibles ventas
-        await self._track_purchase_intent(message, response_text, db_session)
+        with stage_timer("track_purchase_intent"):
+            await self._track_purchase_intent(message, response_text, db_session)
         
         # Dividir la respuesta en múltiples mensajes si es necesario
-        response_messages = self._split_response(response_text)
+        with stage_timer("split_response"):
+            response_messages = self._split_response(response_text)
         
         # Guardar en el historial si tenemos sesión de DB
         if db_session:
@@ -290,7 +349,8 @@ OBJETIVO: Ser un vendedor amigable y eficiente que ayuda con respuestas cortas y
             user_msg = ChatHistory(
                 role="user",
                 content=message,
-                timestamp=datetime.now()
+                timestamp=datetime.now(),
+                epoch=current_epoch_clause()
             )
             db_session.add(user_msg)
             
@@ -300,11 +360,13 @@ OBJETIVO: Ser un vendedor amigable y eficiente que ayuda con respuestas cortas y
                     role="assistant",
                     content=msg,
                     timestamp=datetime.now(),
-                    products_mentioned=json.dumps(products_mentioned) if products_mentioned else None
+                    products_mentioned=json.dumps(products_mentioned) if products_mentioned else None,
+                    epoch=current_epoch_clause()
                 )
                 db_session.add(assistant_msg)
             
-            await db_session.commit()
+            with stage_timer("history_commit"):
+                await db_session.commit()
         
         return MultiChatResponse(
             messages=response_messages,
@@ -361,73 +423,55 @@ OBJETIVO: Ser un vendedor amigable y eficiente que ayuda con respuestas cortas y
         # Si no se pudo dividir bien, devolver la respuesta original
         return messages if messages else [response]
     
+    @staticmethod
+    def _scan_context_keywords(message_lower: str):
+        """Detecta consulta de stock, productos, categorías y marcas mencionados (sin acceso a la base)"""
+        is_stock_query = any(keyword in message_lower for keyword in STOCK_KEYWORDS)
+        product_keywords = [keyword for keyword in SPECIFIC_PRODUCT_KEYWORDS if keyword in message_lower]
+        categories = {category for keyword, category in CONTEXT_CATEGORY_KEYWORDS.items() if keyword in message_lower}
+        brands = [brand for brand in CONTEXT_BRANDS if brand in message_lower]
+        return is_stock_query, product_keywords, categories, brands
+    
+    @staticmethod
+    def _scan_interaction_keywords(message_lower: str):
+        """Categorías y marcas mencionadas en un mensaje, para registrar interacciones"""
+        categories = [category for keyword, category in INTERACTION_CATEGORY_MAP.items() if keyword in message_lower]
+        brands = [brand.capitalize() for brand in INTERACTION_BRANDS if brand in message_lower]
+        return categories, brands
+    
+    @staticmethod
+    def _stock_info(product: Product) -> str:
+        """Stock disponible para vender (descontando las unidades apartadas por reservas)"""
+        available = stock_reservations.available(product.id, product.stock)
+        stock_info = f"Stock: {available}"
+        if available < 3:
+            stock_info += " (⚠️ Pocas unidades)"
+        return stock_info
+    
     async def _build_context(self, message: str, inventory_service: InventoryService) -> str:
         """Construye contexto relevante basado en el mensaje"""
         context_parts = []
         message_lower = message.lower()
         
-        # Detectar si preguntan por stock específico
-        stock_keywords = ["stock", "unidades", "disponible", "disponibles", "quedan", "hay", "tienen", "cuántos", "cuántas"]
-        is_stock_query = any(keyword in message_lower for keyword in stock_keywords)
-        
-        # Detectar productos específicos mencionados por nombre/modelo
-        specific_product_keywords = [
-            "hp pavilion", "hp probook", "macbook", "zenbook", "thinkpad", "dell xps",
-            "iphone", "galaxy", "pixel", "oneplus", "xiaomi",
-            "ipad", "surface", "galaxy tab",
-            "imac", "optiplex", "elite tower"
-        ]
+        is_stock_query, product_keywords, relevant_categories, brands = self._scan_context_keywords(message_lower)
         
+        # Productos específicos mencionados por nombre/modelo
         mentioned_products = []
-        for keyword in specific_product_keywords:
-            if keyword in message_lower:
-                products = await inventory_service.search_products(keyword)
-                mentioned_products.extend(products)
+        for keyword in product_keywords:
+            products = await inventory_service.search_products(keyword)
+            mentioned_products.extend(products)
         
         # Si hay productos específicos mencionados y es consulta de stock
         if mentioned_products and is_stock_query:
             context_parts.append("\nStock específico de productos mencionados:")
             for product in mentioned_products:
-                stock_status = "⚠️ Pocas unidades" if product.stock < 3 else "✅ Disponible"
+                available = stock_reservations.available(product.id, product.stock)
+                stock_status = "⚠️ Pocas unidades" if available < 3 else "✅ Disponible"
                 context_parts.append(
-                    f"- {product.name}: {product.stock} unidades {stock_status}"
+                    f"- {product.name}: {available} unidades {stock_status}"
                 )
             return "\n".join(context_parts)
         
-        # Detectar categorías mencionadas
-        category_keywords = {
-            "computadora": ProductCategory.COMPUTADORAS,
-            "computador": ProductCategory.COMPUTADORAS,
-            "desktop": ProductCategory.COMPUTADORAS,
-            "pc": ProductCategory.COMPUTADORAS,
-            "laptop": ProductCategory.LAPTOPS,
-            "portátil": ProductCategory.LAPTOPS,
-            "notebook": ProductCategory.LAPTOPS,
-            "tablet": ProductCategory.TABLETS,
-            "ipad": ProductCategory.TABLETS,
-            "teléfono": ProductCategory.CELULARES,
-            "celular": ProductCategory.CELULARES,
-            "smartphone": ProductCategory.CELULARES,
-            "móvil": ProductCategory.CELULARES,
-            "monitor": ProductCategory.MONITORES,
-            "pantalla": ProductCategory.MONITORES,
-            "mouse": ProductCategory.PERIFERICOS,
-            "teclado": ProductCategory.PERIFERICOS,
-            "periférico": ProductCategory.PERIFERICOS,
-            "audífono": ProductCategory.ACCESORIOS,
-            "auricular": ProductCategory.ACCESORIOS,
-            "webcam": ProductCategory.ACCESORIOS,
-            "cámara": ProductCategory.ACCESORIOS,
-            "impresora": ProductCategory.IMPRESORAS,
-            "printer": ProductCategory.IMPRESORAS
-        }
-        
-        # Buscar productos por categoría
-        relevant_categories = set()
-        for keyword, category in category_keywords.items():
-            if keyword in message_lower:
-                relevant_categories.add(category)
-        
         # Si se mencionan categorías específicas, obtener productos
         if relevant_categories:
             for category in relevant_categories:
@@ -435,27 +479,21 @@ OBJETIVO: Ser un vendedor amigable y eficiente que ayuda con respuestas cortas y
                 if products:
                     context_parts.append(f"\nProductos disponibles en {category.value}:")
                     for product in products[:5]:  # Limitar a 5 productos por categoría
-                        stock_info = f"Stock: {product.stock}"
-                        if product.stock < 3:
-                            stock_info += " (⚠️ Pocas unidades)"
+                        stock_info = self._stock_info(product)
                         context_parts.append(
                             f"- {product.name} ({product.brand}): ${product.price} - {stock_info}"
                         )
         
         # Buscar por marca si se menciona
-        brands = ["apple", "samsung", "hp", "dell", "lenovo", "asus", "microsoft", "google", "xiaomi", "oneplus"]
         for brand in brands:
-            if brand in message_lower:
-                products = await inventory_service.get_products_by_brand(brand.capitalize())
-                if products:
-                    context_parts.append(f"\nProductos de {brand.capitalize()}:")
-                    for product in products[:5]:
-                        stock_info = f"Stock: {product.stock}"
-                        if product.stock < 3:
-                            stock_info += " (⚠️ Pocas unidades)"
-                        context_parts.append(
-                            f"- {product.name}: ${product.price} - {stock_info}"
-                        )
+            products = await inventory_service.get_products_by_brand(brand.capitalize())
+            if products:
+                context_parts.append(f"\nProductos de {brand.capitalize()}:")
+                for product in products[:5]:
+                    stock_info = self._stock_info(product)
+                    context_parts.append(
+                        f"- {product.name}: ${product.price} - {stock_info}"
+                    )
         
         # Si no hay contexto específico, buscar por términos generales
         if not context_parts:
@@ -463,9 +501,7 @@ OBJETIVO: Ser un vendedor amigable y eficiente que ayuda con respuestas cortas y
             if search_results:
                 context_parts.append("\nProductos relacionados con tu búsqueda:")
                 for product in search_results[:5]:
-                    stock_info = f"Stock: {product.stock}"
-                    if product.stock < 3:
-                        stock_info += " (⚠️ Pocas unidades)"
+                    stock_info = self._stock_info(product)
                     context_parts.append(
                         f"- {product.name} ({product.brand}): ${product.price} - {stock_info}"
                     )
@@ -484,66 +520,10 @@ OBJETIVO: Ser un vendedor amigable y eficiente que ayuda con respuestas cortas y
         recommendation_service: RecommendationService
     ):
         """Registra interacciones del chat para mejorar recomendaciones"""
-        message_lower = message.lower()
+        categories_mentioned, brands_mentioned = self._scan_interaction_keywords(message.lower())
         
-        # Detectar categorías mencionadas
-        category_map = {
-            "computadora": "computadoras",
-            "computadoras": "computadoras",
-            "computador": "computadoras",
-            "desktop": "computadoras",
-            "pc": "computadoras",
-            "laptop": "laptops",
-            "laptops": "laptops",
-            "portátil": "laptops",
-            "portátiles": "laptops",
-            "notebook": "laptops",
-            "notebooks": "laptops",
-            "tablet": "tablets",
-            "tablets": "tablets",
-            "ipad": "tablets",
-            "teléfono": "celulares",
-            "teléfonos": "celulares",
-            "celular": "celulares",
-            "celulares": "celulares",
-            "smartphone": "celulares",
-            "smartphones": "celulares",
-            "móvil": "celulares",
-            "iphone": "celulares",
-            "galaxy": "celulares",
-            "pixel": "celulares",
-            "monitor": "monitores",
-            "monitores": "monitores",
-            "pantalla": "monitores",
-            "pantallas": "monitores",
-            "mouse": "perifericos",
-            "teclado": "perifericos",
-            "periférico": "perifericos",
-            "periféricos": "perifericos",
-            "audífono": "accesorios",
-            "audífonos": "accesorios",
-            "auricular": "accesorios",
-            "auriculares": "accesorios",
-            "webcam": "accesorios",
-            "cámara": "accesorios",
-            "impresora": "impresoras",
-            "impresoras": "impresoras",
-            "printer": "impresoras"
-        }
-        
-        categories_mentioned = []
-        for keyword, category in category_map.items():
-            if keyword in message_lower:
-                categories_mentioned.append(category)
-        
-        # Detectar marcas mencionadas
-        brands_mentioned = []
-        known_brands = ["apple", "samsung", "hp", "dell", "lenovo", "asus", "microsoft", 
-                       "google", "xiaomi", "oneplus", "logitech", "corsair", "razer", "benq", "lg"]
-        
-        for brand in known_brands:
-            if brand in message_lower:
-                brands_mentioned.append(brand.capitalize())
+        # Analítica de búsquedas: sin categoría ni marca reconocida es demanda no atendida
+        await publish_search(message, bool(categories_mentioned or brands_mentioned), "chat")
         
         # Actualizar preferencias basadas en menciones
         if categories_mentioned or brands_mentioned:
@@ -558,4 +538,13 @@ OBJETIVO: Ser un vendedor amigable y eficiente que ayuda con respuestas cortas y
                 interaction_type="chat_mention",
                 category=category,
                 search_query=message
-            ) 
\ No newline at end of file
+            )
+
+_chat_service: Optional[ChatService] = None
+
+def get_chat_service() -> ChatService:
+    """ChatService compartido por todo el proceso (REST y WebSocket)"""
+    global _chat_service
+    if _chat_service is None:
+        _chat_service = ChatService(use_mock=settings.use_mock_llm)
+    return _chat_service
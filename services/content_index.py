@@ -0,0 +1,365 @@
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+import asyncio
+import heapq
+import json
+import logging
+import math
+import re
+import unicodedata
+import numpy as np
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from models.product import Product
+from services.event_bus import event_bus, TOPIC_INVENTORY
+from config import settings
+
+logger = logging.getLogger(__name__)
+
+# Índice de similitud de contenido: cada producto es un vector TF-IDF disperso de palabras de
+# la descripción, pares clave:valor de las especificaciones y atributos normalizados (RAM,
+# almacenamiento, familia de procesador). Los vecinos top-k se calculan al cargar y al crear
+# un producto, comparando solo contra candidatos que comparten términos poco frecuentes. La
+# carga inicial arma el índice en un hilo aparte y puntúa cada producto con numpy contra a
+# lo sumo `max_candidates` candidatos, así el costo por producto está acotado.
+
+STOPWORDS = {
+    "de", "la", "el", "en", "con", "para", "y", "a", "los", "las", "un", "una", "su", "sus",
+    "del", "al", "por", "que", "o", "e", "se", "lo", "mas", "muy", "sin", "es", "ideal"
+}
+
+# Peso de cada tipo de término antes del IDF
+WORD_WEIGHT = 1.0
+SPEC_WEIGHT = 1.0
+ATTRIBUTE_WEIGHT = 2.0
+# Tamaños vecinos (mitad o doble) comparten parte del peso: 8GB se parece a 16GB
+NEARBY_SIZE_WEIGHT = 0.5
+
+SPEC_KEYS_RAM = ("ram", "memoria")
+SPEC_KEYS_STORAGE = ("almacenamiento", "capacidad")
+SPEC_KEYS_CPU = ("procesador", "chip")
+
+_TOKEN = re.compile(r"[a-z0-9]+(?:\.[0-9]+)?")
+_SIZE = re.compile(r"(\d+(?:\.\d+)?)\s*(tb|gb|mb)")
+_CPU_FAMILIES = [
+    (re.compile(r"\bcore\s*(i[3579])\b|\b(i[3579])-\d"), "intel_{}"),
+    (re.compile(r"\bryzen\s*(\d)\b"), "ryzen_{}"),
+    (re.compile(r"\b(m[1-4])(?:\s*(pro|max|ultra))?\b"), "apple_{}"),
+    (re.compile(r"\bsnapdragon\b"), "snapdragon"),
+    (re.compile(r"\bexynos\b"), "exynos"),
+    (re.compile(r"\b(a\d{2})\s*bionic\b"), "apple_{}"),
+    (re.compile(r"\bceleron\b"), "intel_celeron"),
+    (re.compile(r"\bpentium\b"), "intel_pentium"),
+]
+
+def _normalize(text: str) -> str:
+    text = unicodedata.normalize("NFKD", text or "").encode("ascii", "ignore").decode()
+    return text.lower()
+
+def _tokens(text: str) -> List[str]:
+    return [t for t in _TOKEN.findall(_normalize(text)) if len(t) > 1 and t not in STOPWORDS]
+
+def _size_gb(value: str) -> Optional[float]:
+    match = _SIZE.search(_normalize(value))
+    if not match:
+        return None
+    amount, unit = float(match.group(1)), match.group(2)
+    return amount * 1024 if unit == "tb" else amount / 1024 if unit == "mb" else amount
+
+def _size_terms(name: str, value: str) -> Dict[str, float]:
+    """Tamaño en GB redondeado a potencia de 2, con peso parcial para los tamaños vecinos"""
+    size = _size_gb(value)
+    if not size:
+        return {}
+    bucket = round(math.log2(size))
+    return {
+        f"{name}:{bucket}": ATTRIBUTE_WEIGHT,
+        f"{name}:{bucket - 1}": NEARBY_SIZE_WEIGHT,
+        f"{name}:{bucket + 1}": NEARBY_SIZE_WEIGHT,
+    }
+
+def _cpu_family(value: str) -> Optional[str]:
+    value = _normalize(value)
+    for pattern, family in _CPU_FAMILIES:
+        match = pattern.search(value)
+        if match:
+            groups = [g for g in match.groups() if g]
+            return family.format("_".join(groups)) if groups else family
+    return None
+
+def product_terms(brand: str, category: Any, description: str, specifications: str) -> Dict[str, float]:
+    """Términos con peso de un producto (sin IDF)"""
+    terms: Dict[str, float] = {}
+
+    def add(term: str, weight: float):
+        terms[term] = terms.get(term, 0.0) + weight
+
+    if brand:
+        add(f"brand:{_normalize(brand)}", SPEC_WEIGHT)
+    if category:
+        add(f"category:{_normalize(getattr(category, 'value', category))}", SPEC_WEIGHT)
+    for token in _tokens(description):
+        add(f"w:{token}", WORD_WEIGHT)
+
+    try:
+        specs = json.loads(specifications) if specifications else {}
+    except (TypeError, ValueError):
+        specs = {}
+    if not isinstance(specs, dict):
+        specs = {}
+    for key, value in specs.items():
+        key, value = _normalize(str(key)), str(value)
+        for token in _tokens(value):
+            add(f"{key}:{token}", SPEC_WEIGHT)
+        if key in SPEC_KEYS_RAM:
+            for term, weight in _size_terms("ram_gb", value).items():
+                add(term, weight)
+        elif key in SPEC_KEYS_STORAGE:
+            for term, weight in _size_terms("storage_gb", value).items():
+                add(term, weight)
+        elif key in SPEC_KEYS_CPU:
+            family = _cpu_family(value)
+            if family:
+                add(f"cpu:{family}", ATTRIBUTE_WEIGHT)
+    return terms
+
+class ContentIndex:
+    def __init__(self, top_k: int = 20, max_candidates: int = 500):
+        self.top_k = top_k
+        self.max_candidates = max_candidates
+        # Vocabulario: término -> id; frecuencia de documento y productos por id de término
+        # (dict ordenado por inserción: agregar y quitar en O(1))
+        self._vocabulary: Dict[str, int] = {}
+        self._df: List[int] = []
+        self._postings: List[Dict[int, None]] = []
+        # Vector normalizado (id de término -> peso) y vecinos (puntaje, id) de cada producto
+        self._vectors: Dict[int, Dict[int, float]] = {}
+        self._neighbours: Dict[int, List[Tuple[float, int]]] = {}
+        self.loaded = False
+        self._load_lock = asyncio.Lock()
+        self._loading = False
+        self._pending_events: List[Dict[str, Any]] = []
+
+    def _term_id(self, term: str) -> int:
+        term_id = self._vocabulary.get(term)
+        if term_id is None:
+            term_id = self._vocabulary[term] = len(self._df)
+            self._df.append(0)
+            self._postings.append({})
+        return term_id
+
+    def _vectorize(self, terms: Dict[str, float]) -> Dict[int, float]:
+        # El IDF queda fijo al indexar: los productos nuevos usan las frecuencias del momento
+        documents = len(self._vectors) + 1
+        vector = {}
+        for term, weight in terms.items():
+            term_id = self._term_id(term)
+            vector[term_id] = weight * (math.log((documents + 1) / (self._df[term_id] + 1)) + 1)
+        norm = math.sqrt(sum(w * w for w in vector.values())) or 1.0
+        return {term_id: w / norm for term_id, w in vector.items()}
+
+    def _add(self, product_id: int, terms: Dict[str, float]):
+        self._remove(product_id)
+        vector = self._vectorize(terms)
+        self._vectors[product_id] = vector
+        for term_id in vector:
+            self._df[term_id] += 1
+            self._postings[term_id][product_id] = None
+
+    def _remove(self, product_id: int):
+        vector = self._vectors.pop(product_id, None)
+        if vector:
+            for term_id in vector:
+                self._df[term_id] -= 1
+                del self._postings[term_id][product_id]
+
+    def _candidates(self, product_id: int, vector: Dict[int, float]) -> List[int]:
+        """Productos que comparten términos, empezando por los términos más raros"""
+        candidates: Dict[int, None] = {}
+        for term_id in sorted(vector, key=lambda t: self._df[t]):
+            for other in self._postings[term_id]:
+                if other != product_id:
+                    candidates[other] = None
+                    if len(candidates) >= self.max_candidates:
+                        return list(candidates)
+        return list(candidates)
+
+    def _score(self, product_id: int) -> List[Tuple[float, int]]:
+        vector = self._vectors[product_id]
+        scored = []
+        for other in self._candidates(product_id, vector):
+            other_vector = self._vectors[other]
+            small, large = (vector, other_vector) if len(vector) <= len(other_vector) else (other_vector, vector)
+            score = sum(weight * large.get(term_id, 0.0) for term_id, weight in small.items())
+            if score > 0:
+                scored.append((score, other))
+        return scored
+
+    def _best(self, scored: Iterable[Tuple[float, int]]) -> List[Tuple[float, int]]:
+        return heapq.nlargest(self.top_k, scored, key=lambda item: (item[0], -item[1]))
+
+    def _offer(self, product_id: int, score: float, other: int):
+        """Ofrece `other` como vecino de `product_id`, reemplazando su puntaje anterior"""
+        current = [item for item in self._neighbours.get(product_id, []) if item[1] != other]
+        self._neighbours[product_id] = self._best(current + [(score, other)])
+
+    def index_product(self, product_id: int, brand: str, category: Any, description: str, specifications: str):
+        """Agrega o reemplaza un producto y actualiza solo los vecinos afectados"""
+        self._add(product_id, product_terms(brand, category, description, specifications))
+        scored = self._score(product_id)
+        self._neighbours[product_id] = self._best(scored)
+        for score, other in scored:
+            self._offer(other, score, product_id)
+
+    def neighbours(self, product_id: int, limit: Optional[int] = None) -> List[int]:
+        """Productos más parecidos por contenido, de cualquier categoría"""
+        neighbours = self._neighbours.get(product_id, [])
+        return [other for _, other in (neighbours if limit is None else neighbours[:limit])]
+
+    def _build(self, documents: List[Tuple[int, Dict[str, float]]]) -> Tuple[Any, ...]:
+        """Índice completo del catálogo; no toca el estado actual (corre en un hilo aparte)"""
+        # Frecuencias de todo el catálogo antes de vectorizar para que el IDF sea el mismo para todos
+        vocabulary: Dict[str, int] = {}
+        df: List[int] = []
+        for _, terms in documents:
+            for term in terms:
+                term_id = vocabulary.setdefault(term, len(df))
+                if term_id == len(df):
+                    df.append(0)
+                df[term_id] += 1
+
+        total = len(documents)
+        idf = np.log((total + 1) / (np.asarray(df, dtype=np.float64) + 1)) + 1
+        product_ids = np.fromiter((product_id for product_id, _ in documents), dtype=np.int64, count=total)
+        # Matriz dispersa por filas (CSR): términos y pesos normalizados de cada producto
+        indptr = np.zeros(total + 1, dtype=np.int64)
+        np.cumsum([len(terms) for _, terms in documents], out=indptr[1:])
+        indices = np.fromiter(
+            (vocabulary[term] for _, terms in documents for term in terms), dtype=np.int64, count=indptr[-1]
+        )
+        data = np.fromiter(
+            (weight for _, terms in documents for weight in terms.values()), dtype=np.float64, count=indptr[-1]
+        ) * idf[indices]
+        rows = np.repeat(np.arange(total), np.diff(indptr))
+        norms = np.sqrt(np.bincount(rows, weights=data * data, minlength=total))
+        data /= np.where(norms > 0, norms, 1.0)[rows]
+
+        # Listas de productos por término (CSC), en el orden de carga
+        order = np.argsort(indices, kind="stable")
+        posting_rows = rows[order]
+        posting_ptr = np.zeros(len(df) + 1, dtype=np.int64)
+        np.cumsum(np.bincount(indices, minlength=len(df)), out=posting_ptr[1:])
+
+        df_array = np.asarray(df, dtype=np.int64)
+        dense = np.zeros(len(df), dtype=np.float64)
+        vectors: Dict[int, Dict[int, float]] = {}
+        neighbours: Dict[int, List[Tuple[float, int]]] = {}
+        for row in range(total):
+            start, end = indptr[row], indptr[row + 1]
+            terms, weights = indices[start:end], data[start:end]
+            product_id = int(product_ids[row])
+            vectors[product_id] = dict(zip(terms.tolist(), weights.tolist()))
+
+            candidates = self._bulk_candidates(row, terms[np.argsort(df_array[terms], kind="stable")], posting_rows, posting_ptr)
+            if len(candidates) == 0:
+                neighbours[product_id] = []
+                continue
+            # Producto punto contra cada candidato: el vector propio en denso y los candidatos en CSR
+            starts = indptr[candidates]
+            lengths = indptr[candidates + 1] - starts
+            offsets = np.zeros(len(candidates), dtype=np.int64)
+            np.cumsum(lengths[:-1], out=offsets[1:])
+            positions = np.repeat(starts - offsets, lengths) + np.arange(lengths.sum())
+            dense[terms] = weights
+            scores = np.add.reduceat(dense[indices[positions]] * data[positions], offsets)
+            dense[terms] = 0.0
+            neighbours[product_id] = self._bulk_best(scores, product_ids[candidates])
+
+        postings: List[Dict[int, None]] = [
+            dict.fromkeys(product_ids[posting_rows[posting_ptr[term_id]:posting_ptr[term_id + 1]]].tolist())
+            for term_id in range(len(df))
+        ]
+        return vocabulary, df, postings, vectors, neighbours
+
+    def _bulk_candidates(self, row: int, terms, posting_rows, posting_ptr):
+        """Filas que comparten términos con `row`, empezando por los más raros (como _candidates)"""
+        chunks, collected = [], 0
+        for term_id in terms:
+            # De cada término alcanza con los primeros max_candidates + 1 (uno puede ser el propio)
+            posting = posting_rows[posting_ptr[term_id]:min(posting_ptr[term_id + 1], posting_ptr[term_id] + self.max_candidates + 1)]
+            chunks.append(posting)
+            collected += len(posting)
+            if collected > self.max_candidates:
+                candidates = self._unique_in_order(np.concatenate(chunks), row)
+                if len(candidates) >= self.max_candidates:
+                    return candidates[:self.max_candidates]
+        if not chunks:
+            return np.zeros(0, dtype=np.int64)
+        return self._unique_in_order(np.concatenate(chunks), row)
+
+    @staticmethod
+    def _unique_in_order(values, exclude: int):
+        values = values[values != exclude]
+        _, first = np.unique(values, return_index=True)
+        return values[np.sort(first)]
+
+    def _bulk_best(self, scores, candidate_ids) -> List[Tuple[float, int]]:
+        """Top-k por puntaje (desempate por id menor, como _best) sin ordenar todos los candidatos"""
+        positive = scores > 0
+        scores, candidate_ids = scores[positive], candidate_ids[positive]
+        if len(scores) > self.top_k:
+            # Todos los empatados con el k-ésimo entran al desempate por id
+            threshold = np.partition(scores, len(scores) - self.top_k)[len(scores) - self.top_k]
+            keep = scores >= threshold
+            scores, candidate_ids = scores[keep], candidate_ids[keep]
+        order = np.lexsort((candidate_ids, -scores))[:self.top_k]
+        return list(zip(scores[order].tolist(), candidate_ids[order].tolist()))
+
+    async def load(self, session: AsyncSession, batch_size: int = 10_000):
+        """Indexa todo el catálogo y calcula los vecinos de cada producto"""
+        self._loading = True
+        try:
+            result = await session.stream(
+                select(Product.id, Product.brand, Product.category, Product.description, Product.specifications)
+                .execution_options(yield_per=batch_size)
+            )
+            rows = [row async for row in result]
+            # Catálogos grandes: tokenizar y puntuar fuera del event loop
+            documents = await asyncio.to_thread(
+                lambda: [
+                    (product_id, product_terms(brand, category, description, specifications))
+                    for product_id, brand, category, description, specifications in rows
+                ]
+            )
+            built = await asyncio.to_thread(self._build, documents)
+            self._vocabulary, self._df, self._postings, self._vectors, self._neighbours = built
+
+            pending, self._pending_events = self._pending_events, []
+            for data in pending:
+                self._apply_event(data)
+            self.loaded = True
+        finally:
+            self._loading = False
+        logger.info(f"Índice de contenido cargado con {len(self._vectors)} productos y {len(self._vocabulary)} términos")
+
+    async def ensure_loaded(self, session: AsyncSession, wait: bool = True):
+        """Con wait=False no espera una carga en curso: hasta que termine no hay vecinos"""
+        if self.loaded or (not wait and self._load_lock.locked()):
+            return
+        async with self._load_lock:
+            if not self.loaded:
+                await self.load(session)
+
+    def _apply_event(self, data: Dict[str, Any]):
+        self.index_product(data["id"], data.get("brand"), data.get("category"), data.get("description"), data.get("specifications"))
+
+    async def on_event(self, topic: str, payload: Dict[str, Any]):
+        """Indexa los productos nuevos; los cambios de stock no alteran el contenido"""
+        if topic != TOPIC_INVENTORY or payload.get("event") != "product_created":
+            return
+        if self._loading:
+            self._pending_events.append(payload["data"])
+        elif self.loaded:
+            self._apply_event(payload["data"])
+
+content_index = ContentIndex(top_k=settings.related_top_k)
+event_bus.subscribe(content_index.on_event)
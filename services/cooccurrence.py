@@ -0,0 +1,198 @@
+from typing import Any, Dict, List, Optional, Set, Tuple
+from datetime import datetime
+import asyncio
+import heapq
+import logging
+import math
+from sqlalchemy import select, literal, union_all, Float
+from sqlalchemy.ext.asyncio import AsyncSession
+from models.product import Sale
+from models.user_interaction import UserInteraction
+from services.event_bus import event_bus, TOPIC_INTERACTIONS, TOPIC_SALES
+from config import settings
+
+logger = logging.getLogger(__name__)
+
+# Índice item-item de co-ocurrencias: dos productos vistos o comprados en la misma sesión
+# (eventos separados por menos de `session_gap`) suman peso al par. Los pesos decaen con el
+# tiempo y cada producto guarda su lista de vecinos top-k ya ordenada.
+
+# Peso de cada tipo de evento: una venta dice más que una vista
+INTERACTION_WEIGHT = 1.0
+SALE_WEIGHT = 3.0
+
+# Exponente máximo del factor de decaimiento antes de reescalar todos los pesos
+MAX_DECAY_EXPONENT = 30.0
+
+# Memoria acotada por fila: se guardan ROW_CAPACITY_FACTOR * top_k vecinos por peso y se poda
+# al llegar al doble (los recién llegados tienen margen para acumular peso). Al reescalar se
+# descartan los pesos por debajo de PRUNE_EPSILON (un evento de hace ~10 vidas medias)
+ROW_CAPACITY_FACTOR = 4
+PRUNE_EPSILON = 1e-3
+
+class CooccurrenceIndex:
+    def __init__(
+        self,
+        top_k: int = 20,
+        half_life_days: float = 14.0,
+        session_gap_minutes: float = 30.0,
+        session_window: int = 20
+    ):
+        self.top_k = top_k
+        self._row_capacity = ROW_CAPACITY_FACTOR * top_k
+        # Decaimiento hacia adelante: un evento en t pesa exp((t - referencia) / tau), así
+        # los pesos viejos no se recorren al llegar eventos nuevos y el orden se conserva
+        self._tau = half_life_days * 86400 / math.log(2)
+        self._reference: Optional[float] = None
+        self._session_gap = session_gap_minutes * 60
+        self._session_window = session_window
+        # Matriz dispersa fila por fila: producto -> {vecino: peso}
+        self._rows: Dict[int, Dict[int, float]] = {}
+        self._neighbours: Dict[int, Tuple[int, ...]] = {}
+        # Sesión abierta: productos en orden de aparición y hora del último evento
+        self._session: List[int] = []
+        self._last_seen: Optional[float] = None
+        self.loaded = False
+        self._load_lock = asyncio.Lock()
+        self._loading = False
+        self._pending_events: List[Tuple[float, int, float]] = []
+
+    def _decay_factor(self, timestamp: float) -> float:
+        if self._reference is None:
+            self._reference = timestamp
+        exponent = (timestamp - self._reference) / self._tau
+        if exponent > MAX_DECAY_EXPONENT:
+            self._rescale(timestamp)
+            exponent = 0.0
+        return math.exp(exponent)
+
+    def _rescale(self, timestamp: float):
+        """Mueve la referencia del decaimiento a `timestamp` para que los pesos no se desborden"""
+        factor = math.exp(-(timestamp - self._reference) / self._tau)
+        for product_id, row in list(self._rows.items()):
+            for neighbour in list(row):
+                weight = row[neighbour] * factor
+                if weight < PRUNE_EPSILON:
+                    del row[neighbour]
+                else:
+                    row[neighbour] = weight
+            if not row:
+                del self._rows[product_id]
+                self._neighbours.pop(product_id, None)
+            else:
+                self._refresh(product_id)
+        self._reference = timestamp
+
+    def _observe(self, timestamp: float, product_id: int, weight: float) -> Set[int]:
+        """Agrega un evento a la sesión abierta y devuelve las filas que cambiaron"""
+        if self._last_seen is None or timestamp - self._last_seen > self._session_gap:
+            self._session = []
+        self._last_seen = max(timestamp, self._last_seen or timestamp)
+        if product_id in self._session:
+            return set()
+
+        increment = weight * self._decay_factor(timestamp)
+        row = self._rows.setdefault(product_id, {})
+        for other in self._session:
+            row[other] = row.get(other, 0.0) + increment
+            other_row = self._rows.setdefault(other, {})
+            other_row[product_id] = other_row.get(product_id, 0.0) + increment
+        touched = {product_id, *self._session} if self._session else set()
+
+        self._session.append(product_id)
+        if len(self._session) > self._session_window:
+            self._session.pop(0)
+        return touched
+
+    def _refresh(self, product_id: int):
+        row = self._rows.get(product_id)
+        if row:
+            if len(row) > 2 * self._row_capacity:
+                kept = heapq.nlargest(self._row_capacity, row.items(), key=lambda item: (item[1], -item[0]))
+                row = self._rows[product_id] = dict(kept)
+            best = heapq.nlargest(self.top_k, row.items(), key=lambda item: (item[1], -item[0]))
+            self._neighbours[product_id] = tuple(neighbour for neighbour, _ in best)
+
+    def add_event(self, timestamp: datetime, product_id: int, weight: float = INTERACTION_WEIGHT):
+        """Suma un evento y actualiza solo las listas de vecinos afectadas"""
+        for touched in self._observe(timestamp.timestamp(), product_id, weight):
+            self._refresh(touched)
+
+    def neighbours(self, product_id: int, limit: Optional[int] = None) -> Tuple[int, ...]:
+        """Vecinos precalculados de un producto, del más al menos relacionado"""
+        neighbours = self._neighbours.get(product_id, ())
+        return neighbours if limit is None else neighbours[:limit]
+
+    async def load(self, session: AsyncSession, batch_size: int = 10_000):
+        """Construye el índice recorriendo interacciones y ventas en orden cronológico"""
+        self._loading = True
+        try:
+            events = union_all(
+                select(
+                    UserInteraction.timestamp.label("timestamp"),
+                    UserInteraction.product_id.label("product_id"),
+                    literal(INTERACTION_WEIGHT, Float).label("weight")
+                ).where(UserInteraction.product_id.isnot(None)),
+                select(
+                    Sale.timestamp.label("timestamp"),
+                    Sale.product_id.label("product_id"),
+                    literal(SALE_WEIGHT, Float).label("weight")
+                ).where(Sale.product_id.isnot(None), Sale.status != "cancelled")
+            ).subquery()
+            result = await session.stream(
+                select(events.c.timestamp, events.c.product_id, events.c.weight)
+                .order_by(events.c.timestamp)
+                .execution_options(yield_per=batch_size)
+            )
+
+            self._rows, self._neighbours, self._session = {}, {}, []
+            self._reference = self._last_seen = None
+            touched: Set[int] = set()
+            async for timestamp, product_id, weight in result:
+                if timestamp is not None:
+                    touched |= self._observe(timestamp.timestamp(), product_id, weight)
+            for product_id in touched:
+                self._refresh(product_id)
+
+            # Eventos recibidos mientras corría la consulta que no quedaron en ella
+            pending, self._pending_events = self._pending_events, []
+            for timestamp, product_id, weight in pending:
+                if self._last_seen is None or timestamp > self._last_seen:
+                    for changed in self._observe(timestamp, product_id, weight):
+                        self._refresh(changed)
+            self.loaded = True
+        finally:
+            self._loading = False
+        logger.info(f"Índice de co-ocurrencias cargado con {len(self._neighbours)} productos")
+
+    async def ensure_loaded(self, session: AsyncSession):
+        if self.loaded:
+            return
+        async with self._load_lock:
+            if not self.loaded:
+                await self.load(session)
+
+    async def on_event(self, topic: str, payload: Dict[str, Any]):
+        """Actualiza el índice con interacciones y ventas nuevas"""
+        data = payload.get("data") or {}
+        if topic == TOPIC_INTERACTIONS and payload.get("event") == "interaction_created":
+            weight = INTERACTION_WEIGHT
+        elif topic == TOPIC_SALES and payload.get("event") == "sale_created" and data.get("status") != "cancelled":
+            weight = SALE_WEIGHT
+        else:
+            return
+        if data.get("product_id") is None:
+            return
+
+        timestamp = datetime.fromisoformat(data.get("timestamp") or payload["timestamp"])
+        if self._loading:
+            self._pending_events.append((timestamp.timestamp(), data["product_id"], weight))
+        elif self.loaded:
+            self.add_event(timestamp, data["product_id"], weight)
+
+cooccurrence_index = CooccurrenceIndex(
+    top_k=settings.related_top_k,
+    half_life_days=settings.cooccurrence_half_life_days,
+    session_gap_minutes=settings.cooccurrence_session_gap_minutes
+)
+event_bus.subscribe(cooccurrence_index.on_event)
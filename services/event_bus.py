@@ -0,0 +1,69 @@
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+from datetime import datetime
+import asyncio
+import logging
+from services.pubsub import PubSubBackend, InMemoryBackend, create_backend
+from config import settings
+
+logger = logging.getLogger(__name__)
+
+# Tópicos publicados por los servicios
+TOPIC_INVENTORY = "inventory"
+TOPIC_SALES = "sales"
+TOPIC_INTERACTIONS = "interactions"
+TOPIC_PREFERENCES = "preferences"
+
+EventHandler = Callable[[str, Dict[str, Any]], Awaitable[None]]
+
+class EventBus:
+    """
+    Bus de eventos para notificar cambios de inventario y ventas. El transporte lo
+    resuelve un backend de pub/sub: en memoria (un proceso) o un broker local que
+    reparte los eventos entre todos los workers.
+    """
+    
+    def __init__(self, backend: Optional[PubSubBackend] = None):
+        self._handlers: List[EventHandler] = []
+        self.backend = backend or InMemoryBackend()
+        self.backend.bind(self._dispatch)
+    
+    async def start(self):
+        await self.backend.start()
+    
+    async def stop(self):
+        await self.backend.stop()
+    
+    def subscribe(self, handler: EventHandler):
+        if handler not in self._handlers:
+            self._handlers.append(handler)
+    
+    def unsubscribe(self, handler: EventHandler):
+        if handler in self._handlers:
+            self._handlers.remove(handler)
+    
+    async def publish(self, topic: str, event: str, data: Dict[str, Any]):
+        """Publica un evento a todos los suscriptores; los errores no afectan al publicador"""
+        payload = {
+            "event": event,
+            "data": data,
+            "timestamp": datetime.now().isoformat()
+        }
+        try:
+            await self.backend.publish(topic, payload)
+        except Exception as e:
+            logger.error(f"Error publicando evento {topic}/{event}: {e}")
+    
+    async def _dispatch(self, topic: str, payload: Dict[str, Any]):
+        """Entrega un evento recibido del backend a los suscriptores de este proceso"""
+        if not self._handlers:
+            return
+        
+        results = await asyncio.gather(
+            *(handler(topic, payload) for handler in self._handlers),
+            return_exceptions=True
+        )
+        for result in results:
+            if isinstance(result, Exception):
+                logger.error(f"Error entregando evento {topic}/{payload.get('event')}: {result}")
+
+event_bus = EventBus(create_backend(settings.pubsub_backend, settings.pubsub_socket_path))
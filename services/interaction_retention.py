@@ -0,0 +1,213 @@
+from typing import Any, Dict, List, Optional, Tuple
+from datetime import date, datetime, timedelta
+import asyncio
+import gzip
+import json
+import logging
+import os
+from sqlalchemy import select, delete, func, literal, union_all
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.ext.asyncio import AsyncSession
+from database import async_session_maker
+from models.product import Product
+from models.user_interaction import UserInteraction, InteractionDailyRollup
+from config import settings
+
+logger = logging.getLogger(__name__)
+
+# Retención de user_interactions: las filas más viejas que la ventana se pasan a conteos diarios
+# (interaction_daily_rollups) y se borran por lotes. Cada lote es una transacción corta que
+# reclama sus filas con DELETE ... RETURNING, así varios workers no cuentan dos veces la misma fila.
+
+# Filas por sentencia de upsert (límite de variables de SQLite)
+UPSERT_CHUNK = 500
+
+RollupKey = Tuple[date, int, str, str]
+
+GROUP_COLUMNS = ("product_id", "category", "interaction_type")
+
+class InteractionRetention:
+    def __init__(
+        self,
+        retention_days: int = 90,
+        batch_size: int = 5000,
+        batch_pause: float = 0.05,
+        interval: float = 3600.0,
+        archive_dir: str = ""
+    ):
+        self.retention_days = retention_days
+        self.batch_size = batch_size
+        self.batch_pause = batch_pause
+        self.interval = interval
+        self.archive_dir = archive_dir
+        self._task: Optional[asyncio.Task] = None
+
+    def cutoff(self) -> datetime:
+        """Inicio del día más viejo que se conserva en crudo (los rollups son por día completo)"""
+        today = datetime.combine(date.today(), datetime.min.time())
+        return today - timedelta(days=self.retention_days)
+
+    async def roll_up_batch(self, session: AsyncSession, cutoff: datetime) -> int:
+        """Mueve un lote de filas anteriores a `cutoff` a los rollups; devuelve cuántas movió"""
+        table = UserInteraction.__table__
+        oldest = (
+            select(table.c.id)
+            .where(table.c.timestamp < cutoff)
+            .order_by(table.c.timestamp)
+            .limit(self.batch_size)
+            .scalar_subquery()
+        )
+        try:
+            result = await session.execute(
+                delete(table).where(table.c.id.in_(oldest)).returning(*table.c)
+            )
+            rows = result.mappings().all()
+            if not rows:
+                await session.rollback()
+                return 0
+
+            product_ids = {row["product_id"] for row in rows if row["product_id"] is not None}
+            categories: Dict[int, str] = {}
+            if product_ids:
+                products = await session.execute(
+                    select(Product.id, Product.category).where(Product.id.in_(product_ids))
+                )
+                categories = {product_id: category.value.lower() for product_id, category in products}
+
+            counts: Dict[RollupKey, int] = {}
+            for row in rows:
+                key = (
+                    row["timestamp"].date(),
+                    row["product_id"] or 0,
+                    categories.get(row["product_id"]) or (row["category_viewed"] or "").lower(),
+                    row["interaction_type"] or ""
+                )
+                counts[key] = counts.get(key, 0) + 1
+            await self._upsert(session, counts)
+            await session.commit()
+        except Exception:
+            # Sin rollback la conexión del pool sigue con el lock de escritura
+            await session.rollback()
+            raise
+
+        # El archivo se escribe solo con el lote ya confirmado: si el commit falla (p. ej.
+        # SQLITE_BUSY) las filas siguen en user_interactions y no quedan también archivadas
+        if self.archive_dir:
+            try:
+                await asyncio.to_thread(self._archive, rows)
+            except OSError as e:
+                logger.error(f"No se pudo archivar el lote de interacciones: {e}")
+        return len(rows)
+
+    @staticmethod
+    async def _upsert(session: AsyncSession, counts: Dict[RollupKey, int]):
+        values = [
+            {"day": day, "product_id": product_id, "category": category, "interaction_type": interaction_type, "count": count}
+            for (day, product_id, category, interaction_type), count in counts.items()
+        ]
+        for start in range(0, len(values), UPSERT_CHUNK):
+            statement = sqlite_insert(InteractionDailyRollup).values(values[start:start + UPSERT_CHUNK])
+            await session.execute(statement.on_conflict_do_update(
+                index_elements=["day", "product_id", "category", "interaction_type"],
+                set_={"count": InteractionDailyRollup.count + statement.excluded.count}
+            ))
+
+    def _archive(self, rows: List[Dict[str, Any]]):
+        """Agrega las filas crudas a un JSONL comprimido por mes (cada lote es un miembro gzip)"""
+        os.makedirs(self.archive_dir, exist_ok=True)
+        by_month: Dict[str, List[str]] = {}
+        for row in rows:
+            record = {**row, "timestamp": row["timestamp"].isoformat()}
+            by_month.setdefault(row["timestamp"].strftime("%Y-%m"), []).append(json.dumps(record, ensure_ascii=False))
+        for month, lines in by_month.items():
+            path = os.path.join(self.archive_dir, f"user_interactions-{month}.jsonl.gz")
+            with gzip.open(path, "at", encoding="utf-8") as archive:
+                archive.write("\n".join(lines) + "\n")
+
+    async def run_once(self) -> int:
+        """Procesa todos los lotes pendientes, con una pausa entre lotes para no acaparar la escritura"""
+        cutoff = self.cutoff()
+        total = 0
+        while True:
+            async with async_session_maker() as session:
+                moved = await self.roll_up_batch(session, cutoff)
+            total += moved
+            if moved < self.batch_size:
+                break
+            await asyncio.sleep(self.batch_pause)
+        if total:
+            logger.info(f"Rollup de interacciones: {total} filas anteriores a {cutoff.date()} movidas")
+        return total
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def _run(self):
+        while True:
+            try:
+                await self.run_once()
+            except Exception as e:
+                logger.error(f"Error en el rollup de interacciones: {e}")
+            await asyncio.sleep(self.interval)
+
+async def interaction_counts(
+    session: AsyncSession,
+    since: date,
+    group_by: str = "category",
+    limit: int = 20
+) -> List[Dict[str, Any]]:
+    """
+    Interacciones desde `since` agrupadas por producto, categoría o tipo. Los días ya
+    retirados se leen de los rollups y el resto de las filas crudas; una fila está en un
+    lado o en el otro, nunca en ambos. Ambas lecturas van en una sola consulta para que
+    un lote confirmado en el medio no se cuente dos veces ni se pierda.
+    """
+    if group_by not in GROUP_COLUMNS:
+        raise ValueError(f"group_by debe ser uno de {', '.join(GROUP_COLUMNS)}")
+
+    rollup_key = getattr(InteractionDailyRollup, group_by)
+    rollups = (
+        select(rollup_key.label("key"), func.sum(InteractionDailyRollup.count).label("count"))
+        .where(InteractionDailyRollup.day >= since)
+        .group_by(rollup_key)
+    )
+
+    if group_by == "product_id":
+        raw_key = func.coalesce(UserInteraction.product_id, 0)
+    elif group_by == "category":
+        raw_key = func.lower(func.coalesce(Product.category, UserInteraction.category_viewed, literal("")))
+    else:
+        raw_key = func.coalesce(UserInteraction.interaction_type, literal(""))
+    raw = (
+        select(raw_key.label("key"), func.count().label("count"))
+        .select_from(UserInteraction)
+        .outerjoin(Product, Product.id == UserInteraction.product_id)
+        .where(UserInteraction.timestamp >= datetime.combine(since, datetime.min.time()))
+        .group_by(raw_key)
+    )
+    combined = union_all(rollups, raw).subquery()
+    result = await session.execute(
+        select(combined.c.key, func.sum(combined.c.count)).group_by(combined.c.key)
+    )
+
+    totals: Dict[Any, int] = {key: count for key, count in result}
+    ranked = sorted(totals.items(), key=lambda item: (-item[1], str(item[0])))[:limit]
+    return [{group_by: key, "count": count} for key, count in ranked]
+
+interaction_retention = InteractionRetention(
+    retention_days=settings.interaction_retention_days,
+    batch_size=settings.interaction_rollup_batch_size,
+    batch_pause=settings.interaction_rollup_batch_pause,
+    interval=settings.interaction_rollup_interval,
+    archive_dir=settings.interaction_archive_dir
+)
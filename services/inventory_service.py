@@ -1,6 +1,8 @@
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import select, func
 from models.product import Product, ProductCategory, ProductCreate
+from services.event_bus import event_bus, TOPIC_INVENTORY
+from services.search_analytics import publish_search
 from typing import List, Optional, Dict
 import json
 
@@ -95,7 +97,8 @@ class InventoryService:
             "low_stock_products": low_stock_products
         }
     
-    async def search_products(self, query: str) -> List[Product]:
+    async def search_products(self, query: str, source: Optional[str] = None) -> List[Product]:
+        """Busca por nombre, marca, modelo o descripción; con `source` la búsqueda se cuenta en la analítica"""
         search_term = f"%{query}%"
         result = await self.session.execute(
             select(Product).where(
@@ -106,23 +109,49 @@ class InventoryService:
                 Product.is_active == True
             )
         )
-        return result.scalars().all()
+        products = result.scalars().all()
+        if source:
+            await publish_search(query, bool(products), source)
+        return products
     
     async def create_product(self, product_data: ProductCreate) -> Product:
         product = Product(**product_data.dict())
         self.session.add(product)
         await self.session.commit()
         await self.session.refresh(product)
+        await event_bus.publish(TOPIC_INVENTORY, "product_created", {
+            **self._product_event_data(product),
+            "description": product.description,
+            "specifications": product.specifications
+        })
         return product
     
     async def update_stock(self, product_id: int, new_stock: int) -> Optional[Product]:
         product = await self.get_product_by_id(product_id)
         if product:
+            previous_stock = product.stock
             product.stock = new_stock
             await self.session.commit()
             await self.session.refresh(product)
+            await event_bus.publish(TOPIC_INVENTORY, "stock_changed", {
+                **self._product_event_data(product),
+                "previous_stock": previous_stock
+            })
         return product
     
+    @staticmethod
+    def _product_event_data(product: Product) -> Dict:
+        return {
+            "id": product.id,
+            "name": product.name,
+            "brand": product.brand,
+            "model": product.model,
+            "category": product.category.value,
+            "price": product.price,
+            "stock": product.stock,
+            "is_active": product.is_active
+        }
+    
     async def init_synthetic_data(self):
         existing = await self.session.execute(select(func.count(Product.id)))
         count = existing.scalar()
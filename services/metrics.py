@@ -0,0 +1,153 @@
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+from bisect import bisect_left
+from contextlib import contextmanager
+import time
+
+# Métricas en memoria del proceso con exportación en formato de texto de Prometheus.
+# Con varios workers cada proceso expone las suyas (Prometheus agrega por instancia).
+
+LabelValues = Tuple[str, ...]
+
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+def _format_labels(names: Tuple[str, ...], values: LabelValues, extra: str = "") -> str:
+    pairs = [f'{name}="{value}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+class Counter:
+    def __init__(self, name: str, description: str, labels: Iterable[str] = ()):
+        self.name = name
+        self.description = description
+        self.label_names = tuple(labels)
+        self._values: Dict[LabelValues, float] = {}
+
+    def inc(self, *labels: str, amount: float = 1):
+        self._values[labels] = self._values.get(labels, 0) + amount
+
+    def value(self, *labels: str) -> float:
+        return self._values.get(labels, 0)
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.description}", f"# TYPE {self.name} counter"]
+        for labels, value in self._values.items():
+            lines.append(f"{self.name}{_format_labels(self.label_names, labels)} {_format_value(value)}")
+        return lines
+
+class Gauge:
+    """Gauge cuyo valor se obtiene al exportar, a partir de una función"""
+
+    def __init__(self, name: str, description: str, collect: Callable[[], Dict[LabelValues, float]], labels: Iterable[str] = ()):
+        self.name = name
+        self.description = description
+        self.label_names = tuple(labels)
+        self._collect = collect
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.description}", f"# TYPE {self.name} gauge"]
+        for labels, value in self._collect().items():
+            lines.append(f"{self.name}{_format_labels(self.label_names, labels)} {_format_value(value)}")
+        return lines
+
+class Histogram:
+    def __init__(self, name: str, description: str, labels: Iterable[str] = (), buckets: Tuple[float, ...] = DEFAULT_BUCKETS):
+        self.name = name
+        self.description = description
+        self.label_names = tuple(labels)
+        self.buckets = tuple(sorted(buckets))
+        # Por combinación de labels: [conteos por bucket (sin acumular)..., +Inf], suma
+        self._series: Dict[LabelValues, Tuple[List[int], List[float]]] = {}
+
+    def observe(self, value: float, *labels: str):
+        series = self._series.get(labels)
+        if series is None:
+            series = self._series[labels] = ([0] * (len(self.buckets) + 1), [0.0])
+        counts, total = series
+        counts[bisect_left(self.buckets, value)] += 1
+        total[0] += value
+
+    @contextmanager
+    def time(self, *labels: str):
+        """Mide la duración del bloque (sirve también alrededor de `await`)"""
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - started, *labels)
+
+    def count(self, *labels: str) -> int:
+        series = self._series.get(labels)
+        return sum(series[0]) if series else 0
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.description}", f"# TYPE {self.name} histogram"]
+        for labels, (counts, total) in self._series.items():
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += count
+                le = _format_labels(self.label_names, labels, f'le="{_format_value(bound)}"')
+                lines.append(f"{self.name}_bucket{le} {cumulative}")
+            label_text = _format_labels(self.label_names, labels)
+            lines.append(f"{self.name}_sum{label_text} {total[0]!r}")
+            lines.append(f"{self.name}_count{label_text} {cumulative}")
+        return lines
+
+class MetricsRegistry:
+    def __init__(self):
+        self._metrics: Dict[str, object] = {}
+
+    def _register(self, metric):
+        existing = self._metrics.get(metric.name)
+        if existing is not None:
+            return existing
+        self._metrics[metric.name] = metric
+        return metric
+
+    def counter(self, name: str, description: str, labels: Iterable[str] = ()) -> Counter:
+        return self._register(Counter(name, description, labels))
+
+    def histogram(self, name: str, description: str, labels: Iterable[str] = (), buckets: Optional[Tuple[float, ...]] = None) -> Histogram:
+        return self._register(Histogram(name, description, labels, buckets or DEFAULT_BUCKETS))
+
+    def gauge(self, name: str, description: str, collect: Callable[[], Dict[LabelValues, float]], labels: Iterable[str] = ()) -> Gauge:
+        return self._register(Gauge(name, description, collect, labels))
+
+    def render(self) -> str:
+        lines: List[str] = []
+        for metric in self._metrics.values():
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+registry = MetricsRegistry()
+
+# Latencia por etapa del pipeline de chat
+chat_stage_seconds = registry.histogram(
+    "chat_stage_seconds",
+    "Duración de cada etapa del procesamiento de un mensaje de chat",
+    labels=("stage",)
+)
+
+def stage_timer(stage: str):
+    """Contexto de bajo costo para medir una etapa: `with stage_timer("llm_generate"): ...`"""
+    return chat_stage_seconds.time(stage)
+
+# Peticiones HTTP por router
+http_requests_total = registry.counter(
+    "http_requests_total", "Peticiones HTTP atendidas", labels=("router", "method", "status")
+)
+http_errors_total = registry.counter(
+    "http_errors_total", "Peticiones HTTP que terminaron en error 5xx o excepción", labels=("router",)
+)
+http_request_seconds = registry.histogram(
+    "http_request_seconds", "Duración de las peticiones HTTP", labels=("router",)
+)
+
+# Mensajes del WebSocket
+ws_messages_total = registry.counter("ws_messages_total", "Mensajes de chat recibidos por WebSocket")
+ws_errors_total = registry.counter("ws_errors_total", "Mensajes de WebSocket que terminaron en error")
@@ -0,0 +1,79 @@
+from typing import List, Optional, Any
+from langchain_core.messages import AIMessage, BaseMessage
+from langchain_core.language_models import BaseChatModel
+from langchain_core.outputs import ChatResult, ChatGeneration
+
+class MockChatModel(BaseChatModel):
+    """Modelo de chat simulado para desarrollo sin necesidad de API key"""
+    
+    @property
+    def _llm_type(self) -> str:
+        return "mock"
+    
+    def _generate(
+        self,
+        messages: List[BaseMessage],
+        stop: Optional[List[str]] = None,
+        **kwargs: Any,
+    ) -> ChatResult:
+        last_message = messages[-1].content if messages else ""
+        response = self._generate_mock_response(last_message)
+        message = AIMessage(content=response)
+        generation = ChatGeneration(message=message)
+        return ChatResult(generations=[generation])
+    
+    async def _agenerate(
+        self,
+        messages: List[BaseMessage],
+        stop: Optional[List[str]] = None,
+        **kwargs: Any,
+    ) -> ChatResult:
+        return self._generate(messages, stop, **kwargs)
+    
+    def _generate_mock_response(self, user_input: str) -> str:
+        user_input_lower = user_input.lower()
+        
+        if "hola" in user_input_lower or "buenos" in user_input_lower:
+            return "¡Hola! Bienvenido a Makers Tech. Soy tu asistente virtual y estoy aquí para ayudarte con información sobre nuestros productos. ¿En qué puedo ayudarte hoy?"
+        
+        elif "computadora" in user_input_lower or "computador" in user_input_lower or "desktop" in user_input_lower:
+            return """¡Claro! Te muestro las computadoras que tenemos disponibles:
+
+Tenemos la **Dell OptiPlex 3000**, una excelente computadora de escritorio compacta y potente para oficina.
+**Precio**: $799.99 - **Stock**: 2 unidades
+
+También está disponible el **iMac 24 M3** de Apple, un all-in-one con pantalla Retina 4.5K.
+**Precio**: $1599.99 - **Stock**: 3 unidades
+
+Y el **HP Elite Tower 800 G9**, una workstation empresarial de alto rendimiento.
+**Precio**: $1099.99 - **Stock**: 4 unidades
+
+¿Te gustaría conocer más detalles sobre alguna de estas opciones?"""
+        
+        elif "laptop" in user_input_lower or "portátil" in user_input_lower:
+            return """Por supuesto! Estas son nuestras laptops disponibles:
+
+La **HP Pavilion 15** con procesador AMD Ryzen 5, ideal para trabajo y entretenimiento.
+**Precio**: $899.99 - **Stock**: 5 unidades
+
+También tenemos el **Lenovo ThinkPad X1 Carbon**, ultrabook empresarial premium.
+**Precio**: $1799.99 - **Stock**: 4 unidades
+
+¿Necesitas algo específico como gaming, trabajo profesional o uso general?"""
+        
+        elif "teléfono" in user_input_lower or "celular" in user_input_lower or "smartphone" in user_input_lower:
+            return """¡Excelente! Te muestro nuestros smartphones disponibles:
+
+El **iPhone 14 Pro** de Apple con Dynamic Island y cámara de 48MP.
+**Precio**: $1299.99 - **Stock**: 7 unidades
+
+El **Samsung Galaxy S23 Ultra** con S Pen integrado y cámara de 200MP.
+**Precio**: $1199.99 - **Stock**: 5 unidades
+
+También tenemos opciones más accesibles como el **Xiaomi Redmi Note 12 Pro**.
+**Precio**: $299.99 - **Stock**: 20 unidades
+
+¿Qué características son más importantes para ti?"""
+        
+        else:
+            return "Puedo ayudarte a encontrar laptops, computadoras, tablets, smartphones, monitores y accesorios. ¿Qué tipo de producto te interesa?"
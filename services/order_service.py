@@ -0,0 +1,125 @@
+from typing import NamedTuple, Optional
+from datetime import datetime
+import logging
+from sqlalchemy import select, update, delete
+from sqlalchemy.ext.asyncio import AsyncSession
+from models.product import Product, Sale, StockReservation
+from services.event_bus import event_bus, TOPIC_INVENTORY, TOPIC_SALES
+from services.inventory_service import InventoryService
+from services.reservations import stock_reservations, active_holds
+
+logger = logging.getLogger(__name__)
+
+# Pedidos sin sobreventa: el stock se descuenta con un UPDATE condicional (stock - unidades
+# apartadas por reservas vigentes >= cantidad) en la misma transacción que inserta la venta.
+# Si dos clientes confirman la última unidad, la base serializa ambos UPDATE y solo uno
+# encuentra stock suficiente.
+
+ORDER_PLACED = "placed"
+ORDER_OUT_OF_STOCK = "out_of_stock"
+ORDER_NOT_FOUND = "not_found"
+
+class OrderResult(NamedTuple):
+    status: str
+    sale: Optional[Sale] = None
+    remaining_stock: Optional[int] = None
+
+    @property
+    def placed(self) -> bool:
+        return self.status == ORDER_PLACED
+
+class OrderService:
+    def __init__(self, session: AsyncSession):
+        self.session = session
+
+    async def place_order(
+        self,
+        product_id: int,
+        quantity: int = 1,
+        customer_info: str = "Pendiente",
+        status: str = "pending",
+        reservation_id: Optional[int] = None
+    ) -> OrderResult:
+        """
+        Descuenta el stock y registra la venta en una sola transacción; el resultado es
+        definitivo. Con `reservation_id` el pedido consume esa reserva (si sigue vigente).
+        """
+        if quantity <= 0:
+            raise ValueError("La cantidad debe ser mayor que cero")
+
+        now = datetime.now()
+        consumed = []
+        if reservation_id is not None:
+            # Borrar la reserva propia en la misma transacción: sus unidades vuelven al disponible
+            # solo para este pedido (si el UPDATE falla, el rollback la restaura)
+            result = await self.session.execute(
+                delete(StockReservation)
+                .where(
+                    StockReservation.id == reservation_id,
+                    StockReservation.product_id == product_id,
+                    StockReservation.expires_at > now
+                )
+                .returning(StockReservation.id)
+            )
+            consumed = list(result.scalars())
+
+        result = await self.session.execute(
+            update(Product)
+            .where(
+                Product.id == product_id,
+                Product.is_active == True,
+                Product.stock - active_holds(product_id, now) >= quantity
+            )
+            .values(stock=Product.stock - quantity)
+            .returning(Product)
+        )
+        product = result.scalar_one_or_none()
+        if product is None:
+            await self.session.rollback()
+            exists = await self.session.execute(
+                select(Product.stock).where(Product.id == product_id, Product.is_active == True)
+            )
+            stock = exists.scalar_one_or_none()
+            await self.session.rollback()
+            if stock is None:
+                return OrderResult(ORDER_NOT_FOUND)
+            return OrderResult(ORDER_OUT_OF_STOCK, remaining_stock=stock_reservations.available(product_id, stock))
+
+        sale = Sale(
+            product_id=product.id,
+            product_name=product.name,
+            product_brand=product.brand,
+            price=product.price,
+            quantity=quantity,
+            customer_info=customer_info,
+            timestamp=datetime.now(),
+            status=status
+        )
+        self.session.add(sale)
+        await self.session.commit()
+        if consumed:
+            await stock_reservations.released(consumed)
+
+        await event_bus.publish(TOPIC_SALES, "sale_created", {
+            "id": sale.id,
+            "product_id": sale.product_id,
+            "product_name": sale.product_name,
+            "product_brand": sale.product_brand,
+            "price": sale.price,
+            "quantity": sale.quantity,
+            "customer_info": sale.customer_info,
+            "timestamp": sale.timestamp.isoformat(),
+            "status": sale.status
+        })
+        await event_bus.publish(TOPIC_INVENTORY, "stock_changed", {
+            **InventoryService._product_event_data(product),
+            "previous_stock": product.stock + quantity
+        })
+        return OrderResult(ORDER_PLACED, sale=sale, remaining_stock=product.stock)
+
+    async def product_id_by_name(self, product_name: str) -> Optional[int]:
+        """Id del producto activo con ese nombre (las confirmaciones del chat lo identifican así)"""
+        result = await self.session.execute(
+            select(Product.id).where(Product.name == product_name, Product.is_active == True).limit(1)
+        )
+        return result.scalar_one_or_none()
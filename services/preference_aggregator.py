@@ -0,0 +1,103 @@
+from typing import Any, Dict, List, Optional, Tuple
+from datetime import datetime
+import json
+import math
+
+# Contadores de preferencias con decaimiento exponencial. Cada interacción suma a su categoría,
+# marca y banda de precio en O(1); las preferencias se derivan de los contadores sin volver a
+# leer interacciones. Se guardan como JSON compacto en `GlobalUserPreference.preference_counters`.
+
+# Entradas máximas por contador: al superarlas se descartan las de menor peso
+MAX_ENTRIES = 32
+# Exponente máximo del factor de decaimiento antes de reescalar los contadores
+MAX_DECAY_EXPONENT = 30.0
+# Bandas de precio de media octava: la banda b cubre [2^(b/2), 2^((b+1)/2))
+BANDS_PER_OCTAVE = 2
+
+def price_band(price: float) -> int:
+    return math.floor(math.log2(max(price, 1.0)) * BANDS_PER_OCTAVE)
+
+def _band_center(band: int) -> float:
+    return 2 ** ((band + 0.5) / BANDS_PER_OCTAVE)
+
+class PreferenceCounters:
+    def __init__(self, half_life_days: float = 7.0):
+        # Decaimiento hacia adelante: un evento en t suma exp((t - referencia) / tau), así
+        # los contadores no se recorren al agregar eventos y su orden relativo se conserva
+        self._tau = half_life_days * 86400 / math.log(2)
+        self.reference: Optional[float] = None
+        self.count = 0
+        self.categories: Dict[str, float] = {}
+        self.brands: Dict[str, float] = {}
+        self.price_bands: Dict[int, float] = {}
+
+    @classmethod
+    def from_json(cls, text: Optional[str], half_life_days: float = 7.0) -> "PreferenceCounters":
+        counters = cls(half_life_days)
+        if text:
+            data = json.loads(text)
+            counters.reference = data.get("ref")
+            counters.count = data.get("n", 0)
+            counters.categories = data.get("c", {})
+            counters.brands = data.get("b", {})
+            counters.price_bands = {int(band): weight for band, weight in data.get("p", {}).items()}
+        return counters
+
+    def to_json(self) -> str:
+        def compact(counter: Dict[Any, float]) -> Dict[str, float]:
+            return {str(key): float(f"{weight:.6g}") for key, weight in counter.items()}
+        return json.dumps({
+            "ref": self.reference,
+            "n": self.count,
+            "c": compact(self.categories),
+            "b": compact(self.brands),
+            "p": compact(self.price_bands)
+        }, separators=(",", ":"), ensure_ascii=False)
+
+    def _increment(self, timestamp: float) -> float:
+        if self.reference is None:
+            self.reference = timestamp
+        exponent = (timestamp - self.reference) / self._tau
+        if exponent > MAX_DECAY_EXPONENT:
+            factor = math.exp(-exponent)
+            for counter in (self.categories, self.brands, self.price_bands):
+                for key in counter:
+                    counter[key] *= factor
+            self.reference = timestamp
+            exponent = 0.0
+        return math.exp(exponent)
+
+    @staticmethod
+    def _add(counter: Dict[Any, float], key: Any, amount: float):
+        counter[key] = counter.get(key, 0.0) + amount
+        if len(counter) > MAX_ENTRIES:
+            del counter[min(counter, key=counter.get)]
+
+    def fold(
+        self,
+        timestamp: datetime,
+        category: Optional[str] = None,
+        brand: Optional[str] = None,
+        price: Optional[float] = None
+    ):
+        """Suma una interacción a los contadores"""
+        amount = self._increment(timestamp.timestamp())
+        self.count += 1
+        if category:
+            self._add(self.categories, category.lower(), amount)
+        if brand:
+            self._add(self.brands, brand, amount)
+        if price:
+            self._add(self.price_bands, price_band(price), amount)
+
+    def preferences(self, limit: int = 5) -> Tuple[List[str], List[str], float, float]:
+        """Categorías y marcas más pesadas y rango de precio alrededor de la media geométrica"""
+        categories = sorted(self.categories, key=self.categories.get, reverse=True)[:limit]
+        brands = sorted(self.brands, key=self.brands.get, reverse=True)[:limit]
+        total = sum(self.price_bands.values())
+        if total > 0:
+            log_mean = sum(math.log(_band_center(band)) * weight for band, weight in self.price_bands.items()) / total
+            avg_price = math.exp(log_mean)
+        else:
+            avg_price = 1000
+        return categories, brands, max(0, avg_price * 0.5), avg_price * 2.0
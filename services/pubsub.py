@@ -0,0 +1,211 @@
+from typing import Any, Awaitable, Callable, Dict, Optional, Set
+import asyncio
+import json
+import logging
+import os
+
+try:
+    import fcntl
+except ImportError:  # Windows: solo está disponible el backend en memoria
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+DeliverCallback = Callable[[str, Dict[str, Any]], Awaitable[None]]
+
+class PubSubBackend:
+    """Transporte de eventos entre publicadores y suscriptores"""
+
+    def __init__(self):
+        self._deliver: Optional[DeliverCallback] = None
+
+    def bind(self, deliver: DeliverCallback):
+        """Registra la función que entrega los eventos recibidos a los suscriptores locales"""
+        self._deliver = deliver
+
+    async def start(self):
+        pass
+
+    async def stop(self):
+        pass
+
+    async def publish(self, topic: str, payload: Dict[str, Any]):
+        raise NotImplementedError
+
+    async def _deliver_local(self, topic: str, payload: Dict[str, Any]):
+        if self._deliver:
+            await self._deliver(topic, payload)
+
+class InMemoryBackend(PubSubBackend):
+    """Entrega los eventos solo dentro del proceso actual"""
+
+    async def publish(self, topic: str, payload: Dict[str, Any]):
+        await self._deliver_local(topic, payload)
+
+class UnixSocketBackend(PubSubBackend):
+    """
+    Reparte eventos entre varios procesos (workers de uvicorn) a través de un broker
+    local en un socket Unix. El primer proceso que obtiene el lock del archivo
+    `<socket>.lock` levanta el broker; el resto se conecta como cliente. Si el proceso
+    del broker muere, los demás se reconectan y uno de ellos toma su lugar.
+    """
+
+    # Buffer de escritura máximo por cliente antes de desconectarlo del broker
+    MAX_CLIENT_BUFFER = 4 * 1024 * 1024
+    RECONNECT_DELAY = 0.2
+
+    def __init__(self, socket_path: str):
+        super().__init__()
+        self.socket_path = socket_path
+        self._lock_file = None
+        self._server: Optional[asyncio.AbstractServer] = None
+        self._broker_clients: Set[asyncio.StreamWriter] = set()
+        self._broker_tasks: Set[asyncio.Task] = set()
+        self._writer: Optional[asyncio.StreamWriter] = None
+        self._run_task: Optional[asyncio.Task] = None
+        self._connected = asyncio.Event()
+        self._stopping = False
+
+    @property
+    def is_broker(self) -> bool:
+        return self._server is not None
+
+    async def start(self):
+        self._stopping = False
+        self._run_task = asyncio.create_task(self._run())
+        try:
+            await self.wait_connected()
+        except asyncio.TimeoutError:
+            logger.warning(f"No se pudo conectar al broker de eventos en {self.socket_path}, reintentando")
+
+    async def stop(self):
+        self._stopping = True
+        if self._run_task:
+            self._run_task.cancel()
+            try:
+                await self._run_task
+            except asyncio.CancelledError:
+                pass
+            self._run_task = None
+        self._disconnect()
+        await self._stop_broker()
+
+    async def wait_connected(self, timeout: float = 5.0):
+        await asyncio.wait_for(self._connected.wait(), timeout)
+
+    async def publish(self, topic: str, payload: Dict[str, Any]):
+        if not self._connected.is_set():
+            # Sin broker disponible: al menos entregar a los clientes de este proceso
+            logger.warning(f"Broker de eventos no disponible, entrega local de {topic}")
+            await self._deliver_local(topic, payload)
+            return
+
+        # El broker reenvía el evento a todos los procesos, incluido este
+        self._writer.write((json.dumps({"topic": topic, "payload": payload}) + "\n").encode())
+        await self._writer.drain()
+
+    async def _run(self):
+        """Mantiene la conexión con el broker y entrega los eventos recibidos"""
+        while not self._stopping:
+            try:
+                reader = await self._connect()
+            except OSError:
+                await asyncio.sleep(self.RECONNECT_DELAY)
+                continue
+
+            while True:
+                try:
+                    frame = await reader.readline()
+                except (ConnectionError, asyncio.IncompleteReadError):
+                    break
+                if not frame:
+                    break
+                try:
+                    message = json.loads(frame)
+                    await self._deliver_local(message["topic"], message["payload"])
+                except Exception as e:
+                    logger.error(f"Error entregando evento del broker: {e}")
+
+            self._disconnect()
+            logger.warning("Conexión con el broker de eventos perdida, reconectando")
+            await asyncio.sleep(self.RECONNECT_DELAY)
+
+    async def _connect(self) -> asyncio.StreamReader:
+        """Se conecta al broker, levantándolo primero si ningún proceso lo tiene"""
+        self._try_become_broker()
+        if self._lock_file is not None and self._server is None:
+            self._server = await asyncio.start_unix_server(self._handle_broker_client, path=self.socket_path)
+            logger.info(f"Broker de eventos escuchando en {self.socket_path} (pid {os.getpid()})")
+
+        reader, self._writer = await asyncio.open_unix_connection(self.socket_path)
+        self._connected.set()
+        return reader
+
+    def _disconnect(self):
+        self._connected.clear()
+        if self._writer:
+            self._writer.close()
+            self._writer = None
+
+    def _try_become_broker(self):
+        if self._lock_file is not None or fcntl is None:
+            return
+        lock_file = open(f"{self.socket_path}.lock", "a+")
+        try:
+            fcntl.flock(lock_file.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            lock_file.close()
+            return
+        # Tenemos el lock: cualquier socket existente es de un broker muerto
+        self._lock_file = lock_file
+        if os.path.exists(self.socket_path):
+            os.unlink(self.socket_path)
+
+    async def _stop_broker(self):
+        if self._server:
+            self._server.close()
+            for writer in list(self._broker_clients):
+                writer.close()
+            self._broker_clients.clear()
+            # Esperar a que los handlers vean el cierre antes de que se cancele el loop
+            await asyncio.gather(*self._broker_tasks, return_exceptions=True)
+            await self._server.wait_closed()
+            self._server = None
+            if os.path.exists(self.socket_path):
+                os.unlink(self.socket_path)
+        if self._lock_file:
+            fcntl.flock(self._lock_file.fileno(), fcntl.LOCK_UN)
+            self._lock_file.close()
+            self._lock_file = None
+
+    async def _handle_broker_client(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        task = asyncio.current_task()
+        self._broker_tasks.add(task)
+        self._broker_clients.add(writer)
+        try:
+            while True:
+                frame = await reader.readline()
+                if not frame:
+                    break
+                for client in list(self._broker_clients):
+                    if client.transport.get_write_buffer_size() > self.MAX_CLIENT_BUFFER:
+                        logger.warning("Cliente del broker saturado, desconectando")
+                        self._broker_clients.discard(client)
+                        client.close()
+                        continue
+                    client.write(frame)
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            self._broker_clients.discard(writer)
+            self._broker_tasks.discard(task)
+            writer.close()
+
+def create_backend(name: str, socket_path: str) -> PubSubBackend:
+    """Crea el backend configurado; si no está soportado en la plataforma usa memoria"""
+    if name == "unix":
+        if fcntl is None or not hasattr(asyncio, "start_unix_server"):
+            logger.warning("Backend 'unix' no soportado en esta plataforma, usando memoria")
+            return InMemoryBackend()
+        return UnixSocketBackend(socket_path)
+    return InMemoryBackend()
@@ -0,0 +1,115 @@
+from typing import Dict, Optional
+from contextlib import contextmanager
+from contextvars import ContextVar
+import logging
+import random
+import time
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from services.metrics import registry
+from config import settings
+
+# Perfilado de SQL por petición: número de sentencias, tiempo en base de datos,
+# sentencias repetidas (patrones N+1) y log muestreado de consultas lentas.
+# Si SQL_PROFILING está desactivado los listeners no se registran y no cuesta nada.
+
+logger = logging.getLogger(__name__)
+slow_query_logger = logging.getLogger("sql.slow")
+
+db_queries_per_request = registry.histogram(
+    "db_queries_per_request",
+    "Sentencias SQL ejecutadas por petición o mensaje de WebSocket",
+    labels=("scope",),
+    buckets=(1, 2, 5, 10, 20, 50, 100, 250)
+)
+db_seconds_per_request = registry.histogram(
+    "db_seconds_per_request",
+    "Tiempo total en base de datos por petición o mensaje de WebSocket",
+    labels=("scope",)
+)
+db_repeated_statements_total = registry.counter(
+    "db_repeated_statements_total",
+    "Peticiones con una misma sentencia repetida por encima del umbral (posible N+1)",
+    labels=("scope",)
+)
+
+class QueryStats:
+    __slots__ = ("count", "seconds", "statements")
+
+    def __init__(self):
+        self.count = 0
+        self.seconds = 0.0
+        self.statements: Dict[str, int] = {}
+
+    def repeated(self, threshold: int) -> Dict[str, int]:
+        return {statement: count for statement, count in self.statements.items() if count >= threshold}
+
+_current_stats: ContextVar[Optional[QueryStats]] = ContextVar("query_stats", default=None)
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault("query_start", []).append(time.perf_counter())
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    elapsed = time.perf_counter() - conn.info["query_start"].pop()
+
+    stats = _current_stats.get()
+    if stats is not None:
+        stats.count += 1
+        stats.seconds += elapsed
+        stats.statements[statement] = stats.statements.get(statement, 0) + 1
+
+    if elapsed * 1000 >= settings.sql_slow_query_ms and random.random() < settings.sql_slow_query_sample_rate:
+        slow_query_logger.warning(
+            f"Consulta lenta ({elapsed * 1000:.1f}ms): {' '.join(statement.split())} | parámetros: {repr(parameters)[:500]}"
+        )
+
+def install_query_profiler(engine: Engine):
+    """Registra los listeners de SQLAlchemy en el engine (síncrono) indicado"""
+    event.listen(engine, "before_cursor_execute", _before_cursor_execute)
+    event.listen(engine, "after_cursor_execute", _after_cursor_execute)
+    logger.info("Perfilado de SQL activado")
+
+@contextmanager
+def profile_queries(scope: str, label: str = ""):
+    """Acumula las sentencias SQL ejecutadas dentro del bloque y registra el resumen"""
+    if not settings.sql_profiling:
+        yield None
+        return
+
+    stats = QueryStats()
+    token = _current_stats.set(stats)
+    try:
+        yield stats
+    finally:
+        _current_stats.reset(token)
+        db_queries_per_request.observe(stats.count, scope)
+        db_seconds_per_request.observe(stats.seconds, scope)
+
+        repeated = stats.repeated(settings.sql_n_plus_one_threshold)
+        if repeated:
+            db_repeated_statements_total.inc(scope)
+            for statement, count in repeated.items():
+                logger.warning(
+                    f"Posible N+1 en {label or scope}: sentencia repetida {count} veces: {' '.join(statement.split())[:200]}"
+                )
+
+class QueryProfilerMiddleware:
+    """Middleware ASGI que perfila el SQL de cada petición y opcionalmente añade Server-Timing"""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        with profile_queries("http", f"{scope['method']} {scope['path']}") as stats:
+            async def send_wrapper(message):
+                if message["type"] == "http.response.start" and settings.sql_server_timing:
+                    # Las consultas ejecutadas después de enviar los headers no se incluyen
+                    header = f'db;dur={stats.seconds * 1000:.2f};desc="{stats.count} queries"'
+                    message["headers"] = list(message.get("headers", [])) + [(b"server-timing", header.encode())]
+                await send(message)
+
+            await self.app(scope, receive, send_wrapper)
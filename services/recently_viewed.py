@@ -0,0 +1,95 @@
+from typing import Any, Dict, List, Optional, Tuple
+from datetime import datetime, timedelta
+import asyncio
+import logging
+import numpy as np
+from sqlalchemy import select, func
+from sqlalchemy.ext.asyncio import AsyncSession
+from models.user_interaction import UserInteraction
+from services.event_bus import event_bus, TOPIC_INTERACTIONS
+
+logger = logging.getLogger(__name__)
+
+# Mapa de recencia: última interacción con cada producto (segundos epoch en un uint32 por id).
+# Responde "¿se vio en los últimos N días?" en O(1) con 4 bytes por id de producto y se
+# reconstruye al iniciar desde las interacciones de la ventana máxima.
+
+# Ventana que se carga al iniciar; consultas con más días solo ven lo que llegó después
+MAX_DAYS = 30
+
+class RecencyMap:
+    def __init__(self, capacity: int = 1024):
+        self.last_seen = np.zeros(capacity, dtype=np.uint32)
+        self.loaded = False
+        self._load_lock = asyncio.Lock()
+        self._loading = False
+        self._pending_events: List[Tuple[int, datetime]] = []
+
+    def _grow(self, product_id: int):
+        capacity = len(self.last_seen)
+        if product_id >= capacity:
+            grown = np.zeros(max(product_id + 1, capacity * 2), dtype=np.uint32)
+            grown[:capacity] = self.last_seen
+            self.last_seen = grown
+
+    def record(self, product_id: int, timestamp: Optional[datetime] = None):
+        if product_id is None or product_id < 0:
+            return
+        seconds = int((timestamp or datetime.now()).timestamp())
+        self._grow(product_id)
+        if seconds > self.last_seen[product_id]:
+            self.last_seen[product_id] = seconds
+
+    @staticmethod
+    def _cutoff(days: float) -> int:
+        return int((datetime.now() - timedelta(days=days)).timestamp())
+
+    def viewed_within(self, product_id: int, days: float = MAX_DAYS) -> bool:
+        return 0 <= product_id < len(self.last_seen) and self.last_seen[product_id] > self._cutoff(days)
+
+    def viewed_ids(self, days: float = MAX_DAYS) -> np.ndarray:
+        """Ids con alguna interacción en los últimos `days` días"""
+        return np.flatnonzero(self.last_seen > self._cutoff(days))
+
+    async def load(self, session: AsyncSession):
+        """Última interacción por producto dentro de la ventana (rango por índice de timestamp)"""
+        self._loading = True
+        try:
+            since = datetime.now() - timedelta(days=MAX_DAYS)
+            result = await session.execute(
+                select(UserInteraction.product_id, func.max(UserInteraction.timestamp))
+                .where(UserInteraction.timestamp >= since, UserInteraction.product_id.isnot(None))
+                .group_by(UserInteraction.product_id)
+            )
+            self.last_seen = np.zeros(len(self.last_seen), dtype=np.uint32)
+            for product_id, timestamp in result:
+                self.record(product_id, timestamp)
+
+            # record se queda con el más reciente: reaplicar los pendientes no duplica nada
+            pending, self._pending_events = self._pending_events, []
+            for product_id, timestamp in pending:
+                self.record(product_id, timestamp)
+            self.loaded = True
+        finally:
+            self._loading = False
+        logger.info(f"Mapa de recencia cargado con {len(self.viewed_ids())} productos vistos en {MAX_DAYS} días")
+
+    async def ensure_loaded(self, session: AsyncSession):
+        if self.loaded:
+            return
+        async with self._load_lock:
+            if not self.loaded:
+                await self.load(session)
+
+    async def on_event(self, topic: str, payload: Dict[str, Any]):
+        data = payload.get("data") or {}
+        if topic != TOPIC_INTERACTIONS or payload.get("event") != "interaction_created" or data.get("product_id") is None:
+            return
+        timestamp = datetime.fromisoformat(data.get("timestamp") or payload["timestamp"])
+        if self._loading:
+            self._pending_events.append((data["product_id"], timestamp))
+        elif self.loaded:
+            self.record(data["product_id"], timestamp)
+
+recently_viewed = RecencyMap()
+event_bus.subscribe(recently_viewed.on_event)
@@ -1,15 +1,43 @@
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select, func, desc, and_
+from sqlalchemy import select, update, func, and_, union_all
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
 from models.product import Product, ProductCategory
 from models.user_interaction import UserInteraction, GlobalUserPreference
-from typing import List, Dict, Optional
+from services.scoring_engine import scoring_engine
+from services.cooccurrence import cooccurrence_index
+from services.content_index import content_index
+from services.event_bus import event_bus, TOPIC_INTERACTIONS, TOPIC_PREFERENCES
+from services.preference_aggregator import PreferenceCounters
+from services.trending import trending_counters
+from services.recently_viewed import recently_viewed
+from config import settings
+from typing import List, Dict, NamedTuple, Optional
+import asyncio
 import json
-from datetime import datetime, timedelta
+from datetime import datetime
 from collections import defaultdict
 import logging
 
 logger = logging.getLogger(__name__)
 
+# Registro único de preferencias globales
+PREFERENCE_ID = 1
+# Interacciones que se suman a los contadores de preferencias por lote
+FOLD_BATCH_SIZE = 5000
+
+# Grupos de la respuesta, en orden, con el puntaje fijo de las recomendaciones por defecto
+TIER_SCORES = {"highly_recommended": 85, "recommended": 65, "other_suggestions": 40}
+
+class Recommendation(NamedTuple):
+    product: Product
+    score: float
+    reasons: List[str]
+
+class TrendingProduct(NamedTuple):
+    product: Product
+    trending_score: float
+    activity: Dict[str, Dict[str, int]]
+
 class RecommendationService:
     def __init__(self, session: AsyncSession):
         self.session = session
@@ -31,68 +59,105 @@ class RecommendationService:
         )
         self.session.add(interaction)
         
-        # NO actualizar preferencias aquí - se manejan en update_preferences_from_chat
-        # await self._update_global_preferences()
+        # NO actualizar preferencias aquí - se manejan en update_preferences_from_chat y
+        # los contadores se suman por lotes en refresh_preferences
         await self.session.commit()
+        await event_bus.publish(TOPIC_INTERACTIONS, "interaction_created", {
+            "id": interaction.id,
+            "product_id": interaction.product_id,
+            "category_viewed": interaction.category_viewed,
+            "interaction_type": interaction.interaction_type,
+            "timestamp": interaction.timestamp.isoformat()
+        })
     
-    async def _update_global_preferences(self):
-        """Actualiza las preferencias globales basándose en todas las interacciones"""
-        # Obtener las últimas 100 interacciones
-        recent_interactions = await self.session.execute(
-            select(UserInteraction)
-            .order_by(desc(UserInteraction.timestamp))
-            .limit(100)
+    async def _global_preference(self) -> GlobalUserPreference:
+        """Registro único de preferencias globales; se crea con un upsert sobre el id fijo, nunca duplicado"""
+        await self.session.execute(
+            sqlite_insert(GlobalUserPreference)
+            .values(id=PREFERENCE_ID)
+            .on_conflict_do_nothing(index_elements=["id"])
         )
-        interactions = recent_interactions.scalars().all()
-        
-        category_count = defaultdict(int)
-        brand_count = defaultdict(int)
-        price_sum = 0
-        price_count = 0
-        
-        for interaction in interactions:
-            if interaction.product:
-                category_count[interaction.product.category.value] += 1
-                brand_count[interaction.product.brand] += 1
-                price_sum += interaction.product.price
-                price_count += 1
-            elif interaction.category_viewed:
-                category_count[interaction.category_viewed] += 1
-        
-        # Determinar preferencias
-        preferred_categories = [cat for cat, count in sorted(
-            category_count.items(), key=lambda x: x[1], reverse=True
-        )[:5]]  # Top 5 categorías
-        preferred_brands = [brand for brand, count in sorted(
-            brand_count.items(), key=lambda x: x[1], reverse=True
-        )[:5]]  # Top 5 marcas
-        
-        # Calcular rango de precios preferido
-        avg_price = price_sum / price_count if price_count > 0 else 1000
-        price_min = max(0, avg_price * 0.5)
-        price_max = avg_price * 2.0
-        
-        # Buscar o crear preferencias globales (solo hay un registro)
-        pref_result = await self.session.execute(
-            select(GlobalUserPreference).limit(1)
+        result = await self.session.execute(
+            select(GlobalUserPreference).where(GlobalUserPreference.id == PREFERENCE_ID)
         )
-        preference = pref_result.scalar_one_or_none()
-        
-        if not preference:
-            preference = GlobalUserPreference()
-            self.session.add(preference)
+        return result.scalar_one()
+    
+    async def refresh_preferences(self, batch_size: int = FOLD_BATCH_SIZE, batch_pause: float = 0.05) -> int:
+        """
+        Suma a los contadores de preferencias las interacciones nuevas (por id, en lotes) y
+        actualiza el rango de precios y el conteo; las categorías y marcas las define el chat
+        y los contadores solo las completan si están vacías. Cada lote se guarda con un UPDATE
+        condicionado a la marca anterior: si otro worker ya lo sumó, este se descarta.
+        Escribe en la base: solo la llama la tarea en segundo plano de los snapshots, nunca
+        una petición. Devuelve cuántas interacciones sumó.
+        """
+        # El upsert toma el lock de escritura: una sola vez y confirmado antes de leer los lotes
+        await self._global_preference()
+        await self.session.commit()
         
-        preference.preferred_categories = json.dumps(preferred_categories)
-        preference.preferred_brands = json.dumps(preferred_brands)
-        preference.price_range_min = price_min
-        preference.price_range_max = price_max
-        preference.interaction_count = len(interactions)
-        preference.last_updated = datetime.now()
+        folded = 0
+        while True:
+            preference = (await self.session.execute(
+                select(GlobalUserPreference)
+                .where(GlobalUserPreference.id == PREFERENCE_ID)
+                .execution_options(populate_existing=True)
+            )).scalar_one()
+            watermark = preference.folded_interaction_id or 0
+            rows = (await self.session.execute(
+                select(
+                    UserInteraction.id, UserInteraction.timestamp, UserInteraction.category_viewed,
+                    Product.category, Product.brand, Product.price
+                )
+                .outerjoin(Product, Product.id == UserInteraction.product_id)
+                .where(UserInteraction.id > watermark)
+                .order_by(UserInteraction.id)
+                .limit(batch_size)
+            )).all()
+            if not rows:
+                await self.session.rollback()
+                return folded
+            
+            counters = PreferenceCounters.from_json(preference.preference_counters, settings.preference_half_life_days)
+            for _, timestamp, category_viewed, category, brand, price in rows:
+                counters.fold(timestamp, category.value if category else category_viewed, brand, price)
+            
+            # Top 5 categorías y marcas; rango de precios alrededor del precio típico
+            preferred_categories, preferred_brands, price_min, price_max = counters.preferences(limit=5)
+            values = {
+                "preference_counters": counters.to_json(),
+                "folded_interaction_id": rows[-1].id,
+                "price_range_min": price_min,
+                "price_range_max": price_max,
+                "interaction_count": counters.count,
+                "last_updated": datetime.now()
+            }
+            if not preference.preferred_categories or preference.preferred_categories == "[]":
+                values["preferred_categories"] = json.dumps(preferred_categories)
+            if not preference.preferred_brands or preference.preferred_brands == "[]":
+                values["preferred_brands"] = json.dumps(preferred_brands)
+            result = await self.session.execute(
+                update(GlobalUserPreference)
+                .where(
+                    GlobalUserPreference.id == PREFERENCE_ID,
+                    func.coalesce(GlobalUserPreference.folded_interaction_id, 0) == watermark
+                )
+                .values(**values)
+                .execution_options(synchronize_session=False)
+            )
+            if result.rowcount == 0:
+                await self.session.rollback()
+                return folded
+            await self.session.commit()
+            folded += len(rows)
+            if len(rows) < batch_size:
+                return folded
+            # Historial largo: pausa entre lotes para no acaparar la escritura
+            await asyncio.sleep(batch_pause)
     
     async def get_user_preferences(self) -> Optional[Dict]:
         """Obtiene las preferencias globales del usuario"""
         pref_result = await self.session.execute(
-            select(GlobalUserPreference).limit(1)
+            select(GlobalUserPreference).where(GlobalUserPreference.id == PREFERENCE_ID)
         )
         preference = pref_result.scalar_one_or_none()
         
@@ -109,134 +174,97 @@ class RecommendationService:
     
     async def get_personalized_recommendations(
         self, 
-        limit: int = 12
-    ) -> Dict[str, List[Product]]:
+        per_group: int = 6
+    ) -> Dict[str, List[Recommendation]]:
         """Obtiene recomendaciones personalizadas basadas en el comportamiento global"""
         
         # Obtener preferencias globales
         pref_result = await self.session.execute(
-            select(GlobalUserPreference).limit(1)
+            select(GlobalUserPreference).where(GlobalUserPreference.id == PREFERENCE_ID)
         )
         preferences = pref_result.scalar_one_or_none()
         
-        # Obtener todos los productos disponibles
-        all_products_result = await self.session.execute(
-            select(Product).where(Product.is_active == True, Product.stock > 0)
-        )
-        all_products = list(all_products_result.scalars().all())
-        
         # Si no hay preferencias o pocas interacciones, usar algoritmo básico
         if not preferences or preferences.interaction_count < 5:
-            return await self._get_default_recommendations(all_products)
+            default = await self._get_default_recommendations(await self._default_candidates())
+            return {
+                group: [Recommendation(product, TIER_SCORES[group], self._tier_reasons(product, group)) for product in products]
+                for group, products in default.items()
+            }
         
         # Parsear preferencias
         preferred_categories = json.loads(preferences.preferred_categories) if preferences.preferred_categories else []
         preferred_brands = json.loads(preferences.preferred_brands) if preferences.preferred_brands else []
         
-        # Obtener productos vistos recientemente (últimos 30 días)
-        recent_views_result = await self.session.execute(
-            select(UserInteraction.product_id)
-            .where(
-                UserInteraction.product_id.is_not(None),
-                UserInteraction.timestamp > datetime.now() - timedelta(days=30)
-            )
-            .distinct()
+        # Puntuar todo el catálogo en memoria y quedarse con los mejores
+        await scoring_engine.ensure_loaded(self.session)
+        await recently_viewed.ensure_loaded(self.session)
+        ranked = scoring_engine.rank(
+            preferred_categories,
+            preferred_brands,
+            preferences.price_range_min if preferences.price_range_min is not None else 0,
+            preferences.price_range_max if preferences.price_range_max is not None else 50000,
+            viewed_ids=recently_viewed.viewed_ids(days=30),
+            k=per_group * len(TIER_SCORES)
         )
-        recently_viewed_ids = {row[0] for row in recent_views_result}
-        
-        # Categorizar productos según las últimas categorías buscadas
-        highly_recommended = []
-        recommended = []
-        other_suggestions = []
-        
-        # Obtener productos de la última categoría buscada
-        if len(preferred_categories) > 0:
-            last_category = preferred_categories[0].lower()
-            for product in all_products:
-                if product.category.value.lower() == last_category:
-                    highly_recommended.append(product)
-                    if len(highly_recommended) >= 6:  # Máximo 6 productos
-                        break
         
-        # Obtener productos de la penúltima categoría buscada
-        if len(preferred_categories) > 1:
-            second_last_category = preferred_categories[1].lower()
-            for product in all_products:
-                if product.category.value.lower() == second_last_category:
-                    recommended.append(product)
-                    if len(recommended) >= 6:  # Máximo 6 productos
-                        break
-        
-        # Agregar otros productos aleatorios como sugerencias
-        used_products = set([p.id for p in highly_recommended + recommended])
-        for product in all_products:
-            if product.id not in used_products:
-                other_suggestions.append(product)
-                if len(other_suggestions) >= 6:  # Máximo 6 productos
-                    break
-        
-        return {
-            'highly_recommended': highly_recommended,
-            'recommended': recommended,
-            'other_suggestions': other_suggestions
-        }
+        products_result = await self.session.execute(
+            select(Product).where(Product.id.in_([item.product_id for item in ranked]))
+        )
+        products = {product.id: product for product in products_result.scalars().all()}
+        
+        # Los primeros del ranking son los más recomendados
+        groups = list(TIER_SCORES)
+        recommendations = {group: [] for group in groups}
+        for position, item in enumerate(ranked):
+            product = products.get(item.product_id)
+            if product is not None:
+                group = groups[min(position // per_group, len(groups) - 1)]
+                recommendations[group].append(Recommendation(product, item.score, item.reasons))
+        return recommendations
     
-    async def _calculate_product_score(
-        self, 
-        product: Product,
-        preferred_categories: List[str],
-        preferred_brands: List[str],
-        price_min: float,
-        price_max: float,
-        already_viewed: bool
-    ) -> float:
-        """Calcula la puntuación de un producto basándose en las preferencias"""
-        score = 0
-        
-        # Puntuación por categoría (0-35 puntos)
-        # Normalizar a minúsculas para comparación
-        product_category_lower = product.category.value.lower()
-        preferred_categories_lower = [cat.lower() for cat in preferred_categories]
-        
-        if product_category_lower in preferred_categories_lower:
-            # Mayor puntuación para categorías más preferidas
-            category_rank = preferred_categories_lower.index(product_category_lower) + 1
-            score += max(35 - (category_rank - 1) * 5, 20)
-        
-        # Puntuación por marca (0-25 puntos)
-        if product.brand in preferred_brands:
-            brand_rank = preferred_brands.index(product.brand) + 1
-            score += max(25 - (brand_rank - 1) * 3, 15)
-        
-        # Puntuación por rango de precio (0-20 puntos)
-        if price_min <= product.price <= price_max:
-            score += 20
-        elif product.price < price_min:
-            # Penalizar productos muy baratos
-            price_diff_ratio = (price_min - product.price) / price_min
-            score += max(0, 20 - price_diff_ratio * 30)
-        else:
-            # Penalizar productos muy caros
-            price_diff_ratio = (product.price - price_max) / price_max
-            score += max(0, 20 - price_diff_ratio * 20)
-        
-        # Puntuación por disponibilidad (0-15 puntos)
-        if product.stock > 10:
-            score += 15
-        elif product.stock > 5:
-            score += 10
+    @staticmethod
+    def _tier_reasons(product: Product, group: str) -> List[str]:
+        """Razones de las recomendaciones por defecto según el grupo"""
+        reasons = []
+        
+        if group == "highly_recommended":
+            reasons.append("De la categoría que buscaste más recientemente")
+            if product.stock > 5:
+                reasons.append("Disponibilidad inmediata")
+            reasons.append("Producto destacado en su categoría")
+        elif group == "recommended":
+            reasons.append("De tu penúltima categoría buscada")
+            if product.price < 1000:
+                reasons.append("Precio accesible")
+            if product.stock > 10:
+                reasons.append("Amplio stock disponible")
         else:
-            score += 5
+            reasons.append("Otras opciones que podrían interesarte")
+            if product.brand in ["Apple", "Samsung", "HP", "Dell"]:
+                reasons.append("Marca reconocida")
         
-        # Puntuación adicional para productos nuevos o trending (0-5 puntos)
-        # Por ahora, dar puntos aleatorios basados en el ID
-        score += (product.id % 6)
-        
-        # Penalizar si ya fue visto
-        if already_viewed:
-            score *= 0.7
-        
-        return min(100, max(0, score))
+        return reasons
+    
+    async def _default_candidates(self, per_category: int = 3) -> List[Product]:
+        """
+        Los mejores productos de cada categoría por stock y precio, en una sola consulta
+        con un LIMIT por categoría (usa el índice categoría/stock/precio)
+        """
+        top_ids = [
+            select(Product.id)
+            .where(Product.is_active == True, Product.stock > 0, Product.category == category)
+            .order_by(Product.stock.desc(), Product.price)
+            .limit(per_category)
+            .subquery()
+            for category in ProductCategory
+        ]
+        result = await self.session.execute(
+            select(Product).where(Product.id.in_(union_all(*[select(subquery.c.id) for subquery in top_ids])))
+        )
+        # Mismo orden de categorías en cada petición: el de la enumeración
+        category_order = {category: index for index, category in enumerate(ProductCategory)}
+        return sorted(result.scalars().all(), key=lambda p: category_order[p.category])
     
     async def _get_default_recommendations(
         self, 
@@ -270,12 +298,64 @@ class RecommendationService:
             'other_suggestions': other_suggestions[:4]
         }
     
+    async def _available_products(self, product_ids: List[int], limit: int) -> List[Product]:
+        """Productos activos y con stock entre `product_ids`, en el mismo orden"""
+        if not product_ids:
+            return []
+        result = await self.session.execute(
+            select(Product).where(
+                Product.id.in_(product_ids),
+                Product.is_active == True,
+                Product.stock > 0
+            )
+        )
+        available = {product.id: product for product in result.scalars().all()}
+        return [available[i] for i in product_ids if i in available][:limit]
+    
+    async def get_similar_products(
+        self,
+        product_id: int,
+        limit: int = 6
+    ) -> List[Product]:
+        """Productos con descripción y especificaciones parecidas, de cualquier categoría"""
+        # Durante la carga inicial del índice responde sin vecinos en vez de esperarla
+        await content_index.ensure_loaded(self.session, wait=False)
+        # Margen para los vecinos sin stock o inactivos
+        return await self._available_products(content_index.neighbours(product_id, limit * 2), limit)
+    
+    async def get_trending_products(self, limit: int = 10) -> List[TrendingProduct]:
+        """Productos con más vistas, menciones, clics y ventas recientes (sin leer interacciones)"""
+        await trending_counters.ensure_loaded(self.session)
+        # Margen para los productos sin stock o inactivos
+        products = await self._available_products(trending_counters.top(limit * 2), limit)
+        raw_scores = trending_counters.raw_scores()
+        return [
+            TrendingProduct(product, round(float(raw_scores[product.id]), 1), trending_counters.activity(product.id))
+            for product in products
+        ]
+    
     async def get_related_products(
         self, 
         product_id: int,
         limit: int = 6
     ) -> List[Product]:
-        """Obtiene productos relacionados a uno específico"""
+        """
+        Obtiene productos relacionados a uno específico: primero los que se ven o compran
+        junto a él (co-ocurrencias), luego los de contenido parecido y, si faltan, los de
+        su categoría con precio parecido
+        """
+        await cooccurrence_index.ensure_loaded(self.session)
+        # Si el índice de contenido se está cargando, quedan los relacionados por categoría
+        await content_index.ensure_loaded(self.session, wait=False)
+        # Margen para los vecinos sin stock o inactivos
+        neighbour_ids = list(dict.fromkeys([
+            *cooccurrence_index.neighbours(product_id, limit * 2),
+            *content_index.neighbours(product_id, limit * 2)
+        ]))
+        related = await self._available_products(neighbour_ids, limit)
+        if len(related) == limit:
+            return related
+        
         # Obtener el producto
         product_result = await self.session.execute(
             select(Product).where(Product.id == product_id)
@@ -283,12 +363,13 @@ class RecommendationService:
         product = product_result.scalar_one_or_none()
         
         if not product:
-            return []
+            return related
         
-        # Buscar productos similares
+        # Completar con productos similares
+        excluded_ids = [product_id, *(p.id for p in related)]
         similar_products_result = await self.session.execute(
             select(Product).where(
-                Product.id != product_id,
+                Product.id.notin_(excluded_ids),
                 Product.is_active == True,
                 Product.stock > 0,
                 Product.category == product.category
@@ -301,24 +382,14 @@ class RecommendationService:
             key=lambda p: abs(p.price - product.price)
         )
         
-        return similar_products[:limit]
+        return related + similar_products[:limit - len(related)]
     
     async def update_preferences_from_chat(self, categories_mentioned: List[str], brands_mentioned: List[str]):
         """Actualiza las preferencias basándose en menciones en el chat"""
         # Obtener preferencias actuales
-        pref_result = await self.session.execute(
-            select(GlobalUserPreference).limit(1)
-        )
-        preference = pref_result.scalar_one_or_none()
-        
-        if not preference:
-            preference = GlobalUserPreference()
-            self.session.add(preference)
-            current_categories = []
-            current_brands = []
-        else:
-            current_categories = json.loads(preference.preferred_categories) if preference.preferred_categories else []
-            current_brands = json.loads(preference.preferred_brands) if preference.preferred_brands else []
+        preference = await self._global_preference()
+        current_categories = json.loads(preference.preferred_categories) if preference.preferred_categories else []
+        current_brands = json.loads(preference.preferred_brands) if preference.preferred_brands else []
         
         # Normalizar categorías a minúsculas y actualizar
         for category in categories_mentioned:
@@ -348,4 +419,8 @@ class RecommendationService:
         preference.preferred_brands = json.dumps(current_brands)
         preference.last_updated = datetime.now()
         
-        await self.session.commit() 
\ No newline at end of file
+        await self.session.commit()
+        await event_bus.publish(TOPIC_PREFERENCES, "preferences_updated", {
+            "preferred_categories": current_categories,
+            "preferred_brands": current_brands
+        }) 
\ No newline at end of file
@@ -0,0 +1,158 @@
+from typing import Any, Dict, List, Optional
+import asyncio
+import logging
+import time
+from database import async_session_maker
+from models.product import ProductResponse
+from services.recommendation_service import RecommendationService, Recommendation
+from services.event_bus import event_bus, TOPIC_INVENTORY, TOPIC_INTERACTIONS, TOPIC_PREFERENCES
+from services.metrics import registry
+from config import settings
+
+logger = logging.getLogger(__name__)
+
+# Snapshot de `GET /api/recommendations/`: una tarea en segundo plano lo recalcula cuando cambian
+# el catálogo, las preferencias o los productos vistos (agrupando los cambios durante `debounce`).
+# La misma tarea suma antes las interacciones nuevas a las preferencias. El endpoint lo sirve
+# desde memoria y solo lo recalcula en línea (sin escribir) si pasó `max_staleness` desde el
+# primer cambio que el snapshot aún no refleja.
+
+def recommendations_payload(recommendations: Dict[str, List[Recommendation]]) -> Dict[str, List[Dict[str, Any]]]:
+    """Formato de la respuesta: producto con puntaje, grupo y razones"""
+    return {
+        group: [
+            {
+                **ProductResponse.model_validate(item.product).model_dump(),
+                "score": item.score,
+                "recommendation": group.upper().replace("_", " "),
+                "reasons": item.reasons
+            }
+            for item in items
+        ]
+        for group, items in recommendations.items()
+    }
+
+class RecommendationSnapshots:
+    def __init__(self, debounce: float = 0.5, max_staleness: float = 5.0):
+        self.debounce = debounce
+        self.max_staleness = max_staleness
+        self.snapshot: Optional[Dict[str, List[Dict[str, Any]]]] = None
+        self.built_at: Optional[float] = None
+        # Cambios aún no reflejados: contador de versión y momento del primero
+        self._version = 0
+        self._dirty_since: Optional[float] = None
+        self._changed = asyncio.Event()
+        self._lock = asyncio.Lock()
+        self._task: Optional[asyncio.Task] = None
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    def invalidate(self):
+        self._version += 1
+        if self._dirty_since is None:
+            self._dirty_since = time.monotonic()
+        self._changed.set()
+
+    def age(self) -> Optional[float]:
+        return time.monotonic() - self.built_at if self.built_at is not None else None
+
+    def staleness(self) -> float:
+        """Segundos desde el primer cambio que el snapshot no refleja (0 si está al día)"""
+        return time.monotonic() - self._dirty_since if self._dirty_since is not None else 0.0
+
+    def _usable(self) -> bool:
+        return self.snapshot is not None and self.staleness() <= self.max_staleness
+
+    async def _build(self) -> Dict[str, List[Dict[str, Any]]]:
+        async with async_session_maker() as session:
+            recommendations = await RecommendationService(session).get_personalized_recommendations()
+            return recommendations_payload(recommendations)
+
+    @staticmethod
+    async def _fold_preferences() -> int:
+        async with async_session_maker() as session:
+            return await RecommendationService(session).refresh_preferences()
+
+    async def refresh(self, only_if_stale: bool = False):
+        async with self._lock:
+            # Otra petición pudo haberlo recalculado mientras se esperaba el lock
+            if only_if_stale and self._usable():
+                return
+            version = self._version
+            self._changed.clear()
+            with snapshot_build_seconds.time():
+                self.snapshot = await self._build()
+            self.built_at = time.monotonic()
+            if self._version == version:
+                self._dirty_since = None
+            else:
+                # Llegaron cambios durante el cálculo: queda pendiente otra pasada
+                self._changed.set()
+
+    async def get(self) -> Dict[str, List[Dict[str, Any]]]:
+        """Último snapshot; se recalcula en línea si no existe o superó la cota de antigüedad"""
+        if self._usable():
+            snapshot_requests_total.inc("hit")
+        else:
+            snapshot_requests_total.inc("rebuild")
+            await self.refresh(only_if_stale=True)
+        return self.snapshot
+
+    async def _run(self):
+        # Primera pasada al arrancar: sumar las interacciones que todavía no están en las
+        # preferencias (sin marcar el snapshot como vencido para el endpoint)
+        self._changed.set()
+        while True:
+            await self._changed.wait()
+            # Agrupar los cambios que llegan seguidos en un solo recálculo
+            await asyncio.sleep(self.debounce)
+            try:
+                await self._fold_preferences()
+            except Exception as e:
+                logger.error(f"Error sumando interacciones a las preferencias: {e}")
+            try:
+                await self.refresh()
+            except Exception as e:
+                logger.error(f"Error recalculando el snapshot de recomendaciones: {e}")
+
+    async def on_event(self, topic: str, payload: Dict[str, Any]):
+        """Marca el snapshot como desactualizado ante cambios que afectan las recomendaciones"""
+        if topic in (TOPIC_INVENTORY, TOPIC_PREFERENCES):
+            self.invalidate()
+        elif topic == TOPIC_INTERACTIONS and payload.get("event") == "interaction_created":
+            # Cambian las preferencias acumuladas y los vistos reciben una penalización
+            self.invalidate()
+
+recommendation_snapshots = RecommendationSnapshots(
+    debounce=settings.recommendation_refresh_debounce,
+    max_staleness=settings.recommendation_max_staleness
+)
+event_bus.subscribe(recommendation_snapshots.on_event)
+
+snapshot_build_seconds = registry.histogram(
+    "recommendation_snapshot_build_seconds", "Duración del cálculo del snapshot de recomendaciones"
+)
+snapshot_requests_total = registry.counter(
+    "recommendation_snapshot_requests_total",
+    "Peticiones de recomendaciones servidas desde el snapshot (hit) o recalculándolo (rebuild)",
+    labels=("result",)
+)
+registry.gauge(
+    "recommendation_snapshot_age_seconds", "Segundos desde el último cálculo del snapshot de recomendaciones",
+    lambda: {(): recommendation_snapshots.age()} if recommendation_snapshots.built_at is not None else {}
+)
+registry.gauge(
+    "recommendation_snapshot_staleness_seconds", "Segundos desde el primer cambio que el snapshot aún no refleja",
+    lambda: {(): recommendation_snapshots.staleness()}
+)
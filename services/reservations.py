@@ -0,0 +1,261 @@
+from typing import Any, Dict, List, Optional, Tuple
+from datetime import datetime, timedelta
+import asyncio
+import heapq
+import logging
+from sqlalchemy import select, insert, delete, func, literal, exists, Integer, String, DateTime
+from sqlalchemy.ext.asyncio import AsyncSession
+from database import async_session_maker
+from models.product import Product, StockReservation
+from services.event_bus import event_bus, TOPIC_INVENTORY
+from config import settings
+
+logger = logging.getLogger(__name__)
+
+# Reservas de stock: al pedir confirmación de una compra se apartan unidades por un tiempo
+# (TTL). La tabla stock_reservations es la fuente de verdad y sobrevive a reinicios; cada
+# worker mantiene en memoria las unidades apartadas por producto (disponible = stock -
+# apartado en O(1)) y un heap por vencimiento que libera en bloque las reservas vencidas.
+
+def active_holds(product_id, now: datetime):
+    """Unidades apartadas y vigentes de un producto (subconsulta)"""
+    return (
+        select(func.coalesce(func.sum(StockReservation.quantity), 0))
+        .where(StockReservation.product_id == product_id, StockReservation.expires_at > now)
+        .scalar_subquery()
+    )
+
+class ReservationBook:
+    def __init__(self, ttl: float = 600.0, sweep_interval: float = 30.0):
+        self.ttl = ttl
+        self.sweep_interval = sweep_interval
+        # product_id -> unidades apartadas vigentes
+        self.held: Dict[int, int] = {}
+        self._holds: Dict[int, Tuple[int, int, datetime]] = {}  # id -> (producto, cantidad, vence)
+        # Heap perezoso de (vence, id); las reservas ya liberadas se descartan al salir
+        self._heap: List[Tuple[datetime, int]] = []
+        self.loaded = False
+        # Si ya hubo una pasada completa de sweep en este proceso
+        self._swept = False
+        self._load_lock = asyncio.Lock()
+        self._loading = False
+        self._pending_events: List[Tuple[str, Dict[str, Any]]] = []
+        self._wake: Optional[asyncio.Event] = None
+        self._task: Optional[asyncio.Task] = None
+
+    def available(self, product_id: int, stock: int) -> int:
+        """Unidades que se pueden vender: stock menos lo apartado"""
+        return max(0, stock - self.held.get(product_id, 0))
+
+    def _add(self, reservation_id: int, product_id: int, quantity: int, expires_at: datetime):
+        if reservation_id in self._holds or expires_at <= datetime.now():
+            return
+        self._holds[reservation_id] = (product_id, quantity, expires_at)
+        self.held[product_id] = self.held.get(product_id, 0) + quantity
+        heapq.heappush(self._heap, (expires_at, reservation_id))
+        # Si es la próxima en vencer, el barrido tiene que despertar antes
+        if self._heap[0][1] == reservation_id and self._wake is not None:
+            self._wake.set()
+
+    def _remove(self, reservation_id: int):
+        hold = self._holds.pop(reservation_id, None)
+        if hold is None:
+            return
+        product_id, quantity, _ = hold
+        remaining = self.held.get(product_id, 0) - quantity
+        if remaining > 0:
+            self.held[product_id] = remaining
+        else:
+            self.held.pop(product_id, None)
+
+    def expire(self, now: Optional[datetime] = None) -> List[int]:
+        """Libera de memoria las reservas vencidas; devuelve sus ids"""
+        now = now or datetime.now()
+        expired = []
+        while self._heap and self._heap[0][0] <= now:
+            _, reservation_id = heapq.heappop(self._heap)
+            if reservation_id in self._holds:
+                self._remove(reservation_id)
+                expired.append(reservation_id)
+        return expired
+
+    async def reserve(
+        self,
+        session: AsyncSession,
+        product_id: int,
+        quantity: int = 1,
+        owner: str = "chat"
+    ) -> Optional[int]:
+        """
+        Aparta unidades si alcanza el disponible; devuelve el id de la reserva o None. El
+        INSERT ... SELECT toma el lock de escritura antes de leer, así dos reservas
+        simultáneas no pueden apartar la misma unidad.
+        """
+        now = datetime.now()
+        expires_at = now + timedelta(seconds=self.ttl)
+        enough_stock = exists().where(
+            Product.id == product_id,
+            Product.is_active == True,
+            Product.stock - active_holds(product_id, now) >= quantity
+        )
+        result = await session.execute(
+            insert(StockReservation)
+            .from_select(
+                ["product_id", "quantity", "owner", "created_at", "expires_at"],
+                select(
+                    literal(product_id, Integer),
+                    literal(quantity, Integer),
+                    literal(owner, String),
+                    literal(now, DateTime),
+                    literal(expires_at, DateTime)
+                ).where(enough_stock)
+            )
+            .returning(StockReservation.id)
+        )
+        reservation_id = result.scalar_one_or_none()
+        await session.commit()
+        if reservation_id is None:
+            return None
+
+        self._add(reservation_id, product_id, quantity, expires_at)
+        await event_bus.publish(TOPIC_INVENTORY, "reservation_created", {
+            "id": reservation_id,
+            "product_id": product_id,
+            "quantity": quantity,
+            "expires_at": expires_at.isoformat()
+        })
+        return reservation_id
+
+    @staticmethod
+    async def find(session: AsyncSession, product_id: int, owner: str) -> Optional[int]:
+        """Reserva vigente más antigua de `owner` para el producto"""
+        result = await session.execute(
+            select(StockReservation.id)
+            .where(
+                StockReservation.product_id == product_id,
+                StockReservation.owner == owner,
+                StockReservation.expires_at > datetime.now()
+            )
+            .order_by(StockReservation.created_at)
+            .limit(1)
+        )
+        return result.scalar_one_or_none()
+
+    async def released(self, reservation_ids: List[int]):
+        """Avisa a todos los workers que estas reservas ya no apartan stock"""
+        for reservation_id in reservation_ids:
+            self._remove(reservation_id)
+        await event_bus.publish(TOPIC_INVENTORY, "reservation_released", {"ids": reservation_ids})
+
+    async def sweep(self) -> int:
+        """
+        Libera las reservas vencidas en memoria y las borra de la tabla en una sola sentencia.
+        Solo toma el lock de escritura si algo venció (la primera pasada revisa siempre: pueden
+        quedar reservas vencidas de antes de un reinicio, que load no trae a memoria).
+        """
+        now = datetime.now()
+        if not self.expire(now) and self._swept:
+            return 0
+        async with async_session_maker() as session:
+            # Otro worker pudo haberlas borrado ya: comprobar con una lectura antes de escribir
+            pending = await session.execute(
+                select(StockReservation.id).where(StockReservation.expires_at <= now).limit(1)
+            )
+            if pending.scalar_one_or_none() is None:
+                await session.rollback()
+                self._swept = True
+                return 0
+            try:
+                result = await session.execute(
+                    delete(StockReservation).where(StockReservation.expires_at <= now)
+                )
+                await session.commit()
+            except Exception:
+                # Sin rollback la conexión del pool sigue con el lock de escritura
+                await session.rollback()
+                raise
+        self._swept = True
+        if result.rowcount:
+            logger.info(f"Reservas de stock vencidas liberadas: {result.rowcount}")
+        return result.rowcount
+
+    async def load(self, session: AsyncSession):
+        """Reservas vigentes al iniciar (recupera las apartadas antes de un reinicio)"""
+        self._loading = True
+        try:
+            result = await session.execute(
+                select(StockReservation.id, StockReservation.product_id, StockReservation.quantity, StockReservation.expires_at)
+                .where(StockReservation.expires_at > datetime.now())
+            )
+            self.held, self._holds, self._heap = {}, {}, []
+            for reservation_id, product_id, quantity, expires_at in result:
+                self._add(reservation_id, product_id, quantity, expires_at)
+
+            pending, self._pending_events = self._pending_events, []
+            for event, data in pending:
+                self._apply(event, data)
+            self.loaded = True
+        finally:
+            self._loading = False
+        logger.info(f"Reservas de stock cargadas: {len(self._holds)} vigentes")
+
+    async def ensure_loaded(self, session: AsyncSession):
+        if self.loaded:
+            return
+        async with self._load_lock:
+            if not self.loaded:
+                await self.load(session)
+
+    def _apply(self, event: str, data: Dict[str, Any]):
+        if event == "reservation_created":
+            self._add(data["id"], data["product_id"], data["quantity"], datetime.fromisoformat(data["expires_at"]))
+        else:
+            for reservation_id in data.get("ids", []):
+                self._remove(reservation_id)
+
+    async def on_event(self, topic: str, payload: Dict[str, Any]):
+        event = payload.get("event")
+        if topic != TOPIC_INVENTORY or event not in ("reservation_created", "reservation_released"):
+            return
+        data = payload.get("data") or {}
+        if self._loading:
+            self._pending_events.append((event, data))
+        elif self.loaded:
+            self._apply(event, data)
+
+    def start(self):
+        if self._task is None:
+            self._wake = asyncio.Event()
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+            self._wake = None
+
+    async def _run(self):
+        while True:
+            self._wake.clear()
+            try:
+                await self.sweep()
+            except Exception as e:
+                logger.error(f"Error liberando reservas de stock: {e}")
+            # Dormir hasta el próximo vencimiento (o el intervalo de barrido, lo que llegue antes)
+            timeout = self.sweep_interval
+            if self._heap:
+                timeout = min(timeout, max(0.0, (self._heap[0][0] - datetime.now()).total_seconds()))
+            try:
+                await asyncio.wait_for(self._wake.wait(), timeout=timeout)
+            except asyncio.TimeoutError:
+                pass
+
+stock_reservations = ReservationBook(
+    ttl=settings.reservation_ttl_seconds,
+    sweep_interval=settings.reservation_sweep_interval
+)
+event_bus.subscribe(stock_reservations.on_event)
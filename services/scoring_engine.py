@@ -0,0 +1,301 @@
+from typing import Any, Dict, Iterable, List, NamedTuple, Sequence, Tuple
+import asyncio
+import logging
+import time
+import numpy as np
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from models.product import Product, ProductCategory
+from services.event_bus import event_bus, TOPIC_INVENTORY
+from services.trending import trending_counters
+
+logger = logging.getLogger(__name__)
+
+# Motor de puntuación columnar: los atributos del catálogo viven en arrays de NumPy y el
+# puntaje de recomendación (categoría, marca, precio, stock, tendencia y vistos) se evalúa
+# para todos los productos en una sola pasada vectorizada. Es la única implementación del
+# puntaje; benchmarks/ranking.py lo verifica contra un modelo escalar de referencia. Se
+# mantiene al día con los eventos de inventario.
+
+ProductRow = Tuple[int, ProductCategory, str, float, int, bool]
+
+# Puntaje de los productos sin stock o inactivos: nunca entran en el top-k
+UNAVAILABLE = np.float32(-1e6)
+
+# Cada cuánto se vuelven a copiar los puntos de tendencia al puntaje base, como máximo
+TRENDING_SYNC_SECONDS = 1.0
+# Puntos de tendencia desde los que se menciona en las razones
+TRENDING_REASON_POINTS = 3.0
+
+class RankedProduct(NamedTuple):
+    product_id: int
+    score: float
+    reasons: List[str]
+
+def _stock_points(stock: np.ndarray) -> np.ndarray:
+    return np.where(stock > 10, 15, np.where(stock > 5, 10, 5)).astype(np.float32)
+
+class ScoringEngine:
+    def __init__(self, capacity: int = 1024):
+        self.categories = list(ProductCategory)
+        self._category_codes = {category: code for code, category in enumerate(self.categories)}
+        self._category_codes_by_value = {category.value.lower(): code for code, category in enumerate(self.categories)}
+        self.brands: List[str] = []
+        self._brand_codes: Dict[str, int] = {}  # por marca en minúsculas
+        self.size = 0
+        self.loaded = False
+        self._load_lock = asyncio.Lock()
+        self._loading = False
+        self._pending_events: List[Dict[str, Any]] = []
+        self._trending_version = -1
+        self._trending_synced = 0.0
+        self._allocate(capacity)
+        # Fila de cada id de producto (-1 si no está); los ids son densos
+        self._positions = np.full(capacity, -1, dtype=np.int64)
+
+    def _allocate(self, capacity: int):
+        self.ids = np.zeros(capacity, dtype=np.int64)
+        self.category = np.zeros(capacity, dtype=np.int8)
+        self.brand = np.zeros(capacity, dtype=np.int32)
+        self.price = np.zeros(capacity, dtype=np.float32)
+        self.stock = np.zeros(capacity, dtype=np.int32)
+        self.active = np.zeros(capacity, dtype=bool)
+        # Parte del puntaje que no depende de las preferencias: stock + tendencia (0-5)
+        self.base = np.full(capacity, UNAVAILABLE, dtype=np.float32)
+
+    def _grow(self, needed: int):
+        capacity = len(self.ids)
+        if needed <= capacity:
+            return
+        new_capacity = max(needed, capacity * 2)
+        for name in ("ids", "category", "brand", "price", "stock", "active", "base"):
+            old = getattr(self, name)
+            new = np.zeros(new_capacity, dtype=old.dtype) if name != "base" else np.full(new_capacity, UNAVAILABLE, dtype=old.dtype)
+            new[:self.size] = old[:self.size]
+            setattr(self, name, new)
+
+    def _position_for(self, product_id: int) -> int:
+        if product_id >= len(self._positions):
+            grown = np.full(max(product_id + 1, len(self._positions) * 2), -1, dtype=np.int64)
+            grown[:len(self._positions)] = self._positions
+            self._positions = grown
+        return int(self._positions[product_id])
+
+    def _brand_code(self, brand: str) -> int:
+        key = (brand or "").lower()
+        code = self._brand_codes.get(key)
+        if code is None:
+            code = self._brand_codes[key] = len(self.brands)
+            self.brands.append(brand or "")
+        return code
+
+    def _refresh_base(self, rows: slice):
+        available = self.active[rows] & (self.stock[rows] > 0)
+        base = _stock_points(self.stock[rows]) + trending_counters.points(self.ids[rows])
+        self.base[rows] = np.where(available, base, UNAVAILABLE)
+
+    def _sync_trending(self):
+        """Actualiza la tendencia del puntaje base si cambió (a lo sumo una vez por segundo)"""
+        now = time.monotonic()
+        if now - self._trending_synced < TRENDING_SYNC_SECONDS:
+            return
+        self._trending_synced = now
+        trending_counters.tick()
+        if trending_counters.version != self._trending_version:
+            self._trending_version = trending_counters.version
+            self._refresh_base(slice(0, self.size))
+
+    def load_rows(self, rows: Sequence[ProductRow]):
+        """Reemplaza el catálogo completo a partir de filas (id, categoría, marca, precio, stock, activo)"""
+        self.size = 0
+        self._positions = np.full(max(len(self._positions), 1), -1, dtype=np.int64)
+        self._allocate(max(len(rows), 1024))
+        if rows:
+            ids, categories, brands, prices, stocks, actives = zip(*rows)
+            count = len(rows)
+            self.ids[:count] = ids
+            self.category[:count] = [self._category_codes[ProductCategory(c)] for c in categories]
+            self.brand[:count] = [self._brand_code(b) for b in brands]
+            self.price[:count] = [p or 0.0 for p in prices]
+            self.stock[:count] = [s or 0 for s in stocks]
+            self.active[:count] = [a is not False for a in actives]
+            self.size = count
+            self._position_for(int(self.ids[:count].max()))
+            self._positions[self.ids[:count]] = np.arange(count)
+            self._refresh_base(slice(0, count))
+        self.loaded = True
+
+    def upsert(self, product_id: int, category: Any, brand: str, price: float, stock: int, is_active: bool = True):
+        """Agrega o actualiza un producto (O(1) amortizado)"""
+        position = self._position_for(product_id)
+        if position < 0:
+            position = self.size
+            self._grow(self.size + 1)
+            self.size += 1
+            self._positions[product_id] = position
+            self.ids[position] = product_id
+        self.category[position] = self._category_codes[ProductCategory(category)]
+        self.brand[position] = self._brand_code(brand)
+        self.price[position] = price or 0.0
+        self.stock[position] = stock or 0
+        self.active[position] = is_active is not False
+        self._refresh_base(slice(position, position + 1))
+
+    async def load(self, session: AsyncSession):
+        """Carga el catálogo desde la base (solo las columnas que usa el modelo)"""
+        self._loading = True
+        try:
+            result = await session.execute(
+                select(Product.id, Product.category, Product.brand, Product.price, Product.stock, Product.is_active)
+            )
+            self.load_rows(result.all())
+            # Eventos recibidos mientras corría la consulta
+            pending, self._pending_events = self._pending_events, []
+            for data in pending:
+                self._apply_event(data)
+        finally:
+            self._loading = False
+        logger.info(f"Motor de puntuación cargado con {self.size} productos")
+
+    async def ensure_loaded(self, session: AsyncSession):
+        if self.loaded:
+            return
+        async with self._load_lock:
+            if not self.loaded:
+                await self.load(session)
+
+    def _apply_event(self, data: Dict[str, Any]):
+        self.upsert(data["id"], data["category"], data.get("brand"), data.get("price"), data.get("stock"), data.get("is_active", True))
+
+    async def on_event(self, topic: str, payload: Dict[str, Any]):
+        """Mantiene los arrays al día con product_created / stock_changed"""
+        if topic != TOPIC_INVENTORY or payload.get("event") not in ("product_created", "stock_changed"):
+            return
+        if self._loading:
+            self._pending_events.append(payload["data"])
+        elif self.loaded:
+            self._apply_event(payload["data"])
+
+    def _codes(self, preferred_categories: Sequence[str], preferred_brands: Sequence[str]):
+        category_codes = [self._category_codes_by_value.get((c or "").lower(), -1) for c in preferred_categories]
+        brand_codes = [self._brand_codes.get((b or "").lower(), -1) for b in preferred_brands]
+        return category_codes, brand_codes
+
+    def score(
+        self,
+        preferred_categories: Sequence[str],
+        preferred_brands: Sequence[str],
+        price_min: float,
+        price_max: float,
+        viewed_ids: Iterable[int] = ()
+    ) -> np.ndarray:
+        """Puntaje (0-100) de todo el catálogo; los no disponibles quedan muy por debajo de 0"""
+        self._sync_trending()
+        n = self.size
+        scores = self.base[:n].copy()
+        mask = np.empty(n, dtype=bool)
+        points = np.empty(n, dtype=np.float32)
+        category_codes, brand_codes = self._codes(preferred_categories, preferred_brands)
+
+        # Categoría (0-35) y marca (0-25) según su posición en las preferencias
+        for rank, code in enumerate(category_codes):
+            if code >= 0:
+                np.equal(self.category[:n], code, out=mask)
+                np.multiply(mask, np.float32(max(35 - rank * 5, 20)), out=points)
+                scores += points
+        for rank, code in enumerate(brand_codes):
+            if code >= 0:
+                np.equal(self.brand[:n], code, out=mask)
+                np.multiply(mask, np.float32(max(25 - rank * 3, 15)), out=points)
+                scores += points
+
+        # Precio (0-20): penalización proporcional por debajo o por encima del rango
+        price = self.price[:n]
+        below = np.empty(n, dtype=np.float32)
+        np.subtract(np.float32(price_min), price, out=below)
+        np.maximum(below, 0, out=below)
+        below *= np.float32(30 / price_min) if price_min > 0 else np.float32(0)
+        np.subtract(price, np.float32(price_max), out=points)
+        np.maximum(points, 0, out=points)
+        points *= np.float32(20 / price_max) if price_max > 0 else np.float32(0)
+        points += below
+        np.subtract(np.float32(20), points, out=points)
+        np.maximum(points, 0, out=points)
+        scores += points
+
+        # Penalizar lo que ya vio (la suma nunca pasa de 100, así que no hace falta recortar)
+        viewed = self._viewed_positions(viewed_ids)
+        if len(viewed):
+            scores[viewed] *= np.float32(0.7)
+        return scores
+
+    def _viewed_positions(self, viewed_ids: Iterable[int]) -> np.ndarray:
+        ids = viewed_ids if isinstance(viewed_ids, np.ndarray) else np.fromiter(viewed_ids, dtype=np.int64)
+        ids = ids[(ids >= 0) & (ids < len(self._positions))]
+        positions = self._positions[ids]
+        return positions[positions >= 0]
+
+    def top_k(self, scores: np.ndarray, k: int) -> np.ndarray:
+        """Filas de los k mejores puntajes disponibles, ordenadas (empates por id)"""
+        n = len(scores)
+        k = min(k, n)
+        if k <= 0:
+            return np.empty(0, dtype=np.int64)
+        candidates = np.argpartition(scores, n - k)[n - k:] if k < n else np.arange(n)
+        candidates = candidates[scores[candidates] >= 0]
+        order = np.lexsort((self.ids[candidates], -scores[candidates]))
+        return candidates[order]
+
+    def rank(
+        self,
+        preferred_categories: Sequence[str],
+        preferred_brands: Sequence[str],
+        price_min: float,
+        price_max: float,
+        viewed_ids: Iterable[int] = (),
+        k: int = 18
+    ) -> List[RankedProduct]:
+        if not isinstance(viewed_ids, np.ndarray):
+            viewed_ids = np.fromiter(viewed_ids, dtype=np.int64)
+        scores = self.score(preferred_categories, preferred_brands, price_min, price_max, viewed_ids)
+        category_codes, brand_codes = self._codes(preferred_categories, preferred_brands)
+        top = self.top_k(scores, k)
+        viewed_rows = set(top[np.isin(top, self._viewed_positions(viewed_ids))].tolist())
+        return [
+            RankedProduct(
+                product_id=int(self.ids[row]),
+                score=round(float(scores[row]), 1),
+                reasons=self._reasons(row, category_codes, brand_codes, price_min, price_max, row in viewed_rows)
+            )
+            for row in top
+        ]
+
+    def _reasons(self, row: int, category_codes: List[int], brand_codes: List[int],
+                 price_min: float, price_max: float, viewed: bool) -> List[str]:
+        """Explica las componentes del puntaje de un producto"""
+        reasons = []
+        category = int(self.category[row])
+        if category in category_codes:
+            rank = category_codes.index(category)
+            reasons.append(
+                "De la categoría que buscaste más recientemente" if rank == 0
+                else "De tu penúltima categoría buscada" if rank == 1
+                else "De una categoría que te interesa"
+            )
+        if int(self.brand[row]) in brand_codes:
+            reasons.append(f"Marca que te interesa: {self.brands[self.brand[row]]}")
+        if price_min <= self.price[row] <= price_max:
+            reasons.append("Dentro de tu rango de precio")
+        stock = int(self.stock[row])
+        if stock > 10:
+            reasons.append("Amplio stock disponible")
+        elif stock > 5:
+            reasons.append("Disponibilidad inmediata")
+        if trending_counters.points_for(int(self.ids[row])) >= TRENDING_REASON_POINTS:
+            reasons.append("Tendencia: de lo más visto y vendido")
+        if viewed:
+            reasons.append("Lo viste recientemente")
+        return reasons or ["Otras opciones que podrían interesarte"]
+
+scoring_engine = ScoringEngine()
+event_bus.subscribe(scoring_engine.on_event)
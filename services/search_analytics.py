@@ -0,0 +1,175 @@
+from typing import Any, Dict, List, Optional, Tuple
+import asyncio
+import heapq
+import json
+import logging
+import os
+import re
+import unicodedata
+from services.event_bus import event_bus, TOPIC_INTERACTIONS
+from config import settings
+
+logger = logging.getLogger(__name__)
+
+# Búsquedas más frecuentes con Space-Saving: memoria fija por sketch y conteos con error
+# acotado (count - error <= real <= count). Se separan las búsquedas con resultados (hits)
+# de las que no encontraron nada (misses = demanda no atendida), por origen: chat o catálogo.
+
+MAX_QUERY_LENGTH = 80
+
+def normalize_query(query: str) -> str:
+    query = unicodedata.normalize("NFKD", query or "").encode("ascii", "ignore").decode()
+    return re.sub(r"\s+", " ", query.lower()).strip()[:MAX_QUERY_LENGTH]
+
+class SpaceSaving:
+    """Top-k aproximado de un flujo con `capacity` contadores"""
+
+    def __init__(self, capacity: int = 256):
+        self.capacity = capacity
+        self.total = 0
+        self._counts: Dict[str, List[int]] = {}  # clave -> [conteo, error]
+        # Min-heap perezoso de (conteo, clave); las entradas viejas se descartan al salir
+        self._heap: List[Tuple[int, str]] = []
+
+    def add(self, key: str, amount: int = 1):
+        self.total += amount
+        entry = self._counts.get(key)
+        if entry is None:
+            if len(self._counts) < self.capacity:
+                entry = self._counts[key] = [0, 0]
+            else:
+                # Reemplazar al mínimo: hereda su conteo como error
+                minimum = self._pop_min()
+                del self._counts[minimum[1]]
+                entry = self._counts[key] = [minimum[0], minimum[0]]
+        entry[0] += amount
+        heapq.heappush(self._heap, (entry[0], key))
+        if len(self._heap) > 4 * self.capacity:
+            self._heap = [(count, k) for k, (count, _) in self._counts.items()]
+            heapq.heapify(self._heap)
+
+    def _pop_min(self) -> Tuple[int, str]:
+        while True:
+            count, key = heapq.heappop(self._heap)
+            entry = self._counts.get(key)
+            if entry is not None and entry[0] == count:
+                return count, key
+
+    def top(self, limit: int) -> List[Dict[str, Any]]:
+        best = heapq.nlargest(limit, self._counts.items(), key=lambda item: (item[1][0], item[0]))
+        return [{"query": key, "count": count, "error": error} for key, (count, error) in best]
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {"total": self.total, "counts": self._counts}
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any], capacity: int) -> "SpaceSaving":
+        sketch = cls(capacity)
+        sketch.total = data.get("total", 0)
+        counts = sorted(data.get("counts", {}).items(), key=lambda item: item[1][0], reverse=True)
+        sketch._counts = {key: list(entry) for key, entry in counts[:capacity]}
+        sketch._heap = [(count, key) for key, (count, _) in sketch._counts.items()]
+        heapq.heapify(sketch._heap)
+        return sketch
+
+class SearchAnalytics:
+    def __init__(self, path: str, capacity: int = 256, snapshot_interval: float = 60.0):
+        self.path = path
+        self.capacity = capacity
+        self.snapshot_interval = snapshot_interval
+        # (origen, "hits" | "misses") -> sketch
+        self._sketches: Dict[Tuple[str, str], SpaceSaving] = {}
+        self._dirty = False
+        self._task: Optional[asyncio.Task] = None
+
+    def record(self, query: str, hit: bool, source: str):
+        key = normalize_query(query)
+        if not key:
+            return
+        outcome = "hits" if hit else "misses"
+        sketch = self._sketches.get((source, outcome))
+        if sketch is None:
+            sketch = self._sketches[(source, outcome)] = SpaceSaving(self.capacity)
+        sketch.add(key)
+        self._dirty = True
+
+    def report(self, limit: int = 20) -> Dict[str, Dict[str, Any]]:
+        """Búsquedas más frecuentes y sin resultados por origen"""
+        report: Dict[str, Dict[str, Any]] = {}
+        for (source, outcome), sketch in sorted(self._sketches.items()):
+            entry = report.setdefault(source, {"total": 0, "misses": 0, "top_queries": [], "unmet_queries": []})
+            entry["total"] += sketch.total
+            if outcome == "hits":
+                entry["top_queries"] = sketch.top(limit)
+            else:
+                entry["misses"] = sketch.total
+                entry["unmet_queries"] = sketch.top(limit)
+        return report
+
+    def load(self):
+        """Restaura el último snapshot guardado (si existe)"""
+        try:
+            with open(self.path, encoding="utf-8") as snapshot_file:
+                data = json.load(snapshot_file)
+        except FileNotFoundError:
+            return
+        except (OSError, ValueError) as e:
+            logger.error(f"No se pudo leer el snapshot de búsquedas {self.path}: {e}")
+            return
+        self._sketches = {
+            (source, outcome): SpaceSaving.from_dict(sketch, self.capacity)
+            for source, outcomes in data.get("sources", {}).items()
+            for outcome, sketch in outcomes.items()
+        }
+
+    def save(self):
+        """Escribe el snapshot de forma atómica (archivo temporal + rename)"""
+        sources: Dict[str, Dict[str, Any]] = {}
+        for (source, outcome), sketch in self._sketches.items():
+            sources.setdefault(source, {})[outcome] = sketch.to_dict()
+        temporary = f"{self.path}.{os.getpid()}.tmp"
+        with open(temporary, "w", encoding="utf-8") as snapshot_file:
+            json.dump({"sources": sources}, snapshot_file, separators=(",", ":"), ensure_ascii=False)
+        os.replace(temporary, self.path)
+        self._dirty = False
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        if self._dirty:
+            self.save()
+
+    async def _run(self):
+        while True:
+            await asyncio.sleep(self.snapshot_interval)
+            if self._dirty:
+                try:
+                    self.save()
+                except OSError as e:
+                    logger.error(f"Error guardando el snapshot de búsquedas: {e}")
+
+    async def on_event(self, topic: str, payload: Dict[str, Any]):
+        if topic != TOPIC_INTERACTIONS or payload.get("event") != "search_performed":
+            return
+        data = payload.get("data") or {}
+        self.record(data.get("query", ""), bool(data.get("hit")), data.get("source", "catalog"))
+
+async def publish_search(query: str, hit: bool, source: str):
+    """Publica una búsqueda para que la cuenten los sketches de todos los workers"""
+    await event_bus.publish(TOPIC_INTERACTIONS, "search_performed", {"query": query, "hit": hit, "source": source})
+
+search_analytics = SearchAnalytics(
+    settings.search_analytics_path,
+    capacity=settings.search_analytics_capacity,
+    snapshot_interval=settings.search_analytics_snapshot_interval
+)
+event_bus.subscribe(search_analytics.on_event)
@@ -0,0 +1,207 @@
+from typing import Any, Dict, List, Optional, Sequence
+from datetime import datetime, timedelta
+import asyncio
+import logging
+import numpy as np
+from sqlalchemy import select, literal, union_all, String
+from sqlalchemy.ext.asyncio import AsyncSession
+from models.product import Sale
+from models.user_interaction import UserInteraction
+from services.event_bus import event_bus, TOPIC_INTERACTIONS, TOPIC_SALES
+
+logger = logging.getLogger(__name__)
+
+# Popularidad por producto en ventanas deslizantes: conteos por tipo de evento en buffers
+# circulares de 24 horas y 30 días, indexados por id de producto. Cada evento suma en O(1);
+# al avanzar la hora o el día solo se vacía la columna que sale de la ventana.
+
+EVENT_TYPES = ("view", "chat_mention", "recommendation_click", "sale")
+# Peso de cada tipo en el puntaje de tendencia
+EVENT_WEIGHTS = np.array([1.0, 2.0, 2.0, 5.0], dtype=np.float32)
+_TYPE_INDEX = {event_type: index for index, event_type in enumerate(EVENT_TYPES)}
+
+HOURS = 24
+DAYS = 30
+# Puntos máximos de tendencia en el puntaje de recomendaciones
+MAX_POINTS = 5.0
+
+class TrendingCounters:
+    def __init__(self, capacity: int = 1024):
+        self._hour: Optional[int] = None
+        self._day: Optional[int] = None
+        # Cambia con cada evento o bucket vencido; el motor de puntuación lo usa para resincronizar
+        self.version = 0
+        self._raw_cache: Optional[tuple] = None
+        self.loaded = False
+        self._load_lock = asyncio.Lock()
+        self._loading = False
+        self._pending_events: List[tuple] = []
+        self._allocate(capacity)
+
+    def _allocate(self, capacity: int):
+        types = len(EVENT_TYPES)
+        self.hourly = np.zeros((capacity, types, HOURS), dtype=np.uint32)
+        self.daily = np.zeros((capacity, types, DAYS), dtype=np.uint32)
+        # Sumas de cada ventana, mantenidas al sumar y al expirar buckets
+        self.last_24h = np.zeros((capacity, types), dtype=np.uint32)
+        self.last_30d = np.zeros((capacity, types), dtype=np.uint32)
+        self._raw_cache = None
+
+    def _grow(self, product_id: int):
+        capacity = len(self.last_24h)
+        if product_id < capacity:
+            return
+        new_capacity = max(product_id + 1, capacity * 2)
+        for name in ("hourly", "daily", "last_24h", "last_30d"):
+            old = getattr(self, name)
+            new = np.zeros((new_capacity,) + old.shape[1:], dtype=old.dtype)
+            new[:capacity] = old
+            setattr(self, name, new)
+
+    def _advance(self, hour: int, day: int):
+        """Vacía los buckets que salen de la ventana al llegar a una hora o día nuevos"""
+        if self._hour is None:
+            self._hour, self._day = hour, day
+            return
+        if hour <= self._hour:
+            return
+        for current in range(max(self._hour + 1, hour - HOURS + 1), hour + 1):
+            slot = current % HOURS
+            self.last_24h -= self.hourly[:, :, slot]
+            self.hourly[:, :, slot] = 0
+        for current in range(max(self._day + 1, day - DAYS + 1), day + 1):
+            slot = current % DAYS
+            self.last_30d -= self.daily[:, :, slot]
+            self.daily[:, :, slot] = 0
+        self._hour, self._day = hour, max(self._day, day)
+        self.version += 1
+
+    def add(self, product_id: int, event_type: str, timestamp: Optional[datetime] = None):
+        """Cuenta un evento (los que quedan fuera de ambas ventanas se ignoran)"""
+        type_index = _TYPE_INDEX.get(event_type)
+        if type_index is None or product_id is None or product_id < 0:
+            return
+        seconds = int((timestamp or datetime.now()).timestamp())
+        hour, day = seconds // 3600, seconds // 86400
+        self._advance(hour, day)
+        self._grow(product_id)
+        if hour > self._hour - HOURS:
+            self.hourly[product_id, type_index, hour % HOURS] += 1
+            self.last_24h[product_id, type_index] += 1
+        if day > self._day - DAYS:
+            self.daily[product_id, type_index, day % DAYS] += 1
+            self.last_30d[product_id, type_index] += 1
+        self.version += 1
+
+    def tick(self, now: Optional[datetime] = None):
+        """Expira los buckets vencidos aunque no lleguen eventos"""
+        seconds = int((now or datetime.now()).timestamp())
+        self._advance(seconds // 3600, seconds // 86400)
+
+    def raw_scores(self) -> np.ndarray:
+        """Actividad ponderada: últimas 24 horas más el promedio semanal de los últimos 30 días"""
+        if self._raw_cache is None or self._raw_cache[0] != self.version:
+            raw = (self.last_24h.astype(np.float32) + self.last_30d / np.float32(7)).astype(np.float32) @ EVENT_WEIGHTS
+            self._raw_cache = (self.version, raw, float(raw.max()) if len(raw) else 0.0)
+        return self._raw_cache[1]
+
+    def points(self, product_ids: Sequence[int]) -> np.ndarray:
+        """Puntos de tendencia (0-5) en escala logarítmica relativa al producto más activo"""
+        raw = self.raw_scores()
+        top = self._raw_cache[2]
+        ids = np.asarray(product_ids, dtype=np.int64)
+        points = np.zeros(len(ids), dtype=np.float32)
+        if top > 0:
+            known = (ids >= 0) & (ids < len(raw))
+            points[known] = np.float32(MAX_POINTS) * np.log1p(raw[ids[known]]) / np.float32(np.log1p(top))
+        return points
+
+    def points_for(self, product_id: int) -> float:
+        return float(self.points([product_id])[0])
+
+    def top(self, limit: int) -> List[int]:
+        """Ids con más actividad reciente, de mayor a menor"""
+        self.tick()
+        raw = self.raw_scores()
+        active = np.flatnonzero(raw > 0)
+        if len(active) > limit:
+            active = active[np.argpartition(raw[active], len(active) - limit)[len(active) - limit:]]
+        return [int(i) for i in active[np.lexsort((active, -raw[active]))]]
+
+    def activity(self, product_id: int) -> Dict[str, Dict[str, int]]:
+        """Conteos por tipo de evento en cada ventana"""
+        if product_id >= len(self.last_24h):
+            return {"last_24h": dict.fromkeys(EVENT_TYPES, 0), "last_30d": dict.fromkeys(EVENT_TYPES, 0)}
+        return {
+            "last_24h": dict(zip(EVENT_TYPES, map(int, self.last_24h[product_id]))),
+            "last_30d": dict(zip(EVENT_TYPES, map(int, self.last_30d[product_id])))
+        }
+
+    async def load(self, session: AsyncSession, batch_size: int = 10_000):
+        """Llena las ventanas con los eventos de los últimos 30 días (rango por índice de timestamp)"""
+        self._loading = True
+        try:
+            since = datetime.now() - timedelta(days=DAYS)
+            events = union_all(
+                select(
+                    UserInteraction.product_id.label("product_id"),
+                    UserInteraction.interaction_type.label("event_type"),
+                    UserInteraction.timestamp.label("timestamp")
+                ).where(UserInteraction.timestamp >= since, UserInteraction.product_id.isnot(None)),
+                select(
+                    Sale.product_id.label("product_id"),
+                    literal("sale", String).label("event_type"),
+                    Sale.timestamp.label("timestamp")
+                ).where(Sale.timestamp >= since, Sale.product_id.isnot(None), Sale.status != "cancelled")
+            ).subquery()
+            result = await session.stream(
+                select(events.c.product_id, events.c.event_type, events.c.timestamp)
+                .order_by(events.c.timestamp)
+                .execution_options(yield_per=batch_size)
+            )
+
+            self._hour = self._day = None
+            self._allocate(len(self.last_24h))
+            last_loaded = since
+            async for product_id, event_type, timestamp in result:
+                self.add(product_id, event_type, timestamp)
+                last_loaded = timestamp
+            self.tick()
+
+            # Eventos recibidos mientras corría la consulta que no quedaron en ella
+            pending, self._pending_events = self._pending_events, []
+            for product_id, event_type, timestamp in pending:
+                if timestamp > last_loaded:
+                    self.add(product_id, event_type, timestamp)
+            self.loaded = True
+        finally:
+            self._loading = False
+        logger.info(f"Contadores de tendencia cargados ({int(self.last_30d.sum())} eventos en {DAYS} días)")
+
+    async def ensure_loaded(self, session: AsyncSession):
+        if self.loaded:
+            return
+        async with self._load_lock:
+            if not self.loaded:
+                await self.load(session)
+
+    async def on_event(self, topic: str, payload: Dict[str, Any]):
+        """Cuenta interacciones con producto y ventas no canceladas"""
+        data = payload.get("data") or {}
+        if data.get("product_id") is None:
+            return
+        if topic == TOPIC_INTERACTIONS and payload.get("event") == "interaction_created":
+            event_type = data.get("interaction_type")
+        elif topic == TOPIC_SALES and payload.get("event") == "sale_created" and data.get("status") != "cancelled":
+            event_type = "sale"
+        else:
+            return
+
+        timestamp = datetime.fromisoformat(data.get("timestamp") or payload["timestamp"])
+        if self._loading:
+            self._pending_events.append((data["product_id"], event_type, timestamp))
+        elif self.loaded:
+            self.add(data["product_id"], event_type, timestamp)
+
+trending_counters = TrendingCounters()
+event_bus.subscribe(trending_counters.on_event)